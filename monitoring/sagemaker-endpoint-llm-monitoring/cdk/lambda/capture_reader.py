@@ -0,0 +1,102 @@
+"""
+Streaming line reader for SageMaker data capture objects.
+
+Capture files are JSON Lines. The reader yields one line at a time from the
+S3 body, so memory is bounded by the longest line rather than the file, and
+keeps the byte offset of the next unread line for checkpoints. Each chunk is
+searched for newlines from where the previous line ended, and the pieces of
+a line spanning several chunks are joined once, so a multi-megabyte line
+costs time linear in its length.
+"""
+import gzip
+from contextlib import nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class CaptureLineReader:
+    """
+    Stream the non-empty lines of a data capture object from S3.
+
+    The body is consumed chunk by chunk, so memory stays bounded by the longest
+    line rather than the size of the file. Gzip-compressed objects (``.gz`` key
+    or ``ContentEncoding: gzip``) are decompressed on the fly.
+
+    ``offset`` is the byte offset (in the uncompressed stream) just past the
+    last line yielded, i.e. where reading resumes. Plain objects are expected
+    to be fetched from ``start_offset`` with a ranged GET; compressed objects
+    cannot be ranged and are read from the start, discarding the first
+    ``start_offset`` decompressed bytes.
+
+    Args:
+        s3_object: ``get_object`` response (only ``Body`` and ``ContentEncoding`` are used)
+        s3_key: S3 key of the object
+        start_offset: Uncompressed byte offset the body starts at
+        chunk_size: Bytes read from the body at a time
+        metrics: Optional ``MetricsRecorder`` timing the reads and counting bytes
+    """
+
+    def __init__(
+        self,
+        s3_object: Dict,
+        s3_key: str,
+        start_offset: int = 0,
+        chunk_size: int = 64 * 1024,
+        metrics: Optional[Any] = None,
+    ):
+        self.offset = start_offset
+        self.chunk_size = chunk_size
+        self.metrics = metrics
+        body = s3_object['Body']
+
+        if s3_key.endswith('.gz') or s3_object.get('ContentEncoding') == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=body)
+            self._discard(start_offset)
+        else:
+            self._stream = body
+
+    def _read(self, size: int) -> bytes:
+        with self.metrics.timer('S3Read') if self.metrics is not None else nullcontext():
+            chunk = self._stream.read(size)
+        if self.metrics is not None:
+            self.metrics.add('BytesRead', len(chunk), 'Bytes')
+        return chunk
+
+    def _discard(self, size: int) -> None:
+        while size > 0:
+            chunk = self._read(min(size, self.chunk_size))
+            if not chunk:
+                break
+            size -= len(chunk)
+
+    def __iter__(self) -> Iterator[bytes]:
+        # Pieces of the line in progress, joined once its newline arrives
+        pieces: List[bytes] = []
+        while True:
+            chunk = self._read(self.chunk_size)
+            if not chunk:
+                break
+
+            start = 0
+            newline = chunk.find(b'\n')
+            while newline >= 0:
+                line = chunk[start:newline]
+                if pieces:
+                    pieces.append(line)
+                    line = b''.join(pieces)
+                    pieces = []
+                start = newline + 1
+                self.offset += len(line) + 1
+                line = line.strip()
+                if line:
+                    yield line
+                newline = chunk.find(b'\n', start)
+            if start < len(chunk):
+                pieces.append(chunk[start:])
+
+        # Last line without a trailing newline
+        if pieces:
+            line = b''.join(pieces)
+            self.offset += len(line)
+            line = line.strip()
+            if line:
+                yield line
@@ -0,0 +1,129 @@
+"""
+Cheap-first evaluation cascade in front of the LLM judges.
+
+Traces move through three tiers and stop at the first one that settles them:
+
+1. ``template``: prompts matching a known-safe template (health checks,
+   canned prompts) are not sent to the judges at all.
+2. ``deterministic``: verdicts that follow from the response itself. An empty
+   or error response is unhelpful (every quality judge fails it) but cannot be
+   unsafe. A short refusal does not answer the request, so the judges of
+   relevance and of following the objective fail it; its safety and other
+   judges still run, since a refusal marker says nothing about what else the
+   response contains.
+3. ``escalated``: everything else goes to the Bedrock judges, including every
+   response whose text cannot be found in a known schema.
+
+Counts are kept per tier, in (trace, judge) calls, so the Bedrock calls
+avoided are visible.
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from heuristics import REFUSAL_MARKERS
+from payload_store import is_pointer
+
+# Verdict of each judge for a response that has no usable content; judges not listed fail with 'no'
+EMPTY_RESPONSE_VERDICTS = {'safety': 'yes', 'coherence': 'incoherent'}
+
+# Verdicts settled for a refusal; every other judge, safety included, is escalated
+REFUSAL_VERDICTS = {'relevance_to_query': 'no', 'follows_objective': 'no'}
+# Longer responses are never treated as refusals, whatever markers they contain
+REFUSAL_MAX_CHARS = 500
+
+TIERS = ('template', 'deterministic', 'escalated')
+
+
+def is_error_response(outputs: Any) -> bool:
+    """Whether trace outputs are an endpoint error (a dict with ``code`` and no generated text)."""
+    return isinstance(outputs, dict) and 'code' in outputs and output_text(outputs) is None
+
+
+def output_text(outputs: Any) -> Optional[str]:
+    """
+    Generated text of trace outputs, None when no known text field is present.
+
+    Known fields are TGI/LMI ``generated_text`` and OpenAI-style
+    ``choices[0].message.content`` or ``choices[0].text``. Offloaded text is
+    represented by its preview, which is enough for the checks here and
+    avoids loading the payload.
+    """
+    if isinstance(outputs, list) and outputs and isinstance(outputs[0], dict):
+        outputs = outputs[0]
+    if isinstance(outputs, str) or is_pointer(outputs):
+        text = outputs
+    elif isinstance(outputs, dict) and 'generated_text' in outputs:
+        text = outputs['generated_text']
+    elif isinstance(outputs, dict) and isinstance(outputs.get('choices'), list) and outputs['choices']:
+        choice = outputs['choices'][0]
+        if not isinstance(choice, dict):
+            return None
+        if isinstance(choice.get('message'), dict) and 'content' in choice['message']:
+            text = choice['message']['content']
+        elif 'text' in choice:
+            text = choice['text']
+        else:
+            return None
+    else:
+        return None
+    if is_pointer(text):
+        return text['preview'] or ' '
+    return text if isinstance(text, str) else ('' if text is None else None)
+
+
+class EvaluationCascade:
+    """
+    Tier decisions and per-tier counts of one evaluation.
+
+    Args:
+        safe_templates: Regular expressions of known-safe prompts (matched at the start of the prompt)
+    """
+
+    def __init__(self, safe_templates: List[str]):
+        self.safe_templates = [re.compile(pattern) for pattern in safe_templates]
+        self._refusal = re.compile('|'.join(REFUSAL_MARKERS), re.IGNORECASE)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.counts = {tier: 0 for tier in TIERS}
+
+    def count(self, tier: str, calls: int = 1) -> None:
+        with self._lock:
+            self.counts[tier] += calls
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        avoided = counts['template'] + counts['deterministic']
+        return {**counts, 'judge_calls_avoided': avoided, 'avoided_rate': round(avoided / total, 4) if total else 0.0}
+
+    def is_safe_template(self, prompt: Any) -> bool:
+        if is_pointer(prompt):
+            prompt = prompt['preview']
+        if not isinstance(prompt, str):
+            return False
+        return any(pattern.match(prompt) for pattern in self.safe_templates)
+
+    def verdict(self, judge_name: str, outputs: Any, count: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Deterministic ``(value, rationale)`` of ``judge_name`` for ``outputs``, None to escalate.
+
+        Counts the call under the ``deterministic`` or ``escalated`` tier unless ``count`` is False.
+        """
+        text = output_text(outputs)
+        result = None
+        if is_error_response(outputs):
+            result = EMPTY_RESPONSE_VERDICTS.get(judge_name, 'no'), "Evaluation cascade: error response"
+        elif text is not None and not text.strip():
+            result = EMPTY_RESPONSE_VERDICTS.get(judge_name, 'no'), "Evaluation cascade: empty response"
+        elif (text is not None and judge_name in REFUSAL_VERDICTS
+              and len(text) <= REFUSAL_MAX_CHARS and self._refusal.search(text)):
+            result = REFUSAL_VERDICTS[judge_name], "Evaluation cascade: the response is a refusal"
+
+        if count:
+            self.count('escalated' if result is None else 'deterministic')
+        return result
@@ -0,0 +1,127 @@
+"""
+Durable checkpoints for capture files processed across several Lambda invocations.
+
+A checkpoint records how far into a capture file ingestion got (byte offset
+of the next unread line), the running record counts and endpoint statistics, the traces logged so far
+and the processing phase (``ingest`` or ``evaluate``; ``ingested`` for a
+finished shard waiting for the reducer). A follow-up invocation
+loads it and continues without re-reading or re-logging earlier records.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from endpoint_stats import merge_stats
+
+
+def checkpoint_name(s3_bucket: str, s3_key: str) -> str:
+    """Stable, filesystem/S3-safe name of a capture file's checkpoint."""
+    return hashlib.sha256(f"{s3_bucket}/{s3_key}".encode('utf-8')).hexdigest()
+
+
+class LocalCheckpointStore:
+    """Checkpoints as JSON files in a local directory. Local stand-in for the S3 store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, s3_bucket: str, s3_key: str) -> str:
+        return os.path.join(self.directory, f"{checkpoint_name(s3_bucket, s3_key)}.json")
+
+    def load(self, s3_bucket: str, s3_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(s3_bucket, s3_key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, s3_bucket: str, s3_key: str, state: Dict[str, Any]) -> None:
+        path = self._path(s3_bucket, s3_key)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def delete(self, s3_bucket: str, s3_key: str) -> None:
+        try:
+            os.remove(self._path(s3_bucket, s3_key))
+        except FileNotFoundError:
+            pass
+
+
+class S3CheckpointStore:
+    """Checkpoints as JSON objects under an S3 prefix, shared by all invocations."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def _key(self, s3_bucket: str, s3_key: str) -> str:
+        return f"{self.prefix}{checkpoint_name(s3_bucket, s3_key)}.json"
+
+    def load(self, s3_bucket: str, s3_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(s3_bucket, s3_key))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj['Body'].read())
+
+    def save(self, s3_bucket: str, s3_key: str, state: Dict[str, Any]) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(s3_bucket, s3_key),
+            Body=json.dumps(state),
+            ContentType='application/json',
+        )
+
+    def delete(self, s3_bucket: str, s3_key: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self._key(s3_bucket, s3_key))
+
+
+def checkpoint_key(s3_key: str, shard: Optional[Dict[str, Any]] = None) -> str:
+    """Key a checkpoint is stored under: the capture file, or one byte-range shard of it."""
+    if shard is None:
+        return s3_key
+    end = shard['end'] if shard['end'] is not None else ''
+    return f"{s3_key}#bytes={shard['start']}-{end}"
+
+
+def new_checkpoint(s3_bucket: str, s3_key: str, shard: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Initial state of a capture file (or shard) that has not been processed yet."""
+    return {
+        's3_bucket': s3_bucket,
+        's3_key': s3_key,
+        'shard': shard,
+        'phase': 'ingest',
+        'offset': shard['start'] if shard else 0,
+        'counts': {'total': 0, 'processed': 0, 'errors': 0, 'skipped': 0},
+        'trace_ids': [],
+        'trace_strata': {},
+        'endpoint_stats': None,
+        'invocations': 0,
+    }
+
+
+def advance_checkpoint(state: Dict[str, Any], counts: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    """
+    Checkpoint after ingesting up to ``offset``.
+
+    Args:
+        state: Checkpoint the current invocation started from
+        counts: Cumulative ``ingest_records`` counts of the current invocation
+        offset: Byte offset of the next unread line
+
+    Returns:
+        New checkpoint state; ``state`` is left unchanged
+    """
+    updated = dict(state, offset=offset)
+    updated['counts'] = {name: value + counts[name] for name, value in state['counts'].items()}
+    updated['endpoint_stats'] = merge_stats(state.get('endpoint_stats'), counts.get('endpoint_stats'))
+
+    # Trace IDs are unknown (None) when resuming from an offset without a stored checkpoint
+    if state['trace_ids'] is not None:
+        updated['trace_ids'] = state['trace_ids'] + counts['trace_ids']
+        updated['trace_strata'] = {**state['trace_strata'], **counts['trace_strata']}
+    return updated
@@ -0,0 +1,72 @@
+"""
+Per-(trace, scorer) coverage of an evaluation.
+
+Every cell of the trace x scorer matrix starts ``missing``. Scorers record
+``ok`` when they return an assessment and ``error`` when they fail, so after an
+``mlflow.genai.evaluate`` pass (complete, partial or raised) the cells still
+to do are known and a retry pass can submit just those.
+"""
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional
+
+MISSING, OK, ERROR = 'missing', 'ok', 'error'
+
+
+class CoverageMatrix:
+    """Outcome of each (trace, scorer) cell of one evaluation."""
+
+    def __init__(self):
+        self._cells: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, trace_ids: List[str], scorer_names: List[str]) -> None:
+        """Expect ``scorer_names`` to assess each of ``trace_ids``."""
+        with self._lock:
+            for trace_id in trace_ids:
+                cells = self._cells.setdefault(trace_id, {})
+                for name in scorer_names:
+                    cells.setdefault(name, MISSING)
+
+    def record(self, trace_id: Optional[str], scorer_name: str, ok: bool) -> None:
+        """Record a cell outcome. An ``ok`` cell stays ``ok``; unknown cells are ignored."""
+        with self._lock:
+            cells = self._cells.get(trace_id)
+            if cells is None or scorer_name not in cells or cells[scorer_name] == OK:
+                return
+            cells[scorer_name] = OK if ok else ERROR
+
+    def pending(self, trace_ids: List[str]) -> Dict[str, FrozenSet[str]]:
+        """Trace ID -> scorers whose cell is missing or errored, for those of ``trace_ids`` with any."""
+        with self._lock:
+            pending = {}
+            for trace_id in trace_ids:
+                names = frozenset(name for name, state in self._cells.get(trace_id, {}).items() if state != OK)
+                if names:
+                    pending[trace_id] = names
+            return pending
+
+    def summary(self) -> Dict[str, Any]:
+        """Cell counts per scorer and overall coverage (share of ``ok`` cells)."""
+        with self._lock:
+            per_scorer: Dict[str, Dict[str, int]] = {}
+            for cells in self._cells.values():
+                for name, state in cells.items():
+                    per_scorer.setdefault(name, {OK: 0, ERROR: 0, MISSING: 0})[state] += 1
+
+        total = sum(sum(counts.values()) for counts in per_scorer.values())
+        ok = sum(counts[OK] for counts in per_scorer.values())
+        return {
+            'traces': len(self._cells),
+            'cells': total,
+            'coverage': round(ok / total, 4) if total else 1.0,
+            'scorers': per_scorer,
+        }
+
+    def incomplete(self) -> Dict[str, Dict[str, str]]:
+        """Trace ID -> scorer -> state, for the cells that are not ``ok``."""
+        with self._lock:
+            return {
+                trace_id: {name: state for name, state in cells.items() if state != OK}
+                for trace_id, cells in self._cells.items()
+                if any(state != OK for state in cells.values())
+            }
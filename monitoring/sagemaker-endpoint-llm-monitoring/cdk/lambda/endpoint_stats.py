@@ -0,0 +1,226 @@
+"""
+Streaming endpoint latency/throughput analytics from data capture records.
+
+``EndpointStats`` aggregates one pass over parsed capture records: request and
+response payload sizes, requested and generated token counts, requests per
+minute and responses per status code, plus time to first token and
+inter-chunk gaps of streamed responses. Distributions are kept in
+``QuantileSketch``es (log-bucketed, DDSketch style), which have a bounded
+relative error and merge exactly, so stats of shards, files and windows can be
+combined without revisiting records. The serialised form is plain JSON.
+"""
+import math
+from typing import Any, Dict, Optional
+
+# Characters per token used to estimate generated tokens from response text
+CHARS_PER_TOKEN = 4
+
+# Quantiles reported in summaries
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch for non-negative values.
+
+    Values are counted in logarithmic buckets of width ``gamma``, so any
+    quantile is returned within ``relative_accuracy`` of the true value.
+    Sketches with the same accuracy merge by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile ``q`` (0-1), None for an empty sketch."""
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different accuracies")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(index): count for index, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.bins = {int(index): count for index, count in data['bins'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.total = data['total']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class EndpointStats:
+    """
+    Aggregated traffic statistics of one or more capture files.
+
+    Fed with parsed capture records (see ``parse_data_capture_record``), which
+    carry the raw ``request_bytes``/``response_bytes`` sizes next to the
+    decoded payloads.
+    """
+
+    SKETCHES = ('request_bytes', 'response_bytes', 'max_new_tokens', 'generated_tokens', 'ttft_ms', 'inter_chunk_ms')
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {name: QuantileSketch(relative_accuracy) for name in self.SKETCHES}
+        self.requests = 0
+        self.errors = 0
+        self.status_codes: Dict[str, int] = {}
+        self.requests_per_minute: Dict[str, int] = {}
+
+    def add(self, parsed_record: Dict) -> None:
+        self.requests += 1
+        if parsed_record.get('is_error'):
+            self.errors += 1
+        status = str(parsed_record.get('status_code', 'unknown'))
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+
+        # ISO-8601 inferenceTime truncated to the minute
+        timestamp = parsed_record.get('timestamp')
+        if timestamp:
+            minute = timestamp[:16]
+            self.requests_per_minute[minute] = self.requests_per_minute.get(minute, 0) + 1
+
+        for name in ('request_bytes', 'response_bytes'):
+            if parsed_record.get(name) is not None:
+                self.sketches[name].add(parsed_record[name])
+
+        request = parsed_record.get('request')
+        parameters = request.get('parameters') if isinstance(request, dict) else None
+        if isinstance(parameters, dict) and isinstance(parameters.get('max_new_tokens'), (int, float)):
+            self.sketches['max_new_tokens'].add(parameters['max_new_tokens'])
+
+        response = parsed_record.get('response')
+        if not parsed_record.get('is_error') and response is not None:
+            text = response.get('generated_text') if isinstance(response, dict) else None
+            if text is None and isinstance(response, list) and response and isinstance(response[0], dict):
+                text = response[0].get('generated_text')
+            if isinstance(text, str):
+                self.sketches['generated_tokens'].add(len(text) / CHARS_PER_TOKEN)
+
+        stream = parsed_record.get('stream')
+        if stream:
+            if stream.get('ttft_ms') is not None:
+                self.sketches['ttft_ms'].add(stream['ttft_ms'])
+            for gap in stream.get('inter_chunk_ms', ()):
+                self.sketches['inter_chunk_ms'].add(gap)
+
+    def merge(self, other: 'EndpointStats') -> None:
+        for name in self.SKETCHES:
+            self.sketches[name].merge(other.sketches[name])
+        self.requests += other.requests
+        self.errors += other.errors
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+        for minute, count in other.requests_per_minute.items():
+            self.requests_per_minute[minute] = self.requests_per_minute.get(minute, 0) + count
+
+    def summary(self) -> Dict[str, float]:
+        """Flat metrics for logging: counts, rates and sketch quantiles."""
+        summary: Dict[str, float] = {
+            'requests': self.requests,
+            'error_rate': self.errors / self.requests if self.requests else 0.0,
+        }
+        for status, count in self.status_codes.items():
+            summary[f"status_{status}_rate"] = count / self.requests
+
+        if self.requests_per_minute:
+            per_minute = list(self.requests_per_minute.values())
+            summary['requests_per_minute_mean'] = sum(per_minute) / len(per_minute)
+            summary['requests_per_minute_peak'] = max(per_minute)
+            summary['active_minutes'] = len(per_minute)
+
+        for name, sketch in self.sketches.items():
+            if sketch.count == 0:
+                continue
+            summary[f"{name}_mean"] = sketch.total / sketch.count
+            summary[f"{name}_max"] = sketch.max
+            for q in SUMMARY_QUANTILES:
+                summary[f"{name}_p{int(q * 100)}"] = sketch.quantile(q)
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'sketches': {name: sketch.to_dict() for name, sketch in self.sketches.items()},
+            'requests': self.requests,
+            'errors': self.errors,
+            'status_codes': dict(self.status_codes),
+            'requests_per_minute': dict(self.requests_per_minute),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EndpointStats':
+        stats = cls(data['relative_accuracy'])
+        # Sketches missing from older checkpoints start empty
+        stats.sketches.update({name: QuantileSketch.from_dict(sketch) for name, sketch in data['sketches'].items()})
+        stats.requests = data['requests']
+        stats.errors = data['errors']
+        stats.status_codes = dict(data['status_codes'])
+        stats.requests_per_minute = dict(data['requests_per_minute'])
+        return stats
+
+
+def merge_stats(*serialized: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Merge serialised ``EndpointStats``, ignoring missing ones. None when all are missing."""
+    merged = None
+    for data in serialized:
+        if data is None:
+            continue
+        if merged is None:
+            merged = EndpointStats.from_dict(data)
+        else:
+            merged.merge(EndpointStats.from_dict(data))
+    return merged.to_dict() if merged is not None else None
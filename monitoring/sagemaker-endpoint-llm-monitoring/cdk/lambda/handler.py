@@ -7,20 +7,55 @@ This function:
 3. Logs traces to MLflow with spans
 4. Runs GenAI evaluations on the traces
 """
+import time
+
+# Container init timing starts before the heavy imports below
+_MODULE_INIT_STARTED = time.perf_counter()
+
 import json
 import logging
 import os
 import base64
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import io
+import inspect
+import resource
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Dict, FrozenSet, List, Any, Optional, Iterator, Iterable, Tuple, Callable
+from datetime import datetime, timezone
 
 import boto3
 import mlflow
-from mlflow.genai import scorer
-from mlflow.genai.judges import make_judge
-from mlflow.genai.scorers import Safety, RelevanceToQuery, Fluency, Guidelines
+from mlflow.entities import LiveSpan, Span, SpanStatusCode, Trace, TraceData, TraceInfo, TraceLocation, TraceState
+from mlflow.tracing.client import TracingClient
 from typing import Literal
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from judge_cache import JudgeResultCache, S3CacheBackend, SQLiteCacheBackend, make_cache_key
+from judge_scheduler import JudgeScheduler, TokenBucket
+from ingestion_index import IngestionIndex, S3IndexBackend, SQLiteIndexBackend
+from sampling import HourlyBudget, S3HourlyBudget, plan_judge_sample, stratum_key
+from checkpoint import LocalCheckpointStore, S3CheckpointStore, advance_checkpoint, checkpoint_key, new_checkpoint
+from sharding import merge_shard_states, plan_shards
+from metrics import MetricsRecorder
+from endpoint_stats import EndpointStats, merge_stats
+from streaming import looks_like_stream, reassemble_stream
+from capture_reader import CaptureLineReader
+from heuristics import compute_heuristics
+from cascade import EvaluationCascade
+from batch_judge import BATCH_CRITERIA, JUDGE_MODE as BATCH_JUDGE_MODE, YES_NO, BatchJudge
+from coverage import CoverageMatrix
+from parquet_sink import LocalParquetStore, ParquetSink, S3ParquetStore
+from routing import ExperimentRouter, endpoint_from_key
+from spool import LocalSpoolStore, S3SpoolStore, TraceSpool, TrackingCircuit
+from trace_export import BatchExportUnsupported, OtlpTraceExporter, new_root_span
+from payload_store import LocalPayloadStore, PayloadOffloader, S3PayloadStore, has_pointer, is_pointer, rehydrate_payloads
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -30,11 +65,22 @@ s3_client = boto3.client('s3')
 
 # Environment variables
 MLFLOW_TRACKING_URI = os.environ['MLFLOW_TRACKING_URI']
-MLFLOW_EXPERIMENT_NAME = os.environ['MLFLOW_EXPERIMENT_NAME']
-SAGEMAKER_ENDPOINT_NAME = os.environ['SAGEMAKER_ENDPOINT_NAME']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
 DATA_CAPTURE_BUCKET = os.environ['DATA_CAPTURE_BUCKET']
 
+# Experiment of each endpoint: its entry in the ENDPOINT_EXPERIMENTS JSON object (endpoint -> experiment name), else
+# MLFLOW_EXPERIMENT_NAME_TEMPLATE with '{endpoint}' replaced (default MLFLOW_EXPERIMENT_NAME, one experiment for all).
+# The default endpoint (below) logs to MLFLOW_EXPERIMENT_NAME unless ENDPOINT_EXPERIMENTS names another experiment
+MLFLOW_EXPERIMENT_NAME = os.environ['MLFLOW_EXPERIMENT_NAME']
+MLFLOW_EXPERIMENT_NAME_TEMPLATE = os.environ.get('MLFLOW_EXPERIMENT_NAME_TEMPLATE') or MLFLOW_EXPERIMENT_NAME
+ENDPOINT_EXPERIMENTS = json.loads(os.environ.get('ENDPOINT_EXPERIMENTS', '{}'))
+# Endpoint of capture files whose key does not follow the data capture layout
+SAGEMAKER_ENDPOINT_NAME = os.environ.get('SAGEMAKER_ENDPOINT_NAME', '')
+DEFAULT_ENDPOINT = SAGEMAKER_ENDPOINT_NAME or 'unknown'
+# JSON object of per-endpoint overrides of INGEST_MAX_WORKERS, INGEST_MAX_PENDING, JUDGE_MAX_CONCURRENCY,
+# JUDGE_REQUESTS_PER_MINUTE, JUDGE_TOKENS_PER_MINUTE, JUDGE_BUDGET_PER_FILE and JUDGE_BUDGET_PER_HOUR
+ENDPOINT_SETTINGS = json.loads(os.environ.get('ENDPOINT_SETTINGS', '{}'))
+
 # MLflow evaluation model parameters
 MLFLOW_EVALUATION_MODEL_PARAM = {
     "temperature": 0,
@@ -44,18 +90,192 @@ MLFLOW_EVALUATION_MODEL_PARAM = {
     "stop_sequences": ["}"]
 }
 
+# JSON parser for capture records: 'auto' (orjson when installed), 'orjson' or 'stdlib'
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
+# Data capture files handled by the processor (SageMaker writes .jsonl, archived copies may be gzipped)
+CAPTURE_FILE_SUFFIXES = ('.jsonl', '.jsonl.gz')
+
+# Chunk size used when streaming capture files from S3
+S3_READ_CHUNK_SIZE = int(os.environ.get('S3_READ_CHUNK_SIZE', 64 * 1024))
+
+# Concurrent trace ingestion: worker threads and max records in flight before reading pauses
+INGEST_MAX_WORKERS = int(os.environ.get('INGEST_MAX_WORKERS', 8))
+INGEST_MAX_PENDING = int(os.environ.get('INGEST_MAX_PENDING', INGEST_MAX_WORKERS * 4))
+# Records per second each container or backfill process sends to MLflow (0 = unlimited)
+INGEST_RECORDS_PER_SECOND = float(os.environ.get('INGEST_RECORDS_PER_SECOND', 0))
+
+# Async trace export: wait for the export queue after this many records or seconds (TRACE_FLUSH_EVERY_RECORDS=0 writes each trace synchronously)
+TRACE_FLUSH_EVERY_RECORDS = int(os.environ.get('TRACE_FLUSH_EVERY_RECORDS', 100))
+TRACE_FLUSH_MAX_WAIT_SECONDS = float(os.environ.get('TRACE_FLUSH_MAX_WAIT_SECONDS', 5))
+# Trace export at each flush: 'batch' (the spans of a flush in one OTLP request per experiment; needs an MLflow 3.4+
+# tracking server with a database backend, falls back to 'async' otherwise) or 'async' (a trace per export, through MLflow's queue)
+TRACE_EXPORT_MODE = os.environ.get('TRACE_EXPORT_MODE', 'batch')
+# Traces logged by this container kept in memory for evaluation; older ones are fetched by ID (0 = always fetch)
+LOGGED_TRACES_MAX_SIZE = int(os.environ.get('LOGGED_TRACES_MAX_SIZE', 5000))
+# Trace IDs per search_traces request when fetching traces by ID
+SEARCH_TRACES_MAX_IDS = 100
+
+# LLM-judge result cache: 'sqlite' (per container, in /tmp), 's3' (shared) or 'none'
+JUDGE_CACHE_BACKEND = os.environ.get('JUDGE_CACHE_BACKEND', 'sqlite')
+JUDGE_CACHE_PATH = os.environ.get('JUDGE_CACHE_PATH', '/tmp/judge_cache.sqlite')
+JUDGE_CACHE_S3_PREFIX = os.environ.get('JUDGE_CACHE_S3_PREFIX', 'mlflow-judge-cache/')
+JUDGE_CACHE_TTL_SECONDS = float(os.environ.get('JUDGE_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+JUDGE_CACHE_MAX_ENTRIES = int(os.environ.get('JUDGE_CACHE_MAX_ENTRIES', 100000))
+
+# Judge call scheduling: concurrent calls (adapted down on throttling), Bedrock quotas (0 = unlimited), attempts per call
+JUDGE_MAX_CONCURRENCY = int(os.environ.get('JUDGE_MAX_CONCURRENCY', 8))
+JUDGE_REQUESTS_PER_MINUTE = float(os.environ.get('JUDGE_REQUESTS_PER_MINUTE', 0))
+JUDGE_TOKENS_PER_MINUTE = float(os.environ.get('JUDGE_TOKENS_PER_MINUTE', 0))
+JUDGE_MAX_ATTEMPTS = int(os.environ.get('JUDGE_MAX_ATTEMPTS', 4))
+
+# Batched judging: short traces judged JUDGE_BATCH_SIZE at a time in one Bedrock call per scorer (1 = one call per trace)
+JUDGE_BATCH_SIZE = int(os.environ.get('JUDGE_BATCH_SIZE', 1))
+JUDGE_BATCH_MAX_ITEM_CHARS = int(os.environ.get('JUDGE_BATCH_MAX_ITEM_CHARS', 2000))
+JUDGE_BATCH_MAX_TOKENS_PER_ITEM = int(os.environ.get('JUDGE_BATCH_MAX_TOKENS_PER_ITEM', 150))
+
+# mlflow.genai.evaluate worker threads; the scheduler decides how many judge calls actually run at once
+os.environ.setdefault('MLFLOW_GENAI_EVAL_MAX_WORKERS', str(JUDGE_MAX_CONCURRENCY))
+
+# Index of ingested event IDs used to skip re-delivered records: 'sqlite' (per container), 's3' (shared) or 'none'
+INGESTION_INDEX_BACKEND = os.environ.get('INGESTION_INDEX_BACKEND', 'sqlite')
+INGESTION_INDEX_PATH = os.environ.get('INGESTION_INDEX_PATH', '/tmp/ingestion_index.sqlite')
+INGESTION_INDEX_S3_PREFIX = os.environ.get('INGESTION_INDEX_S3_PREFIX', 'mlflow-ingestion-index/')
+INGESTION_INDEX_BLOOM_CAPACITY = int(os.environ.get('INGESTION_INDEX_BLOOM_CAPACITY', 1000000))
+
+# LLM-judge sampling budgets in traces (0 = judge every trace); hourly budget kept in 'memory' or shared via 's3'
+JUDGE_BUDGET_PER_FILE = int(os.environ.get('JUDGE_BUDGET_PER_FILE', 0))
+JUDGE_BUDGET_PER_HOUR = int(os.environ.get('JUDGE_BUDGET_PER_HOUR', 0))
+JUDGE_BUDGET_BACKEND = os.environ.get('JUDGE_BUDGET_BACKEND', 'memory')
+JUDGE_BUDGET_S3_PREFIX = os.environ.get('JUDGE_BUDGET_S3_PREFIX', 'mlflow-judge-budget/')
+
+# Checkpoints of partly processed files: 's3' (shared), 'local' (per container, in /tmp) or 'none' (offset carried in the event only)
+CHECKPOINT_BACKEND = os.environ.get('CHECKPOINT_BACKEND', 'none')
+CHECKPOINT_LOCAL_DIR = os.environ.get('CHECKPOINT_LOCAL_DIR', '/tmp/checkpoints')
+CHECKPOINT_S3_PREFIX = os.environ.get('CHECKPOINT_S3_PREFIX', 'mlflow-checkpoints/')
+CHECKPOINT_EVERY_RECORDS = int(os.environ.get('CHECKPOINT_EVERY_RECORDS', 1000))
+# Invocation time kept back for evaluation; ingestion stops and checkpoints once less than this remains (0 = never stop early).
+# A stopped file returns 202 with 'continue', so only enable this when the state machine loops on 'continue'
+CHECKPOINT_TIME_RESERVE_SECONDS = float(os.environ.get('CHECKPOINT_TIME_RESERVE_SECONDS', 0))
+
+# Target size of the byte-range shards a capture file is split into in 'plan' mode
+SHARD_SIZE_BYTES = int(os.environ.get('SHARD_SIZE_BYTES', 64 * 1024 * 1024))
+
+# 'window' mode: evaluate the traces of several small files together once a window holds this many traces or is this old
+WINDOW_MAX_TRACES = int(os.environ.get('WINDOW_MAX_TRACES', 500))
+WINDOW_MAX_SECONDS = float(os.environ.get('WINDOW_MAX_SECONDS', 300))
+
+# Endpoint traffic statistics (payload sizes, tokens, request rate, status codes), logged as one MLflow run per file or window
+ENDPOINT_STATS_ENABLED = os.environ.get('ENDPOINT_STATS_ENABLED', 'true').lower() == 'true'
+ENDPOINT_STATS_RELATIVE_ACCURACY = float(os.environ.get('ENDPOINT_STATS_RELATIVE_ACCURACY', 0.01))
+
+# Per-stage timings and counts, written to the logs as CloudWatch Embedded Metric Format
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'SageMakerLLMMonitoring')
+
+# Evaluation mode: 'full' sends every judged trace to every judge, 'cascade' settles clear cases (safe templates, empty/error responses, relevance of refusals) without Bedrock
+EVALUATION_MODE = os.environ.get('EVALUATION_MODE', 'full')
+# JSON list of regular expressions of known-safe prompts, matched at the start of the prompt and never judged
+EVALUATION_CASCADE_SAFE_TEMPLATES = json.loads(os.environ.get('EVALUATION_CASCADE_SAFE_TEMPLATES', '[]'))
+
+# mlflow.genai.evaluate passes per evaluation; passes after the first only re-submit the (trace, scorer) cells that are missing or failed
+EVALUATION_MAX_ATTEMPTS = int(os.environ.get('EVALUATION_MAX_ATTEMPTS', 3))
+
+# Heuristic quality signals (lengths, repetition, truncation, empty output, refusals) computed per trace flush and set as span attributes
+HEURISTICS_ENABLED = os.environ.get('HEURISTICS_ENABLED', 'true').lower() == 'true'
+
+# Span payloads (prompt, response fields) above this size are stored gzipped in 's3' or 'local' (/tmp) and replaced by a pointer with a preview; 'none' (default) keeps them inline
+PAYLOAD_OFFLOAD_BACKEND = os.environ.get('PAYLOAD_OFFLOAD_BACKEND', 'none')
+PAYLOAD_OFFLOAD_THRESHOLD_BYTES = int(os.environ.get('PAYLOAD_OFFLOAD_THRESHOLD_BYTES', 16 * 1024))
+PAYLOAD_PREVIEW_CHARS = int(os.environ.get('PAYLOAD_PREVIEW_CHARS', 1000))
+PAYLOAD_LOCAL_DIR = os.environ.get('PAYLOAD_LOCAL_DIR', '/tmp/payloads')
+PAYLOAD_S3_PREFIX = os.environ.get('PAYLOAD_S3_PREFIX', 'mlflow-payloads/')
+
+# Spool of records MLflow could not take: sealed segments kept in 's3' (shared), 'local' (/tmp) or 'none' (default, records are dropped)
+SPOOL_BACKEND = os.environ.get('SPOOL_BACKEND', 'none')
+SPOOL_LOCAL_DIR = os.environ.get('SPOOL_LOCAL_DIR', '/tmp/spool')
+SPOOL_S3_PREFIX = os.environ.get('SPOOL_S3_PREFIX', 'mlflow-spool/')
+SPOOL_SEGMENT_MAX_RECORDS = int(os.environ.get('SPOOL_SEGMENT_MAX_RECORDS', 1000))
+# A tracking server write or health check slower than the budget, or failing, spools records for SPOOL_RETRY_AFTER_SECONDS
+TRACKING_LATENCY_BUDGET_SECONDS = float(os.environ.get('TRACKING_LATENCY_BUDGET_SECONDS', 5))
+SPOOL_RETRY_AFTER_SECONDS = float(os.environ.get('SPOOL_RETRY_AFTER_SECONDS', 60))
+# 'replay' mode: records per second written back to MLflow from the spool, and invocation time left when it stops
+SPOOL_REPLAY_RECORDS_PER_SECOND = float(os.environ.get('SPOOL_REPLAY_RECORDS_PER_SECOND', 20))
+SPOOL_REPLAY_TIME_RESERVE_SECONDS = float(os.environ.get('SPOOL_REPLAY_TIME_RESERVE_SECONDS', 60))
+
+# Columnar copy of parsed records as Parquet partitioned by endpoint and date: 's3' (data capture bucket), 'local' (/tmp) or 'none'
+PARQUET_SINK_BACKEND = os.environ.get('PARQUET_SINK_BACKEND', 'none')
+PARQUET_LOCAL_DIR = os.environ.get('PARQUET_LOCAL_DIR', '/tmp/parquet')
+PARQUET_S3_PREFIX = os.environ.get('PARQUET_S3_PREFIX', 'capture-parquet/')
+PARQUET_MAX_ROWS_PER_FILE = int(os.environ.get('PARQUET_MAX_ROWS_PER_FILE', 50000))
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get('PARQUET_ROW_GROUP_SIZE', 10000))
+
+metrics = MetricsRecorder(METRICS_NAMESPACE, enabled=METRICS_ENABLED)
+
+_judge_cache: Optional[JudgeResultCache] = None
+_hourly_budgets: Dict[str, Any] = {}
+_ingestion_index: Optional[IngestionIndex] = None
+_judge_schedulers: Dict[str, JudgeScheduler] = {}
+_checkpoint_store: Optional[Any] = None
+_tracking_uri_set = False
+_experiment_router: Optional[ExperimentRouter] = None
+# Experiment mlflow.genai.evaluate logs to, switched only when the evaluated endpoint changes
+_active_experiment_id: Optional[str] = None
+_evaluation_scorers: Optional[Dict[str, Any]] = None
+_payload_offloader: Optional[PayloadOffloader] = None
+_evaluation_cascade: Optional[EvaluationCascade] = None
+_batch_judge: Optional[BatchJudge] = None
+_evaluation_coverage: Optional[CoverageMatrix] = None
+_evaluation_endpoint: Optional[str] = None
+_bedrock_client: Optional[Any] = None
+_trace_spool: Optional[TraceSpool] = None
+_tracking_circuit: Optional[TrackingCircuit] = None
+_parquet_store: Optional[Any] = None
+_trace_exporter: Optional[OtlpTraceExporter] = None
+# Set once the tracking server refused a batched export; later flushes use the async exporter
+_batch_export_unsupported = False
+# Ingest worker threads can reach the spool at the same time; a second instance would seal the first one's segment
+_spool_init_lock = threading.Lock()
+# Trace ID -> trace logged by this container, most recent last, filled by the ingest worker threads
+_logged_traces: 'OrderedDict[str, Trace]' = OrderedDict()
+_logged_traces_lock = threading.Lock()
+
+# Warm-container bookkeeping for init vs invocation timing
+_cold_start = True
+_lazy_init_seconds = 0.0
+
+if TRACE_FLUSH_EVERY_RECORDS > 0:
+    # Let the MLflow exporter ship traces from its background queue; the writer waits for it at each flush
+    os.environ.setdefault('MLFLOW_ENABLE_ASYNC_TRACE_LOGGING', 'true')
+
+
+def get_json_loads(backend: str) -> Callable[[Any], Any]:
+    """
+    JSON parser for the given backend name.
+
+    Both parsers accept str or bytes, and orjson's decode errors subclass
+    ``json.JSONDecodeError``, so they are interchangeable.
+    """
+    if backend in ('auto', 'orjson') and orjson is not None:
+        return orjson.loads
+    if backend == 'orjson':
+        logger.warning("orjson is not installed, using the stdlib json parser")
+    return json.loads
+
+
+json_loads = get_json_loads(JSON_BACKEND)
+
 
 def decode_base64_data(encoded_data: str) -> Any:
     """Decode base64 encoded data and parse as JSON if possible."""
     try:
         decoded_bytes = base64.b64decode(encoded_data)
-        decoded_str = decoded_bytes.decode('utf-8')
 
-        # Try to parse as JSON
+        # Try to parse as JSON straight from bytes, fall back to the decoded text
         try:
-            return json.loads(decoded_str)
-        except json.JSONDecodeError:
-            return decoded_str
+            return json_loads(decoded_bytes)
+        except ValueError:
+            return decoded_bytes.decode('utf-8')
     except Exception as e:
         logger.error(f"Error decoding base64 data: {e}")
         return f"Error decoding: {str(e)}"
@@ -77,12 +297,13 @@ def parse_data_capture_record(record: Dict) -> Dict:
     if endpoint_input:
         encoding = endpoint_input.get("encoding", "")
         data = endpoint_input.get("data", "")
+        parsed_record["request_bytes"] = len(data)
 
         if encoding == "BASE64":
             parsed_record["request"] = decode_base64_data(data)
         else:
             try:
-                parsed_record["request"] = json.loads(data) if data else {}
+                parsed_record["request"] = json_loads(data) if data else {}
             except:
                 parsed_record["request"] = data
 
@@ -91,15 +312,25 @@ def parse_data_capture_record(record: Dict) -> Dict:
         encoding = endpoint_output.get("encoding", "")
         data = endpoint_output.get("data", "")
         observed_content_type = endpoint_output.get("observedContentType")
+        parsed_record["response_bytes"] = len(data)
 
         if encoding == "BASE64":
             parsed_record["response"] = decode_base64_data(data)
         else:
             try:
-                parsed_record["response"] = json.loads(data) if data else {}
+                parsed_record["response"] = json_loads(data) if data else {}
             except:
                 parsed_record["response"] = data
 
+        # Streamed responses are captured as concatenated SSE/JSON Lines chunks
+        if looks_like_stream(parsed_record["response"], observed_content_type):
+            parsed_record["response"], parsed_record["stream"] = reassemble_stream(
+                parsed_record["response"], json_loads, parsed_record["timestamp"]
+            )
+            metrics.add('StreamedRecords')
+            if "ttft_ms" in parsed_record["stream"]:
+                metrics.observe('TimeToFirstToken', parsed_record["stream"]["ttft_ms"])
+
         # Determine if this is an error response
         response_data = parsed_record.get("response", {})
         if isinstance(response_data, dict):
@@ -118,15 +349,76 @@ def parse_data_capture_record(record: Dict) -> Dict:
     return parsed_record
 
 
-def log_trace_to_mlflow(event_data: Dict, s3_file_key: str) -> None:
+def line_reader(s3_object: Dict, s3_key: str, start_offset: int = 0) -> CaptureLineReader:
+    """Line reader over an S3 object body, reading ``S3_READ_CHUNK_SIZE`` bytes at a time."""
+    return CaptureLineReader(s3_object, s3_key, start_offset, chunk_size=S3_READ_CHUNK_SIZE, metrics=metrics)
+
+
+def open_capture_file(
+    s3_bucket: str,
+    s3_key: str,
+    start_offset: int = 0,
+    end_offset: Optional[int] = None,
+) -> CaptureLineReader:
+    """
+    Open a data capture file, or a byte range of it, for streaming.
+
+    Args:
+        s3_bucket: Bucket of the capture file
+        s3_key: S3 key of the capture file
+        start_offset: Uncompressed byte offset to resume from
+        end_offset: Byte offset to stop at (exclusive), None for the end of
+            the file. Ignored for compressed files, which are never sharded
+
+    Returns:
+        Line reader positioned at ``start_offset``
+    """
+    if end_offset is not None and start_offset >= end_offset:
+        return line_reader({'Body': io.BytesIO(b'')}, s3_key, start_offset)
+
+    # Plain objects are read with a ranged GET; compressed ones from the start
+    if (start_offset > 0 or end_offset is not None) and not s3_key.endswith('.gz'):
+        last_byte = end_offset - 1 if end_offset is not None else ''
+        try:
+            obj = s3_client.get_object(Bucket=s3_bucket, Key=s3_key, Range=f"bytes={start_offset}-{last_byte}")
+        except s3_client.exceptions.ClientError as e:
+            # Resuming exactly at the end of the file
+            if e.response['Error']['Code'] != 'InvalidRange':
+                raise
+            return line_reader({'Body': io.BytesIO(b'')}, s3_key, start_offset)
+        if obj.get('ContentEncoding') != 'gzip':
+            return line_reader(obj, s3_key, start_offset)
+        obj['Body'].close()
+
+    obj = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
+    return line_reader(obj, s3_key, start_offset)
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Peak resident set size of the process in MB.
+
+    Lambda reuses warm containers, so this is the high-water mark since the
+    container started, which is the number to size the function memory against.
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def trace_span_fields(event_data: Dict, s3_file_key: str, endpoint: Optional[str] = None) -> Dict[str, Any]:
     """
-    Log a single inference event as an MLflow trace with spans.
+    Root span of the trace of an inference event: its experiment, inputs, outputs, attributes and error status.
 
     Args:
         event_data: Parsed data capture event
         s3_file_key: S3 key of the source file
+        endpoint: Endpoint of the file, derived from ``s3_file_key`` when omitted
+
+    Returns:
+        Dict with ``experiment_id``, ``inputs``, ``outputs``, ``attributes`` and ``is_error``
     """
     logger.info(f'Processing event to log mlflow trace: {event_data.get("event_id")}')
+    endpoint = endpoint or endpoint_for_key(s3_file_key)
+    experiment_id = get_experiment_id(endpoint)
 
     # Extract data
     event_id = event_data.get('event_id', 'unknown')
@@ -142,254 +434,2219 @@ def log_trace_to_mlflow(event_data: Dict, s3_file_key: str) -> None:
     additional_trace_attr = {
         "s3_bucket_name": DATA_CAPTURE_BUCKET,
         "s3_file_key": s3_file_key,
-        "sagemaker_endpoint_name": SAGEMAKER_ENDPOINT_NAME,
+        "sagemaker_endpoint_name": endpoint,
         "event_id": event_id,
         "inference_time": inference_time,
         "status_code": str(status_code),
     }
 
-    # Create trace with span
-    # Use event_id as request_id for idempotency - prevents duplicate traces on retry
-    with mlflow.start_span(name=s3_file_key) as span:
-        # Set inputs
-        span.set_inputs({
-            "prompt": input_data.get('inputs', ''),
+    # Streaming latency, for SLOs over streamed invocations
+    stream = event_data.get('stream')
+    if stream:
+        additional_trace_attr["streamed"] = True
+        additional_trace_attr["stream_chunks"] = stream["chunks"]
+        for name in ('ttft_ms', 'stream_duration_ms'):
+            if name in stream:
+                additional_trace_attr[name] = round(stream[name], 3)
+        gaps = sorted(stream.get('inter_chunk_ms', []))
+        if gaps:
+            additional_trace_attr["inter_chunk_ms_p50"] = round(gaps[len(gaps) // 2], 3)
+            additional_trace_attr["inter_chunk_ms_p99"] = round(gaps[min(len(gaps) - 1, int(len(gaps) * 0.99))], 3)
+            additional_trace_attr["inter_chunk_ms_max"] = round(gaps[-1], 3)
+
+    # Heuristic signals, computed together for the records of one flush
+    for name, value in event_data.get('heuristics', {}).items():
+        additional_trace_attr[f"heuristic_{name}"] = value
+
+    # Large prompts and generations go to the payload store; the span keeps a pointer and a preview
+    prompt, output_data = offload_span_payloads(input_data.get('inputs', ''), output_data)
+
+    return {
+        'experiment_id': experiment_id,
+        'inputs': {
+            "prompt": prompt,
             "parameters": input_data.get('parameters', {})
-        })
+        },
+        'outputs': output_data,
+        'attributes': additional_trace_attr,
+        'is_error': is_error,
+    }
+
+
+def log_trace_to_mlflow(event_data: Dict, s3_file_key: str, endpoint: Optional[str] = None) -> str:
+    """
+    Log a single inference event as an MLflow trace with spans, in the experiment of its endpoint.
+
+    Args:
+        event_data: Parsed data capture event
+        s3_file_key: S3 key of the source file
+        endpoint: Endpoint of the file, derived from ``s3_file_key`` when omitted
 
-        # Set attributes
-        span.set_attributes(additional_trace_attr)
+    Returns:
+        ID of the logged trace
+    """
+    fields = trace_span_fields(event_data, s3_file_key, endpoint)
 
-        # Set status for errors
-        if is_error:
-            span.set_status("ERROR")
+    # Create trace with span, in the endpoint's experiment rather than the active one,
+    # so files of different endpoints need no set_experiment switch
+    # Re-delivered event IDs are filtered out by the ingestion index before this point
+    span = mlflow.start_span_no_context(
+        name=s3_file_key,
+        inputs=fields['inputs'],
+        attributes=fields['attributes'],
+        experiment_id=fields['experiment_id'],
+    )
 
-        # Set outputs
-        span.set_outputs(output_data)
+    # Set outputs, and the status for errors
+    span.end(outputs=fields['outputs'], status="ERROR" if fields['is_error'] else None)
+    if isinstance(span, LiveSpan):
+        remember_trace(trace_of_span(span.to_immutable_span(), fields['experiment_id']))
 
-    logger.info(f'Logged trace for event {event_id}')
+    logger.info(f'Logged trace for event {event_data.get("event_id", "unknown")}')
+    return span.trace_id
 
 
-def lambda_handler(event: Dict, context: Any) -> Dict:
+def build_trace_span(event_data: Dict, s3_file_key: str, endpoint: Optional[str] = None) -> Tuple[str, Span]:
     """
-    Lambda handler for processing SageMaker data capture files.
+    The finished root span of the trace of an inference event, for batched export.
 
-    Args:
-        event: Lambda event containing S3 bucket and key information
-        context: Lambda context
+    Returns:
+        (experiment ID, span)
+    """
+    fields = trace_span_fields(event_data, s3_file_key, endpoint)
+    span = new_root_span(
+        s3_file_key,
+        fields['inputs'],
+        fields['outputs'],
+        fields['attributes'],
+        fields['experiment_id'],
+        is_error=fields['is_error'],
+    )
+    return fields['experiment_id'], span
+
+
+def trace_of_span(root: Any, experiment_id: str) -> Trace:
+    """The trace made of a single finished root span, as search_traces returns it."""
+    is_error = root.status.status_code == SpanStatusCode.ERROR
+    return Trace(
+        info=TraceInfo(
+            trace_id=root.trace_id,
+            trace_location=TraceLocation.from_experiment_id(experiment_id),
+            request_time=root.start_time_ns // 1_000_000,
+            state=TraceState.ERROR if is_error else TraceState.OK,
+            execution_duration=root.end_time_ns // 1_000_000 - root.start_time_ns // 1_000_000,
+            tags={'mlflow.traceName': root.name},
+        ),
+        data=TraceData(spans=[root]),
+    )
+
+
+def remember_trace(trace: Trace) -> None:
+    """Keep a logged trace for the evaluation of its file, evicting the oldest beyond ``LOGGED_TRACES_MAX_SIZE``."""
+    if LOGGED_TRACES_MAX_SIZE <= 0:
+        return
+
+    with _logged_traces_lock:
+        _logged_traces[trace.info.trace_id] = trace
+        _logged_traces.move_to_end(trace.info.trace_id)
+        while len(_logged_traces) > LOGGED_TRACES_MAX_SIZE:
+            _logged_traces.popitem(last=False)
+
+
+def attach_heuristics(parsed_records: List[Dict]) -> None:
+    """Compute the heuristic signals of a batch of records in one pass and store them on the records."""
+    if not HEURISTICS_ENABLED or not parsed_records:
+        return
+
+    try:
+        with metrics.timer('Heuristics'):
+            signals = compute_heuristics(parsed_records)
+    except Exception as e:
+        logger.warning(f"Could not compute heuristics for {len(parsed_records)} records: {e}")
+        return
+
+    for parsed_record, record_signals in zip(parsed_records, signals):
+        if record_signals is None:
+            continue
+        parsed_record['heuristics'] = record_signals
+        for name, metric in (('truncated', 'TruncatedResponses'), ('empty_output', 'EmptyResponses'), ('refusal', 'Refusals')):
+            if record_signals[name]:
+                metrics.add(metric)
+
+
+def spool_records(parsed_records: List[Dict], s3_file_key: str, reason: str, uncertain: bool = False) -> bool:
+    """
+    Append records MLflow could not take to the spool.
 
     Returns:
-        Dict with processing results
+        True when the records are spooled, False when spooling is disabled or failed
     """
-    logger.info(f"Received event: {json.dumps(event)}")
+    spool = get_trace_spool()
+    if spool is None or not parsed_records:
+        return False
+    try:
+        spool.append(s3_file_key, parsed_records, reason, uncertain)
+    except Exception as e:
+        logger.error(f"Could not spool {len(parsed_records)} records of {s3_file_key}: {e}", exc_info=True)
+        return False
+    metrics.add('RecordsSpooled', len(parsed_records))
+    logger.warning(f"Spooled {len(parsed_records)} records of {s3_file_key}: {reason}")
+    return True
 
+
+def check_tracking_server(endpoint: str) -> bool:
+    """
+    Cheap round trip to the tracking server, timed against the latency budget.
+
+    Traces exported from MLflow's async queue fail without raising, so this
+    is how the trace writer finds out that the server is down.
+    """
+    started = time.perf_counter()
     try:
-        # Set MLflow tracking URI and experiment
-        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-        mlflow.set_experiment(MLFLOW_EXPERIMENT_NAME)
+        with metrics.timer('TrackingCheck'):
+            mlflow.get_experiment(get_experiment_id(endpoint))
+    except Exception as e:
+        get_tracking_circuit().record_failure(str(e))
+        return False
+    get_tracking_circuit().record_success(time.perf_counter() - started)
+    return True
 
-        # Extract S3 information from event
-        # Event can come from Step Functions or direct S3 event
-        if 'records' in event:
-            # Batch processing from Step Functions
-            records = event['records']
-            s3_bucket = event.get('s3_bucket', DATA_CAPTURE_BUCKET)
-            s3_key = event.get('s3_key', '')
-        elif 's3_key' in event:
-            # Direct from EventBridge S3 event
-            s3_bucket = event.get('s3_bucket', DATA_CAPTURE_BUCKET)
-            s3_key = event.get('s3_key', '')
-            records = None
-        else:
-            # Fallback: read from S3 directly
-            s3_bucket = event.get('bucket', DATA_CAPTURE_BUCKET)
-            s3_key = event.get('key', '')
-            records = None
-        
-        # Filter: Only process .jsonl files
-        if not s3_key.endswith('.jsonl'):
-            logger.info(f"Skipping non-JSONL file: {s3_key}")
-            return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'message': 'Skipped non-JSONL file',
-                    's3_key': s3_key,
-                })
-            }
 
-        logger.info(f"Processing file: s3://{s3_bucket}/{s3_key}")
+def write_trace(parsed_record: Dict, s3_file_key: str) -> Optional[str]:
+    """
+    Log a record synchronously, spooling it when the tracking server is failing or slow.
+
+    Returns:
+        ID of the logged trace, None when the record was spooled
+
+    Raises:
+        Exception: The logging error, when the record could not be spooled either
+    """
+    circuit = get_tracking_circuit()
+    if not circuit.allow() and spool_records([parsed_record], s3_file_key, "tracking server unavailable"):
+        return None
+
+    started = time.perf_counter()
+    try:
+        with metrics.timer('TraceLog'):
+            trace_id = log_trace_to_mlflow(parsed_record, s3_file_key)
+    except Exception as e:
+        circuit.record_failure(str(e))
+        if spool_records([parsed_record], s3_file_key, str(e)):
+            return None
+        raise
+    circuit.record_success(time.perf_counter() - started)
+    return trace_id
 
-        # Read JSONL file from S3 if records not provided
-        if records is None:
-            obj = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-            file_content = obj['Body'].read().decode('utf-8')
 
-            # Parse JSONL (each line is a JSON object)
-            records = []
-            for line in file_content.strip().split('\n'):
-                if line.strip():
-                    records.append(json.loads(line))
+class AsyncTraceWriter:
+    """
+    Write parsed capture records to MLflow a flush at a time.
 
-        logger.info(f"Found {len(records)} records to process")
+    Records are buffered until the writer holds ``flush_every`` of them or
+    the oldest is ``max_wait_seconds`` old. Each record is still its own
+    trace, with the same span and attributes as ``log_trace_to_mlflow``
+    gives it. The heuristic signals of the records of a flush are computed
+    together just before their traces are created. Leaving the ``with``
+    block flushes the remaining records.
 
-        # Process each record and log to MLflow
-        processed_count = 0
-        error_count = 0
+    In ``batch`` export mode the spans of a flush are sent in one OTLP
+    request per experiment (see ``OtlpTraceExporter``), so the number of
+    requests to the tracking server no longer grows with the number of
+    records. If the server does not take them, the container switches to
+    the ``async`` mode: each trace goes through MLflow's async export
+    queue, two requests per trace, and the writer waits for the queue to
+    drain (the flush barrier).
 
-        #with mlflow.start_run(run_name=f"sagemaker_inference_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
-        for record in records:
-            try:
-                # Parse the record
-                if isinstance(record, str):
-                    record = json.loads(record)
+    Records MLflow cannot take are spooled instead of dropped: those whose
+    span fails, all records of a flush while the tracking circuit is open,
+    those of a batch whose request fails, and in ``async`` mode those of a
+    flush whose health check afterwards fails. Such traces may or may not
+    have reached the server; they are spooled as ``uncertain`` and left out
+    of ``trace_ids``.
+    """
+
+    def __init__(
+        self,
+        s3_file_key: str,
+        flush_every: int = TRACE_FLUSH_EVERY_RECORDS,
+        max_wait_seconds: float = TRACE_FLUSH_MAX_WAIT_SECONDS,
+        index: Optional[IngestionIndex] = None,
+        endpoint: Optional[str] = None,
+    ):
+        self.s3_file_key = s3_file_key
+        self.endpoint = endpoint or endpoint_for_key(s3_file_key)
+        self.index = index
+        self.flush_every = max(flush_every, 1)
+        self.max_wait_seconds = max_wait_seconds
+        self.flushes = 0
+        self.failed_count = 0
+        self.spooled_count = 0
+        self.trace_ids: List[str] = []
+        self.trace_strata: Dict[str, str] = {}
+        self._buffer: List[Dict] = []
+        self._buffer_started = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, parsed_record: Dict) -> None:
+        """Buffer a parsed record, flushing if enough records or time have accumulated."""
+        with self._lock:
+            if not self._buffer:
+                self._buffer_started = time.monotonic()
+            self._buffer.append(parsed_record)
+
+            if (len(self._buffer) < self.flush_every
+                    and time.monotonic() - self._buffer_started < self.max_wait_seconds):
+                return
+            records, self._buffer = self._buffer, []
+
+        self._write(records)
+
+    def flush(self) -> None:
+        """Write any buffered records."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+
+        if records:
+            self._write(records)
+
+    def _spool(self, parsed_records: List[Dict], reason: str, uncertain: bool = False) -> None:
+        spooled = spool_records(parsed_records, self.s3_file_key, reason, uncertain)
+        with self._lock:
+            if spooled:
+                self.spooled_count += len(parsed_records)
+            else:
+                self.failed_count += len(parsed_records)
+
+    def _write(self, records: List[Dict]) -> None:
+        attach_heuristics(records)
+        circuit = get_tracking_circuit()
+        if not circuit.allow() and get_trace_spool() is not None:
+            self._spool(records, "tracking server unavailable")
+            return
 
-                parsed_record = parse_data_capture_record(record)
+        exporter = get_trace_exporter()
+        if exporter is not None:
+            written = self._export(exporter, records)
+        else:
+            written = self._log_async(records)
 
-                # Log trace to MLflow
-                log_trace_to_mlflow(parsed_record, s3_key)
+        with self._lock:
+            for parsed_record, trace_id in written:
+                self.trace_ids.append(trace_id)
+                self.trace_strata[trace_id] = stratum_key(parsed_record, self.endpoint)
+        if self.index is not None:
+            self.index.mark([parsed_record.get('event_id') for parsed_record, _ in written], self.s3_file_key)
 
-                processed_count += 1
+        with self._lock:
+            self.flushes += 1
+        logger.info(f"Flushed {len(records)} traces for {self.s3_file_key}")
 
-                if parsed_record.get('is_error'):
-                    error_count += 1
+    def _export(self, exporter: OtlpTraceExporter, records: List[Dict]) -> List[Tuple[Dict, str]]:
+        """Export the traces of the records in one request per experiment. Returns the records written and their trace IDs."""
+        circuit = get_tracking_circuit()
+        batches: Dict[str, List[Tuple[Dict, Span]]] = {}
+        for parsed_record in records:
+            try:
+                experiment_id, span = build_trace_span(parsed_record, self.s3_file_key, self.endpoint)
+            except Exception as e:
+                logger.error(f"Error building trace for event {parsed_record.get('event_id')}: {e}", exc_info=True)
+                self._spool([parsed_record], str(e))
+                continue
+            batches.setdefault(experiment_id, []).append((parsed_record, span))
 
+        written: List[Tuple[Dict, str]] = []
+        experiment_batches = list(batches.items())
+        for position, (experiment_id, batch) in enumerate(experiment_batches):
+            started = time.perf_counter()
+            try:
+                with metrics.timer('TraceExport'):
+                    exporter.export(experiment_id, [span for _, span in batch])
+            except BatchExportUnsupported as e:
+                # Nothing of this batch was logged; it and the batches after it go through the async exporter
+                disable_batch_export(str(e))
+                return written + self._log_async([
+                    parsed_record for _, rest in experiment_batches[position:] for parsed_record, _ in rest
+                ])
             except Exception as e:
-                logger.error(f"Error processing record: {e}", exc_info=True)
+                logger.error(f"Error exporting {len(batch)} traces of {self.s3_file_key}: {e}", exc_info=True)
+                circuit.record_failure(str(e))
+                self._spool([parsed_record for parsed_record, _ in batch], str(e), uncertain=True)
                 continue
+            # The latency budget is per trace written
+            circuit.record_success((time.perf_counter() - started) / len(batch))
 
-            # Log summary metrics
-            # mlflow.log_param("total_records", len(records))
-            # mlflow.log_param("processed_count", processed_count)
-            # mlflow.log_param("error_count", error_count)
-            # mlflow.log_param("s3_file_key", s3_key)
+            metrics.add('TracesExported', len(batch))
+            for parsed_record, span in batch:
+                remember_trace(trace_of_span(span, experiment_id))
+                written.append((parsed_record, span.trace_id))
+        return written
 
-        logger.info(f"Successfully processed {processed_count}/{len(records)} records")
+    def _log_async(self, records: List[Dict]) -> List[Tuple[Dict, str]]:
+        """Log the traces of the records through MLflow's async export queue and wait for it. Returns the records written and their trace IDs."""
+        circuit = get_tracking_circuit()
+        written: List[Tuple[Dict, str]] = []
+        for parsed_record in records:
+            try:
+                with metrics.timer('TraceLog'):
+                    trace_id = log_trace_to_mlflow(parsed_record, self.s3_file_key, self.endpoint)
+                written.append((parsed_record, trace_id))
+            except Exception as e:
+                logger.error(f"Error logging trace for event {parsed_record.get('event_id')}: {e}", exc_info=True)
+                circuit.record_failure(str(e))
+                self._spool([parsed_record], str(e))
 
-        # Run GenAI evaluations on the traces
-        # Note: This is done separately to allow traces to be fully committed
-        run_evaluations(s3_key)
+        with metrics.timer('TraceFlush'):
+            mlflow.flush_trace_async_logging()
+        if written and get_trace_spool() is not None and not check_tracking_server(self.endpoint):
+            self._spool([parsed_record for parsed_record, _ in written], "tracking server check failed", uncertain=True)
+            written = []
+        return written
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Successfully processed data capture file',
-                'records_processed': processed_count,
-                'errors_found': error_count,
-                's3_key': s3_key,
-            })
-        }
+    def __enter__(self) -> 'AsyncTraceWriter':
+        return self
 
-    except Exception as e:
-        logger.error(f"Error in lambda handler: {e}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'message': 'Error processing data capture file',
-                'error': str(e)
-            })
-        }
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
 
 
-def run_evaluations(s3_file_key: str) -> None:
+def ingest_record(
+    record: Any,
+    s3_file_key: str,
+    writer: Optional[AsyncTraceWriter] = None,
+    index: Optional[IngestionIndex] = None,
+) -> Dict:
     """
-    Run GenAI evaluations on traces from the specified S3 file.
+    Parse a single data capture record and log it as an MLflow trace.
+
+    Records whose event ID is already in the ingestion index are not logged
+    and come back flagged with ``duplicate``. A record spooled because the
+    tracking server is unavailable comes back without a ``trace_id``.
 
     Args:
-        s3_file_key: S3 key to filter traces
+        record: Raw JSONL line (str/bytes) or already decoded capture record
+        s3_file_key: S3 key of the source file
+        writer: Optional async trace writer that buffers the trace instead of logging it immediately
+        index: Optional ingestion index used to skip and record event IDs
+
+    Returns:
+        The parsed record
     """
-    try:
-        logger.info(f"Running mlflow genai evaluations on traces from {s3_file_key}")
+    with metrics.timer('Parse'):
+        if isinstance(record, (str, bytes)):
+            record = json_loads(record)
+        parsed_record = parse_data_capture_record(record)
 
-        # Define custom scorers
-        @scorer
-        def tokens_words(outputs) -> int:
-            """Approximate words in the response"""
-            try:
-                if isinstance(outputs, dict):
-                    words = len(outputs.get('generated_text', '').split())
-                else:
-                    words = len(str(outputs).split())
-            except:
-                return 0
-            return words
-        
-        # Create a judge that evaluates coherence using MLflow template-based scorers
-        coherence_judge = make_judge(
-            name="coherence",
-            instructions=(
-                "Evaluate if the response is coherent, maintaining a constant tone "
-                "and following a clear flow of thoughts/concepts"
-                "Question: {{ inputs }}\n"
-                "Response: {{ outputs }}\n"
-            ),
-            feedback_value_type=Literal["coherent", "somewhat coherent", "incoherent"],
-            model= BEDROCK_MODEL_ID
-        )
-        mlflow.autolog(disable=True)
-        # Search for traces from this file
-        traces = mlflow.search_traces(
-            filter_string=f"name = '{s3_file_key}'"
-        )
+    if index is not None and index.seen(parsed_record.get('event_id'), s3_file_key):
+        parsed_record['duplicate'] = True
+        return parsed_record
 
-        if len(traces) == 0:
-            logger.warning(f"No traces found for {s3_file_key}")
-            return
+    if writer is not None:
+        writer.add(parsed_record)
+    else:
+        attach_heuristics([parsed_record])
+        trace_id = write_trace(parsed_record, s3_file_key)
+        if trace_id is None:
+            return parsed_record
+        parsed_record['trace_id'] = trace_id
+        if index is not None:
+            index.mark([parsed_record.get('event_id')], s3_file_key)
+    return parsed_record
 
-        logger.info(f"Found {len(traces)} traces to evaluate")
 
-        # Define scorers for evaluation
+def ingest_records(
+    records: Iterable,
+    s3_file_key: str,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    flush_every: int = TRACE_FLUSH_EVERY_RECORDS,
+    index: Optional[IngestionIndex] = None,
+    checkpoint_every: int = 0,
+    on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Ingest capture records into MLflow using a bounded pool of worker threads.
 
-        scorers = [
-            Safety(
-                model=BEDROCK_MODEL_ID,
-                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
-            ),
-            RelevanceToQuery(
-                model=BEDROCK_MODEL_ID,
-                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
-            ),
-            Fluency(
-                model=BEDROCK_MODEL_ID,
-                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
-            ),
-            Guidelines(
-                name="follows_objective",
-                guidelines="The generated response must follow the objective in the request.",
-                model=BEDROCK_MODEL_ID,
-                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
-            ),
-            Guidelines(
-                name="professional_tone",
-                guidelines="The response must be in a professional tone.",
-                model=BEDROCK_MODEL_ID,
-                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
-            ),
-            coherence_judge,
-            tokens_words,
-        ]
+    Each record is parsed and logged independently, so a failing record is
+    logged and counted without affecting the others. At most ``max_pending``
+    records are in flight at once; reading from ``records`` pauses until a
+    worker frees up, which keeps memory bounded when streaming from S3.
 
-        logger.info(f"Start mlflow genai trace evaluate")
-        # Run evaluations
+    With ``flush_every`` > 0 traces go through an ``AsyncTraceWriter``; records
+    whose trace fails to write at flush time and cannot be spooled are not
+    counted as processed. Spooled records count as processed but have no
+    trace ID until they are replayed.
+    Records already in the ingestion ``index`` are skipped and counted separately.
+    Reading is paced to ``INGEST_RECORDS_PER_SECOND`` when it is set.
+    With a Parquet sink configured, every processed record (including error
+    responses and spooled records) is also written as a Parquet row.
+
+    Every ``checkpoint_every`` records, and when ``should_stop`` returns True,
+    in-flight records are drained and the trace writer flushed before
+    ``on_checkpoint`` is called with the counts so far, so everything read
+    from ``records`` up to that point is durably in MLflow. After
+    ``should_stop`` no further records are read.
+
+    Args:
+        records: Iterable of raw JSONL lines or decoded capture records
+        s3_file_key: S3 key of the source file
+        max_workers: Number of worker threads logging traces (default ``INGEST_MAX_WORKERS`` of the file's endpoint)
+        max_pending: Maximum number of submitted but unfinished records (default ``INGEST_MAX_PENDING`` of the endpoint)
+        flush_every: Records between flushes of the async trace export, 0 to log each trace synchronously
+        index: Optional ingestion index of already-ingested event IDs
+        checkpoint_every: Records between checkpoints, 0 to only checkpoint on stop
+        on_checkpoint: Called with the counts so far once all records read are written
+        should_stop: Checked after each record; True ends ingestion early
+
+    Returns:
+        Dict with total, processed, error and skipped record counts, the IDs of
+        the logged traces and their sampling strata, the serialised
+        ``EndpointStats`` of the new records, and whether ingestion was
+        ``stopped`` before the end of ``records``
+    """
+    counts = {'total': 0, 'processed': 0, 'errors': 0, 'skipped': 0}
+    trace_ids: List[str] = []
+    trace_strata: Dict[str, str] = {}
+    endpoint = endpoint_for_key(s3_file_key)
+    if max_workers is None:
+        max_workers = endpoint_setting(endpoint, 'INGEST_MAX_WORKERS', INGEST_MAX_WORKERS)
+    if max_pending is None:
+        max_pending = endpoint_setting(endpoint, 'INGEST_MAX_PENDING', INGEST_MAX_PENDING)
+    max_pending = max(max_pending, max_workers)
+    stopped = False
+    endpoint_stats = EndpointStats(ENDPOINT_STATS_RELATIVE_ACCURACY) if ENDPOINT_STATS_ENABLED else None
+
+    def collect(future: Future) -> None:
         try:
-            results = mlflow.genai.evaluate(
-                data=traces,
-                scorers=scorers,
-            )
-            return
+            parsed_record = future.result()
         except Exception as e:
-            logger.warning(f"First Traces evaluation pass, skipping with error: {e}")
-            pass
-        
-        logger.info(f"Second pass at mlflow genai trace evaluate")
-        # Second pass: run evaluation in batches
-        # To handle the issue https://github.com/mlflow/mlflow/issues/21002
-        results = mlflow.genai.evaluate(
-                data=traces,
-                scorers=scorers,
-            )
+            logger.error(f"Error processing record: {e}", exc_info=True)
+            return
 
-        logger.info(f"Evaluations completed successfully")
+        if parsed_record.get('duplicate'):
+            counts['skipped'] += 1
+            return
+
+        counts['processed'] += 1
+        if parsed_record.get('is_error'):
+            counts['errors'] += 1
+        if endpoint_stats is not None:
+            endpoint_stats.add(parsed_record)
+        if sink is not None:
+            sink.add(parsed_record, endpoint)
+            if sink.full:
+                # Flush the traces of the rows first, so their heuristic signals are attached
+                if writer is not None:
+                    writer.flush()
+                flush_parquet(sink)
+        if 'trace_id' in parsed_record:
+            trace_ids.append(parsed_record['trace_id'])
+            trace_strata[parsed_record['trace_id']] = stratum_key(parsed_record, endpoint)
+
+    writer = AsyncTraceWriter(s3_file_key, flush_every=flush_every, index=index, endpoint=endpoint) if flush_every > 0 else None
+    parquet_store = get_parquet_store()
+    sink = None
+    if parquet_store is not None:
+        sink = ParquetSink(parquet_store, s3_file_key, PARQUET_MAX_ROWS_PER_FILE, PARQUET_ROW_GROUP_SIZE)
+
+    def drain(pending: set) -> None:
+        for future in wait(pending).done:
+            collect(future)
+        pending.clear()
+        if writer is not None:
+            writer.flush()
+        if sink is not None:
+            flush_parquet(sink)
+
+    def result() -> Dict[str, Any]:
+        snapshot = dict(counts, trace_ids=list(trace_ids), trace_strata=dict(trace_strata), stopped=stopped)
+        snapshot['endpoint_stats'] = endpoint_stats.to_dict() if endpoint_stats is not None else None
+        if writer is not None:
+            snapshot['processed'] -= writer.failed_count
+            snapshot['trace_ids'] = list(writer.trace_ids)
+            snapshot['trace_strata'] = dict(writer.trace_strata)
+        return snapshot
+
+    rate_limit = TokenBucket(INGEST_RECORDS_PER_SECOND * 60)
+    # Start from an empty bucket, so a rate-limited ingestion does not open with a burst
+    rate_limit.acquire(rate_limit.capacity)
+
+    ingest_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest') as executor:
+        pending = set()
+        for record in records:
+            counts['total'] += 1
+            rate_limit.acquire()
+            pending.add(executor.submit(ingest_record, record, s3_file_key, writer, index))
+
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+
+            if checkpoint_every > 0 and counts['total'] % checkpoint_every == 0 and on_checkpoint is not None:
+                drain(pending)
+                on_checkpoint(result())
+                continue
+
+            # Backpressure: wait for a slot before reading the next record
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+
+        drain(pending)
+
+    counts = result()
+    metrics.add('IngestTime', (time.perf_counter() - ingest_started) * 1000, 'Milliseconds')
+    metrics.add('RecordsRead', counts['total'])
+    metrics.add('RecordsProcessed', counts['processed'])
+    metrics.add('RecordsFailed', counts['total'] - counts['processed'] - counts['skipped'])
+    metrics.add('ErrorResponses', counts['errors'])
+    metrics.add('RecordsSkipped', counts['skipped'])
+    if writer is not None:
+        logger.info(f"Wrote {counts['processed']} traces with {writer.flushes} flushes")
+        if writer.spooled_count:
+            logger.warning(f"Spooled {writer.spooled_count} records for a later replay")
+
+    if index is not None:
+        index.save()
+        logger.info(f"Skipped {counts['skipped']} already ingested records")
+
+    if stopped and on_checkpoint is not None:
+        on_checkpoint(counts)
+    return counts
+
+
+def get_ingestion_index() -> Optional[IngestionIndex]:
+    """Ingestion index for this container, created on first use. None when disabled."""
+    global _ingestion_index
+
+    if INGESTION_INDEX_BACKEND == 'none':
+        return None
+
+    if _ingestion_index is None:
+        if INGESTION_INDEX_BACKEND == 's3':
+            backend = S3IndexBackend(s3_client, DATA_CAPTURE_BUCKET, INGESTION_INDEX_S3_PREFIX)
+        else:
+            backend = SQLiteIndexBackend(INGESTION_INDEX_PATH)
+        _ingestion_index = IngestionIndex(backend, bloom_capacity=INGESTION_INDEX_BLOOM_CAPACITY)
+
+    return _ingestion_index
+
+
+def record_lazy_init(name: str, started: float) -> None:
+    """Count first-use setup that started at ``started`` towards this invocation's init time."""
+    global _lazy_init_seconds
+
+    elapsed = time.perf_counter() - started
+    _lazy_init_seconds += elapsed
+    logger.info(f"Initialized {name} in {elapsed:.3f}s")
+
+
+def setup_mlflow() -> None:
+    """Set the tracking URI once per container. Experiments are resolved per endpoint by ``get_experiment_id``."""
+    global _tracking_uri_set
+
+    if not _tracking_uri_set:
+        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+        _tracking_uri_set = True
+
+
+def endpoint_for_key(s3_key: str) -> str:
+    """Endpoint a capture file belongs to, from its key, else ``SAGEMAKER_ENDPOINT_NAME``."""
+    return endpoint_from_key(s3_key) or DEFAULT_ENDPOINT
+
+
+def endpoint_setting(endpoint: str, name: str, default: Any) -> Any:
+    """Setting ``name`` of an endpoint: its ``ENDPOINT_SETTINGS`` override, else ``default``."""
+    return type(default)(ENDPOINT_SETTINGS.get(endpoint, {}).get(name, default))
+
+
+def get_experiment_router() -> ExperimentRouter:
+    """Endpoint -> experiment router for this container, created on first use."""
+    global _experiment_router
+
+    if _experiment_router is None:
+        setup_mlflow()
+        _experiment_router = ExperimentRouter(
+            mlflow.tracking.MlflowClient(),
+            MLFLOW_EXPERIMENT_NAME_TEMPLATE,
+            ENDPOINT_EXPERIMENTS,
+            default_endpoint=DEFAULT_ENDPOINT,
+            default_name=MLFLOW_EXPERIMENT_NAME,
+        )
+
+    return _experiment_router
+
+
+def get_experiment_id(endpoint: str) -> str:
+    """ID of the endpoint's experiment, resolved once per container."""
+    router = get_experiment_router()
+    experiment_id = router.cached(endpoint)
+    if experiment_id is None:
+        started = time.perf_counter()
+        experiment_id = router.experiment_id(endpoint)
+        record_lazy_init(f"MLflow experiment {router.experiment_name(endpoint)} ({experiment_id}) of {endpoint}", started)
+    return experiment_id
+
+
+def activate_experiment(endpoint: str) -> str:
+    """
+    Make the endpoint's experiment the active one, for APIs without an experiment argument.
+
+    Only a change of endpoint costs a ``set_experiment`` round trip.
+
+    Returns:
+        The experiment ID
+    """
+    global _active_experiment_id
+
+    experiment_id = get_experiment_id(endpoint)
+    if experiment_id != _active_experiment_id:
+        mlflow.set_experiment(experiment_id=experiment_id)
+        _active_experiment_id = experiment_id
+    return experiment_id
+
+
+def get_payload_offloader() -> Optional[PayloadOffloader]:
+    """Span payload offloader for this container, created on first use. None when disabled."""
+    global _payload_offloader
+
+    if PAYLOAD_OFFLOAD_BACKEND == 'none':
+        return None
+
+    if _payload_offloader is None:
+        if PAYLOAD_OFFLOAD_BACKEND == 'local':
+            store = LocalPayloadStore(PAYLOAD_LOCAL_DIR)
+        else:
+            store = S3PayloadStore(s3_client, DATA_CAPTURE_BUCKET, PAYLOAD_S3_PREFIX)
+        _payload_offloader = PayloadOffloader(store, PAYLOAD_OFFLOAD_THRESHOLD_BYTES, PAYLOAD_PREVIEW_CHARS)
+
+    return _payload_offloader
+
+
+def offload_span_payloads(prompt: Any, output_data: Any) -> Tuple[Any, Any]:
+    """
+    Prompt and outputs to put on a span, with oversized payloads replaced by pointers.
+
+    A payload that cannot be stored stays inline, so the trace is never lost.
+    """
+    offloader = get_payload_offloader()
+    if offloader is None:
+        return prompt, output_data
+
+    try:
+        with metrics.timer('PayloadOffload'):
+            prompt = offloader.offload(prompt)
+            output_data = offloader.offload_fields(output_data)
+        fields = list(output_data.values()) if isinstance(output_data, dict) and not is_pointer(output_data) else [output_data]
+        metrics.add('PayloadsOffloaded', sum(is_pointer(value) for value in [prompt] + fields))
+    except Exception as e:
+        logger.warning(f"Could not offload span payloads, keeping them inline: {e}")
+    return prompt, output_data
+
+
+def get_trace_spool() -> Optional[TraceSpool]:
+    """Spool of records MLflow could not take, created on first use. None when disabled."""
+    global _trace_spool
+
+    if SPOOL_BACKEND == 'none':
+        return None
+
+    with _spool_init_lock:
+        if _trace_spool is None:
+            if SPOOL_BACKEND == 'local':
+                store = LocalSpoolStore(os.path.join(SPOOL_LOCAL_DIR, 'sealed'))
+            else:
+                store = S3SpoolStore(s3_client, DATA_CAPTURE_BUCKET, SPOOL_S3_PREFIX)
+            _trace_spool = TraceSpool(store, os.path.join(SPOOL_LOCAL_DIR, 'open'), SPOOL_SEGMENT_MAX_RECORDS)
+
+    return _trace_spool
+
+
+def get_parquet_store() -> Optional[Any]:
+    """Store of the Parquet copy of parsed records, created on first use. None when disabled."""
+    global _parquet_store
+
+    if PARQUET_SINK_BACKEND == 'none':
+        return None
+
+    if _parquet_store is None:
+        if PARQUET_SINK_BACKEND == 'local':
+            _parquet_store = LocalParquetStore(PARQUET_LOCAL_DIR)
+        else:
+            _parquet_store = S3ParquetStore(s3_client, DATA_CAPTURE_BUCKET, PARQUET_S3_PREFIX)
+
+    return _parquet_store
+
+
+def flush_parquet(sink: ParquetSink) -> None:
+    """Write the sink's buffered rows. The Parquet copy is best effort: failures are logged, ingestion carries on."""
+    rows = sink.buffered
+    if not rows:
+        return
+    try:
+        with metrics.timer('ParquetWrite'):
+            uris = sink.flush()
+    except Exception as e:
+        logger.error(f"Could not write {rows} Parquet rows for {sink.s3_file_key}: {e}", exc_info=True)
+        metrics.add('ParquetRowsFailed', rows)
+        return
+    metrics.add('ParquetRowsWritten', rows)
+    metrics.add('ParquetFilesWritten', len(uris))
+    logger.info(f"Wrote {rows} Parquet rows for {sink.s3_file_key} to {len(uris)} files")
+
+
+def get_tracking_circuit() -> TrackingCircuit:
+    """Tracking server circuit of this container, created on first use."""
+    global _tracking_circuit
+
+    with _spool_init_lock:
+        if _tracking_circuit is None:
+            _tracking_circuit = TrackingCircuit(TRACKING_LATENCY_BUDGET_SECONDS, SPOOL_RETRY_AFTER_SECONDS)
+
+    return _tracking_circuit
+
+
+def tracking_host_creds() -> Any:
+    """URL and credentials of the tracking server, which batched export needs to be a REST tracking store."""
+    store = TracingClient().store
+    if not hasattr(store, 'get_host_creds'):
+        raise BatchExportUnsupported(f"{type(store).__name__} is not a REST tracking store")
+    return store.get_host_creds()
+
+
+def get_trace_exporter() -> Optional[OtlpTraceExporter]:
+    """Batched trace exporter of this container, created on first use. None in 'async' mode or once the server refused it."""
+    global _trace_exporter
+
+    if TRACE_EXPORT_MODE != 'batch' or _batch_export_unsupported:
+        return None
+
+    if _trace_exporter is None:
+        _trace_exporter = OtlpTraceExporter(tracking_host_creds)
+
+    return _trace_exporter
+
+
+def disable_batch_export(reason: str) -> None:
+    """Export traces through the async exporter from now on, after the tracking server refused a batch."""
+    global _batch_export_unsupported
+
+    if not _batch_export_unsupported:
+        logger.warning(f"Tracking server does not take batched trace exports ({reason}), exporting each trace instead")
+    _batch_export_unsupported = True
+
+
+def get_checkpoint_store() -> Optional[Any]:
+    """Checkpoint store for this container, created on first use. None when disabled."""
+    global _checkpoint_store
+
+    if CHECKPOINT_BACKEND == 'none':
+        return None
+
+    if _checkpoint_store is None:
+        if CHECKPOINT_BACKEND == 'local':
+            _checkpoint_store = LocalCheckpointStore(CHECKPOINT_LOCAL_DIR)
+        else:
+            _checkpoint_store = S3CheckpointStore(s3_client, DATA_CAPTURE_BUCKET, CHECKPOINT_S3_PREFIX)
+
+    return _checkpoint_store
+
+
+def load_checkpoint(
+    event: Dict,
+    s3_bucket: str,
+    s3_key: str,
+    shard: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Where processing of a capture file (or one shard of it) resumes.
+
+    A stored checkpoint wins. Without one, a ``continue_from_offset`` and
+    ``phase`` passed back by the orchestrator are used; the traces logged by
+    earlier invocations are then unknown and evaluation finds them by name.
+    """
+    store = get_checkpoint_store()
+    state = None
+    if store is not None:
+        try:
+            state = store.load(s3_bucket, checkpoint_key(s3_key, shard))
+        except Exception as e:
+            logger.warning(f"Could not load checkpoint for {s3_key}: {e}")
+
+    if state is None:
+        state = new_checkpoint(s3_bucket, s3_key, shard)
+        if event.get('continue_from_offset') or event.get('phase', 'ingest') != 'ingest':
+            state.update(
+                offset=int(event.get('continue_from_offset', 0)),
+                phase=event.get('phase', 'ingest'),
+                trace_ids=None,
+                trace_strata=None,
+            )
+    elif state['offset'] != new_checkpoint(s3_bucket, s3_key, shard)['offset'] or state['phase'] != 'ingest':
+        logger.info(f"Resuming {s3_key} from checkpoint: phase {state['phase']}, offset {state['offset']}")
+
+    state['invocations'] += 1
+    return state
+
+
+def save_checkpoint(state: Dict[str, Any]) -> None:
+    """Persist a checkpoint; failures are logged, processing carries on."""
+    store = get_checkpoint_store()
+    if store is None:
+        return
+    try:
+        store.save(state['s3_bucket'], checkpoint_key(state['s3_key'], state.get('shard')), state)
+        logger.info(f"Checkpointed {state['s3_key']}: phase {state['phase']}, offset {state['offset']}")
+    except Exception as e:
+        logger.warning(f"Could not save checkpoint for {state['s3_key']}: {e}")
+
+
+def delete_checkpoint(s3_bucket: str, s3_key: str, shard: Optional[Dict[str, Any]] = None) -> None:
+    """Remove the checkpoint of a finished file or shard."""
+    store = get_checkpoint_store()
+    if store is None:
+        return
+    try:
+        store.delete(s3_bucket, checkpoint_key(s3_key, shard))
+    except Exception as e:
+        logger.warning(f"Could not delete checkpoint for {s3_key}: {e}")
+
+
+def get_remaining_seconds(context: Any) -> Optional[float]:
+    """Seconds left in this invocation, None when not running in Lambda."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return context.get_remaining_time_in_millis() / 1000
+
+
+def lambda_handler(event: Dict, context: Any) -> Dict:
+    """
+    Lambda handler for processing SageMaker data capture files.
+
+    The event ``mode`` selects what the invocation does:
+
+    - ``file`` (default): ingest and evaluate a whole capture file
+    - ``plan``: split the file into line-aligned byte-range shards
+    - ``shard``: ingest the ``start``-``end`` byte range of the file only
+    - ``reduce``: merge the results of the file's ``shards`` and evaluate once
+    - ``window``: ingest a batch of small ``files`` (or Step Functions ``Items``)
+      and evaluate their traces together in windows
+    - ``replay``: write spooled records back to MLflow at a controlled rate
+
+    Args:
+        event: Lambda event containing S3 bucket and key information
+        context: Lambda context
+
+    Returns:
+        Dict with processing results. When the file could not be finished
+        within the invocation, ``continue`` is True and ``continue_from_offset``
+        and ``phase`` tell the orchestrator to invoke again with this output.
+    """
+    global _cold_start, _lazy_init_seconds
+
+    started = time.perf_counter()
+    cold_start, _cold_start = _cold_start, False
+    _lazy_init_seconds = 0.0
+    metrics.reset()
+
+    response = handle_event(event, context)
+
+    # Hand this invocation's spooled records to the spool store, so any container can replay them
+    if _trace_spool is not None:
+        _trace_spool.seal()
+
+    # Module import is paid once per container; lazy init is first-use setup done during this invocation
+    timings = {
+        'cold_start': cold_start,
+        'module_init_seconds': round(MODULE_INIT_SECONDS, 3) if cold_start else 0.0,
+        'lazy_init_seconds': round(_lazy_init_seconds, 3),
+        'invocation_seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Invocation timings: {timings}")
+
+    metrics.add('ColdStart', int(cold_start))
+    metrics.add('ModuleInitTime', timings['module_init_seconds'] * 1000, 'Milliseconds')
+    metrics.add('LazyInitTime', _lazy_init_seconds * 1000, 'Milliseconds')
+    metrics.add('InvocationTime', timings['invocation_seconds'] * 1000, 'Milliseconds')
+    metrics.emit({
+        'Endpoint': event_endpoint(event),
+        'Mode': event.get('mode', 'window' if 'Items' in event else 'file'),
+    })
+
+    body = json.loads(response.get('body', '{}'))
+    body['timings'] = timings
+    response['body'] = json.dumps(body)
+    return response
+
+
+def event_endpoint(event: Dict) -> str:
+    """Endpoint of the capture files an event covers, ``multiple`` for replays and windows spanning endpoints."""
+    if event.get('mode') == 'replay':
+        return 'multiple'
+    items = event.get('files') or event.get('Items') or [event]
+    endpoints = {
+        endpoint_for_key(item.get('s3_key') or item.get('key') or item.get('Key', '')) for item in items
+    }
+    return endpoints.pop() if len(endpoints) == 1 else 'multiple'
+
+
+def handle_event(event: Dict, context: Any) -> Dict:
+    """Dispatch a handler event to its mode. See ``lambda_handler``."""
+    logger.info(f"Received event: {json.dumps(event)}")
+
+    try:
+        if event.get('mode') == 'replay':
+            setup_mlflow()
+            return replay_spool(event, context)
+
+        # Batches of small files from a Step Functions ItemBatcher
+        if event.get('mode') == 'window' or 'Items' in event:
+            setup_mlflow()
+            return process_window_batch(event.get('files') or event.get('Items', []))
+
+        # Extract S3 information from event
+        # Event can come from Step Functions or direct S3 event
+        if 'records' in event:
+            # Batch processing from Step Functions
+            records = event['records']
+            s3_bucket = event.get('s3_bucket', DATA_CAPTURE_BUCKET)
+            s3_key = event.get('s3_key', '')
+        elif 's3_key' in event:
+            # Direct from EventBridge S3 event
+            s3_bucket = event.get('s3_bucket', DATA_CAPTURE_BUCKET)
+            s3_key = event.get('s3_key', '')
+            records = None
+        else:
+            # Fallback: read from S3 directly
+            s3_bucket = event.get('bucket', DATA_CAPTURE_BUCKET)
+            s3_key = event.get('key', '')
+            records = None
+        
+        # Filter: Only process .jsonl files
+        if not s3_key.endswith(CAPTURE_FILE_SUFFIXES):
+            logger.info(f"Skipping non-JSONL file: {s3_key}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Skipped non-JSONL file',
+                    's3_key': s3_key,
+                })
+            }
+
+        mode = event.get('mode', 'file')
+        if mode == 'plan':
+            return plan_response(s3_bucket, s3_key)
+
+        # Tracking URI is set, and the file's experiment resolved, once per warm container
+        setup_mlflow()
+
+        if mode == 'reduce':
+            return reduce_shards(event, s3_bucket, s3_key)
+
+        shard = None
+        if mode == 'shard':
+            shard = {'start': int(event['start']), 'end': event.get('end')}
+            logger.info(f"Processing shard bytes {shard['start']}-{shard['end']} of s3://{s3_bucket}/{s3_key}")
+        else:
+            logger.info(f"Processing file: s3://{s3_bucket}/{s3_key}")
+
+        def out_of_time() -> bool:
+            remaining = get_remaining_seconds(context)
+            return remaining is not None and remaining < CHECKPOINT_TIME_RESERVE_SECONDS
+
+        # Records passed in the event have no file offsets and are processed in one go
+        if records is not None:
+            state = new_checkpoint(s3_bucket, s3_key)
+            state['invocations'] = 1
+            checkpointing = False
+        else:
+            state = load_checkpoint(event, s3_bucket, s3_key, shard)
+            checkpointing = True
+            if state['phase'] == 'ingested':
+                # Retried shard that already finished
+                return shard_response(state)
+
+        if state['phase'] == 'ingest':
+            # Stream JSONL file from S3 if records not provided
+            # Lines are parsed one at a time below, so the file is never held in memory
+            reader = None
+            if records is None:
+                end_offset = shard['end'] if shard else None
+                reader = records = open_capture_file(s3_bucket, s3_key, state['offset'], end_offset)
+            start_state = state
+
+            def on_checkpoint(progress: Dict[str, Any]) -> None:
+                save_checkpoint(advance_checkpoint(start_state, progress, reader.offset))
+
+            # Process records concurrently and log to MLflow, checkpointing as we go
+            counts = ingest_records(
+                records,
+                s3_key,
+                index=get_ingestion_index(),
+                checkpoint_every=CHECKPOINT_EVERY_RECORDS if checkpointing and get_checkpoint_store() else 0,
+                on_checkpoint=on_checkpoint if checkpointing else None,
+                should_stop=out_of_time if checkpointing else None,
+            )
+            state = advance_checkpoint(start_state, counts, reader.offset if reader else 0)
+
+            logger.info(f"Successfully processed {counts['processed']}/{counts['total']} records")
+            logger.info(f"Peak memory usage: {get_peak_rss_mb()} MB")
+
+            if counts['stopped']:
+                return continue_response(state)
+
+            # Shards only ingest; the reducer evaluates the whole file once
+            if shard is not None:
+                state['phase'] = 'ingested'
+                save_checkpoint(state)
+                return shard_response(state)
+
+            log_endpoint_stats(s3_key, state['endpoint_stats'], [s3_key], endpoint_for_key(s3_key))
+
+            # Leave evaluation to a fresh invocation when this one is nearly out of time
+            state['phase'] = 'evaluate'
+            if checkpointing:
+                save_checkpoint(state)
+                if out_of_time():
+                    return continue_response(state)
+
+        # Run GenAI evaluations on the traces logged for the file
+        run_evaluations(s3_key, trace_ids=state['trace_ids'], trace_strata=state['trace_strata'])
+
+        if checkpointing:
+            delete_checkpoint(s3_bucket, s3_key)
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Successfully processed data capture file',
+                'records_processed': state['counts']['processed'],
+                'errors_found': state['counts']['errors'],
+                'records_skipped': state['counts']['skipped'],
+                's3_key': s3_key,
+                'invocations': state['invocations'],
+                'peak_rss_mb': get_peak_rss_mb(),
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error in lambda handler: {e}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'message': 'Error processing data capture file',
+                'error': str(e)
+            })
+        }
+
+
+def continue_response(state: Dict[str, Any]) -> Dict:
+    """
+    Handler result for a partly processed file.
+
+    The top-level fields double as the next invocation's event, so an
+    orchestrator can loop while ``continue`` is True.
+    """
+    # Orchestrators that do not loop on 'continue' would take this for a finished file
+    logger.warning(
+        f"Stopping before the time limit, {state['s3_key']} is not finished: invoke again with this result "
+        f"to continue from offset {state['offset']}"
+    )
+    response = {
+        'statusCode': 202,
+        'continue': True,
+        's3_bucket': state['s3_bucket'],
+        's3_key': state['s3_key'],
+        'continue_from_offset': state['offset'],
+        'phase': state['phase'],
+    }
+    if state.get('shard') is not None:
+        response.update(mode='shard', start=state['shard']['start'], end=state['shard']['end'])
+    response['body'] = json.dumps({
+        'message': 'Partially processed data capture file',
+        'records_processed': state['counts']['processed'],
+        'errors_found': state['counts']['errors'],
+        'records_skipped': state['counts']['skipped'],
+        's3_key': state['s3_key'],
+        'continue_from_offset': state['offset'],
+        'phase': state['phase'],
+        'peak_rss_mb': get_peak_rss_mb(),
+    })
+    return response
+
+
+def plan_response(s3_bucket: str, s3_key: str) -> Dict:
+    """
+    Handler result of ``plan`` mode.
+
+    ``shards`` lists ready-made ``shard`` mode events, one per byte range,
+    for a Map state to fan out over.
+    """
+    shards = plan_shards(s3_client, s3_bucket, s3_key, SHARD_SIZE_BYTES)
+    logger.info(f"Planned {len(shards)} shards for s3://{s3_bucket}/{s3_key}")
+    return {
+        'statusCode': 200,
+        's3_bucket': s3_bucket,
+        's3_key': s3_key,
+        'shards': [
+            {'mode': 'shard', 's3_bucket': s3_bucket, 's3_key': s3_key, 'start': shard['start'], 'end': shard['end']}
+            for shard in shards
+        ],
+        'body': json.dumps({
+            'message': 'Planned data capture file shards',
+            's3_key': s3_key,
+            'shards': len(shards),
+        })
+    }
+
+
+def shard_response(state: Dict[str, Any]) -> Dict:
+    """Handler result of a fully ingested shard; the shard's traces stay in its checkpoint."""
+    return {
+        'statusCode': 200,
+        'mode': 'shard',
+        's3_bucket': state['s3_bucket'],
+        's3_key': state['s3_key'],
+        'start': state['shard']['start'],
+        'end': state['shard']['end'],
+        'body': json.dumps({
+            'message': 'Ingested data capture file shard',
+            'records_processed': state['counts']['processed'],
+            'errors_found': state['counts']['errors'],
+            'records_skipped': state['counts']['skipped'],
+            's3_key': state['s3_key'],
+            'peak_rss_mb': get_peak_rss_mb(),
+        })
+    }
+
+
+def reduce_shards(event: Dict, s3_bucket: str, s3_key: str) -> Dict:
+    """
+    Merge the ingested shards of a capture file and evaluate the file once.
+
+    Shard results are read from their checkpoints. Without a checkpoint
+    store, counts come from the shard results in ``event['shards']`` and
+    evaluation finds the file's traces by name.
+
+    Args:
+        event: ``reduce`` mode event with the shard results (or shard events) in ``shards``
+        s3_bucket: Bucket of the capture file
+        s3_key: S3 key of the capture file
+
+    Returns:
+        Handler result with the merged counts
+    """
+    shards = [{'start': int(item['start']), 'end': item.get('end')} for item in event['shards']]
+    store = get_checkpoint_store()
+
+    states = []
+    for item, shard in zip(event['shards'], shards):
+        state = None
+        if store is not None:
+            try:
+                state = store.load(s3_bucket, checkpoint_key(s3_key, shard))
+            except Exception as e:
+                logger.warning(f"Could not load checkpoint of shard {shard} of {s3_key}: {e}")
+
+        if state is None or state['phase'] != 'ingested':
+            if store is not None:
+                logger.warning(f"No ingested checkpoint for shard {shard} of {s3_key}, using the shard result")
+            body = json.loads(item.get('body', '{}'))
+            state = {
+                'counts': {
+                    'total': body.get('records_processed', 0) + body.get('records_skipped', 0),
+                    'processed': body.get('records_processed', 0),
+                    'errors': body.get('errors_found', 0),
+                    'skipped': body.get('records_skipped', 0),
+                },
+                'trace_ids': None,
+                'trace_strata': None,
+            }
+        states.append(state)
+
+    merged = merge_shard_states(states)
+    counts = merged['counts']
+    logger.info(f"Merged {len(shards)} shards of {s3_key}: {counts}")
+    log_endpoint_stats(s3_key, merged['endpoint_stats'], [s3_key], endpoint_for_key(s3_key))
+
+    # Run GenAI evaluations once on the traces of all shards
+    run_evaluations(s3_key, trace_ids=merged['trace_ids'], trace_strata=merged['trace_strata'])
+
+    for shard in shards:
+        delete_checkpoint(s3_bucket, s3_key, shard)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Successfully processed data capture file',
+            'records_processed': counts['processed'],
+            'errors_found': counts['errors'],
+            'records_skipped': counts['skipped'],
+            's3_key': s3_key,
+            'shards': len(shards),
+            'peak_rss_mb': get_peak_rss_mb(),
+        })
+    }
+
+
+def process_window_batch(files: List[Dict]) -> Dict:
+    """
+    Ingest a batch of capture files and evaluate their traces in windows.
+
+    Every file is ingested on its own, so its traces keep the file's
+    ``s3_file_key`` name and attributes. Traces are collected across files
+    and evaluated together once the window holds ``WINDOW_MAX_TRACES`` traces
+    or is ``WINDOW_MAX_SECONDS`` old (checked after each file), and once more
+    for the last partial window. This amortises the experiment setup, scorer
+    construction and ``mlflow.genai.evaluate`` overhead over many small files.
+    Each endpoint in the batch has its own window, evaluated in its experiment.
+
+    Args:
+        files: Capture files as dicts with ``s3_bucket``/``bucket`` and ``s3_key``/``key``
+
+    Returns:
+        Dict with processing results for the whole batch
+    """
+    totals = {'total': 0, 'processed': 0, 'errors': 0, 'skipped': 0}
+    failed_files: List[str] = []
+    skipped_files = 0
+    windows = 0
+    # Endpoint -> its open window
+    open_windows: Dict[str, Dict[str, Any]] = {}
+
+    def evaluate_window(endpoint: str) -> None:
+        nonlocal windows
+        window = open_windows.pop(endpoint)
+        if window['files']:
+            log_endpoint_stats(
+                f"window of {len(window['files'])} files", window['endpoint_stats'], window['files'], endpoint
+            )
+        if window['trace_ids']:
+            windows += 1
+            logger.info(
+                f"Evaluating window {windows} of {endpoint}: {len(window['trace_ids'])} traces"
+                f" from {len(window['files'])} files"
+            )
+            run_evaluations(
+                f"window-{windows} ({len(window['files'])} files)",
+                trace_ids=window['trace_ids'],
+                trace_strata=window['trace_strata'],
+                endpoint=endpoint,
+            )
+
+    for item in files:
+        s3_bucket = item.get('s3_bucket') or item.get('bucket') or DATA_CAPTURE_BUCKET
+        s3_key = item.get('s3_key') or item.get('key') or item.get('Key', '')
+        if not s3_key.endswith(CAPTURE_FILE_SUFFIXES):
+            logger.info(f"Skipping non-JSONL file: {s3_key}")
+            skipped_files += 1
+            continue
+
+        try:
+            counts = ingest_records(open_capture_file(s3_bucket, s3_key), s3_key, index=get_ingestion_index())
+        except Exception as e:
+            logger.error(f"Error ingesting s3://{s3_bucket}/{s3_key}: {e}", exc_info=True)
+            failed_files.append(s3_key)
+            continue
+
+        for name in totals:
+            totals[name] += counts[name]
+        endpoint = endpoint_for_key(s3_key)
+        window = open_windows.setdefault(endpoint, {
+            'files': [], 'trace_ids': [], 'trace_strata': {}, 'endpoint_stats': None, 'started': time.monotonic()
+        })
+        window['files'].append(s3_key)
+        window['trace_ids'].extend(counts['trace_ids'])
+        window['trace_strata'].update(counts['trace_strata'])
+        window['endpoint_stats'] = merge_stats(window['endpoint_stats'], counts['endpoint_stats'])
+
+        for endpoint, window in list(open_windows.items()):
+            if (len(window['trace_ids']) >= WINDOW_MAX_TRACES
+                    or time.monotonic() - window['started'] >= WINDOW_MAX_SECONDS):
+                evaluate_window(endpoint)
+
+    for endpoint in list(open_windows):
+        evaluate_window(endpoint)
+
+    logger.info(f"Processed {len(files)} files in {windows} evaluation windows: {totals}")
+    return {
+        'statusCode': 200 if not failed_files else 207,
+        'body': json.dumps({
+            'message': 'Processed data capture file batch',
+            'files': len(files),
+            'files_skipped': skipped_files,
+            'files_failed': failed_files,
+            'evaluation_windows': windows,
+            'records_processed': totals['processed'],
+            'errors_found': totals['errors'],
+            'records_skipped': totals['skipped'],
+            'peak_rss_mb': get_peak_rss_mb(),
+        })
+    }
+
+
+def replay_spool(event: Dict, context: Any) -> Dict:
+    """
+    Write spooled records back to MLflow, oldest segment first, at a controlled rate.
+
+    Records go through the usual ``AsyncTraceWriter`` at up to
+    ``records_per_second`` (default ``SPOOL_REPLAY_RECORDS_PER_SECOND``).
+    Records whose event ID is already in the ingestion index are skipped;
+    ``uncertain`` records are written again and may show up twice. The replay
+    stops after ``max_records`` (0 = no limit), when the invocation is nearly
+    out of time, or when the tracking server becomes unhealthy again; the
+    rest of the current segment is requeued and the segment deleted. The
+    replayed traces are then evaluated per capture file.
+
+    Args:
+        event: Replay event, with optional ``records_per_second`` and ``max_records``
+        context: Lambda context
+
+    Returns:
+        Handler result with the replay counts. ``continue`` is True when the
+        invocation ran out of time with segments left.
+    """
+    spool = get_trace_spool()
+    if spool is None:
+        return {'statusCode': 200, 'body': json.dumps({'message': 'Spooling is disabled'})}
+    spool.seal()
+
+    records_per_second = float(event.get('records_per_second', SPOOL_REPLAY_RECORDS_PER_SECOND))
+    max_records = int(event.get('max_records', 0))
+    rate_limit = TokenBucket(records_per_second * 60)
+    # Start from an empty bucket, so the replay does not open with a minute's worth of records at once
+    rate_limit.acquire(rate_limit.capacity)
+    index = get_ingestion_index()
+    circuit = get_tracking_circuit()
+    totals = {'replayed': 0, 'skipped': 0, 'requeued': 0, 'segments_drained': 0}
+    writers: Dict[str, AsyncTraceWriter] = {}
+
+    def stop_reason() -> Optional[str]:
+        remaining = get_remaining_seconds(context)
+        if remaining is not None and remaining < SPOOL_REPLAY_TIME_RESERVE_SECONDS:
+            return 'time'
+        if max_records and totals['replayed'] >= max_records:
+            return 'max_records'
+        if not circuit.allow():
+            return 'tracking_server'
+        return None
+
+    reason = None
+    for name in spool.segments():
+        reason = stop_reason()
+        if reason is not None:
+            break
+
+        entries = spool.read(name)
+        logger.info(f"Replaying {len(entries)} spooled records from segment {name}")
+        for position, entry in enumerate(entries):
+            reason = stop_reason()
+            if reason is not None:
+                spool.requeue(entries[position:])
+                totals['requeued'] += len(entries) - position
+                break
+
+            parsed_record = entry['record']
+            s3_key = entry['s3_file_key']
+            if index is not None and index.seen(parsed_record.get('event_id'), s3_key):
+                totals['skipped'] += 1
+                continue
+            rate_limit.acquire()
+            if s3_key not in writers:
+                writers[s3_key] = AsyncTraceWriter(s3_key, index=index)
+            writers[s3_key].add(parsed_record)
+            totals['replayed'] += 1
+
+        # Everything read from the segment is now in MLflow or back in the spool
+        for writer in writers.values():
+            writer.flush()
+        spool.delete(name)
+        totals['segments_drained'] += 1
+        if reason is not None:
+            break
+
+    spool.seal()
+    if index is not None:
+        index.save()
+
+    # Records the writers could not write went back to the spool (or were dropped)
+    for writer in writers.values():
+        totals['replayed'] -= writer.spooled_count + writer.failed_count
+        totals['requeued'] += writer.spooled_count
+    metrics.add('RecordsReplayed', totals['replayed'])
+    segments_left = len(spool.segments())
+    logger.info(f"Spool replay: {totals}, {segments_left} segments left, stopped by {reason or 'empty spool'}")
+
+    for s3_key, writer in writers.items():
+        if writer.trace_ids:
+            run_evaluations(s3_key, trace_ids=writer.trace_ids, trace_strata=writer.trace_strata)
+
+    body = dict(totals, segments_left=segments_left, stopped_by=reason)
+    if reason == 'time' and segments_left:
+        return {'statusCode': 202, 'continue': True, 'mode': 'replay', 'body': json.dumps(body)}
+    return {'statusCode': 200, 'body': json.dumps(dict(body, message='Replayed spooled records'))}
+
+
+def log_endpoint_stats(label: str, stats: Optional[Dict[str, Any]], s3_keys: List[str], endpoint: str) -> None:
+    """
+    Log endpoint traffic statistics as one MLflow run in the endpoint's experiment.
+
+    The run holds the summary metrics (rates, counts and sketch quantiles),
+    ``requests_per_minute`` as a time series, and the serialised sketches as
+    ``endpoint_stats.json`` so runs can be merged later without the traces.
+
+    Args:
+        label: Capture file or window the statistics cover
+        stats: Serialised ``EndpointStats``, None when unavailable
+        s3_keys: Capture files covered
+        endpoint: Endpoint of the capture files
+    """
+    if not ENDPOINT_STATS_ENABLED or stats is None:
+        return
+
+    try:
+        from mlflow.entities import Metric
+
+        endpoint_stats = EndpointStats.from_dict(stats)
+        if endpoint_stats.requests == 0:
+            return
+
+        minutes = sorted(endpoint_stats.requests_per_minute)
+        with mlflow.start_run(run_name=f"endpoint-stats {label}", experiment_id=get_experiment_id(endpoint)) as run:
+            mlflow.set_tags({
+                'run_type': 'endpoint_stats',
+                'sagemaker_endpoint_name': endpoint,
+                'window_start': minutes[0] if minutes else '',
+                'window_end': minutes[-1] if minutes else '',
+            })
+            mlflow.log_param('files', len(s3_keys))
+            mlflow.log_metrics(endpoint_stats.summary())
+            series = []
+            for step, minute in enumerate(minutes):
+                try:
+                    timestamp = datetime.strptime(minute, '%Y-%m-%dT%H:%M').replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                series.append(Metric(
+                    'requests_per_minute',
+                    endpoint_stats.requests_per_minute[minute],
+                    int(timestamp.timestamp() * 1000),
+                    step,
+                ))
+            if series:
+                mlflow.tracking.MlflowClient().log_batch(run.info.run_id, metrics=series)
+            mlflow.log_dict({'files': s3_keys, 'stats': stats}, 'endpoint_stats.json')
+        logger.info(f"Logged endpoint stats for {label} to run {run.info.run_id}")
+    except Exception as e:
+        logger.warning(f"Could not log endpoint stats for {label}: {e}")
+
+
+def get_judge_cache() -> Optional[JudgeResultCache]:
+    """Judge result cache for this container, created on first use. None when disabled."""
+    global _judge_cache
+
+    if JUDGE_CACHE_BACKEND == 'none':
+        return None
+
+    if _judge_cache is None:
+        if JUDGE_CACHE_BACKEND == 's3':
+            backend = S3CacheBackend(s3_client, DATA_CAPTURE_BUCKET, JUDGE_CACHE_S3_PREFIX)
+        else:
+            backend = SQLiteCacheBackend(JUDGE_CACHE_PATH, max_entries=JUDGE_CACHE_MAX_ENTRIES)
+        _judge_cache = JudgeResultCache(backend, ttl_seconds=JUDGE_CACHE_TTL_SECONDS)
+
+    return _judge_cache
+
+
+def get_judge_scheduler(endpoint: str) -> JudgeScheduler:
+    """Judge call scheduler of an endpoint in this container, created on first use."""
+    if endpoint not in _judge_schedulers:
+        _judge_schedulers[endpoint] = JudgeScheduler(
+            max_concurrency=endpoint_setting(endpoint, 'JUDGE_MAX_CONCURRENCY', JUDGE_MAX_CONCURRENCY),
+            requests_per_minute=endpoint_setting(endpoint, 'JUDGE_REQUESTS_PER_MINUTE', JUDGE_REQUESTS_PER_MINUTE),
+            tokens_per_minute=endpoint_setting(endpoint, 'JUDGE_TOKENS_PER_MINUTE', JUDGE_TOKENS_PER_MINUTE),
+            max_attempts=JUDGE_MAX_ATTEMPTS,
+            max_output_tokens=MLFLOW_EVALUATION_MODEL_PARAM['max_tokens'],
+        )
+
+    return _judge_schedulers[endpoint]
+
+
+def evaluation_judge_scheduler() -> JudgeScheduler:
+    """Judge call scheduler of the endpoint being evaluated."""
+    return get_judge_scheduler(_evaluation_endpoint)
+
+
+def get_evaluation_cascade() -> Optional[EvaluationCascade]:
+    """Evaluation cascade for this container, created on first use. None in 'full' mode."""
+    global _evaluation_cascade
+
+    if EVALUATION_MODE != 'cascade':
+        return None
+
+    if _evaluation_cascade is None:
+        _evaluation_cascade = EvaluationCascade(EVALUATION_CASCADE_SAFE_TEMPLATES)
+
+    return _evaluation_cascade
+
+
+def invoke_judge_model(prompt: str, max_tokens: int) -> str:
+    """Send one prompt to the judge model (``BEDROCK_MODEL_ID``) with the Bedrock Converse API and return the reply text."""
+    global _bedrock_client
+
+    if _bedrock_client is None:
+        _bedrock_client = boto3.client('bedrock-runtime')
+
+    # No stop sequence: the reply is a JSON array of verdict objects
+    response = _bedrock_client.converse(
+        modelId=BEDROCK_MODEL_ID.split(':/', 1)[-1],
+        messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+        inferenceConfig={'maxTokens': max_tokens, 'temperature': MLFLOW_EVALUATION_MODEL_PARAM['temperature']},
+    )
+    return ''.join(block.get('text', '') for block in response['output']['message']['content'])
+
+
+def get_batch_judge() -> Optional[BatchJudge]:
+    """Batch judge for this container, created on first use. None when batching is off."""
+    global _batch_judge
+
+    if JUDGE_BATCH_SIZE <= 1:
+        return None
+
+    if _batch_judge is None:
+        _batch_judge = BatchJudge(
+            invoke_judge_model,
+            batch_size=JUDGE_BATCH_SIZE,
+            max_item_chars=JUDGE_BATCH_MAX_ITEM_CHARS,
+            max_tokens_per_item=JUDGE_BATCH_MAX_TOKENS_PER_ITEM,
+        )
+
+    return _batch_judge
+
+
+def record_assessment(trace: Any, scorer_name: str, ok: bool) -> None:
+    """Record the outcome of a (trace, scorer) cell in the coverage of the running evaluation."""
+    if _evaluation_coverage is None or trace is None:
+        return
+    try:
+        trace_id = trace.info.trace_id
+    except AttributeError:
+        return
+    _evaluation_coverage.record(trace_id, scorer_name, ok)
+
+
+def wrap_judge(
+    judge: Any,
+    cache: Optional[JudgeResultCache] = None,
+    get_scheduler: Optional[Callable[[], JudgeScheduler]] = None,
+    cascade: Optional[EvaluationCascade] = None,
+    batch_judge: Optional[BatchJudge] = None,
+) -> Any:
+    """
+    Wrap an LLM judge with the evaluation cascade, the verdict cache and the rate-limited scheduler.
+
+    Verdicts the cascade can settle from the response alone (empty or error
+    responses, refusals for safety) are returned without a judge call.
+    Verdicts prefetched by the batch judge come next. Verdicts already in the cache skip the Bedrock call. Offloaded payloads
+    are part of the cache key as content-addressed pointers, so they are only
+    rehydrated for calls that reach the judge. Other calls go through the
+    scheduler, which rate-limits them and retries this (trace, scorer) pair
+    on throttling. Only successful verdicts are cached; judge errors are
+    returned as-is and retried on the next evaluation.
+
+    Args:
+        judge: Built-in scorer or ``make_judge`` judge
+        cache: Judge result cache
+        get_scheduler: Returns the judge call scheduler to use, looked up per call
+        cascade: Evaluation cascade
+        batch_judge: Batch judge holding prefetched verdicts
+
+    Returns:
+        Scorer with the same name as ``judge``
+    """
+    from mlflow.entities import AssessmentSource, Feedback
+    from mlflow.genai import scorer
+
+    judge_name = judge.name
+    judge_params = inspect.signature(judge.__call__).parameters
+
+    def judge_once(inputs, outputs):
+        if cascade is not None:
+            settled = cascade.verdict(judge_name, outputs)
+            if settled is not None:
+                return Feedback(
+                    name=judge_name,
+                    value=settled[0],
+                    rationale=settled[1],
+                    source=AssessmentSource(source_type="CODE", source_id="evaluation_cascade"),
+                    metadata={"evaluation_tier": "deterministic"},
+                )
+
+        prefetched = None
+        if batch_judge is not None:
+            batch_key = make_cache_key(
+                inputs, outputs, judge_name, BEDROCK_MODEL_ID, MLFLOW_EVALUATION_MODEL_PARAM, BATCH_JUDGE_MODE
+            )
+            prefetched = batch_judge.take(batch_key)
+        if prefetched is not None:
+            from_cache = prefetched['source'] == 'cache'
+            if from_cache:
+                metrics.add('JudgeCacheHits')
+            elif cache is not None:
+                cache.put(batch_key, {'value': prefetched['value'], 'rationale': prefetched['rationale']})
+            return Feedback(
+                name=judge_name,
+                value=prefetched['value'],
+                rationale=prefetched.get('rationale'),
+                source=AssessmentSource(source_type="LLM_JUDGE", source_id=BEDROCK_MODEL_ID),
+                metadata={"judge_cache_hit": "true"} if from_cache else {"judge_batch": "true"},
+            )
+
+        key = None
+        if cache is not None:
+            key = make_cache_key(inputs, outputs, judge_name, BEDROCK_MODEL_ID, MLFLOW_EVALUATION_MODEL_PARAM)
+            cached = cache.get(key)
+            if cached is not None:
+                metrics.add('JudgeCacheHits')
+                return Feedback(
+                    name=judge_name,
+                    value=cached['value'],
+                    rationale=cached.get('rationale'),
+                    source=AssessmentSource(source_type="LLM_JUDGE", source_id=BEDROCK_MODEL_ID),
+                    metadata={"judge_cache_hit": "true"},
+                )
+
+        offloader = get_payload_offloader()
+        inputs, outputs = rehydrate_payloads(inputs, offloader), rehydrate_payloads(outputs, offloader)
+
+        arguments = {k: v for k, v in {'inputs': inputs, 'outputs': outputs}.items() if k in judge_params}
+        started = time.perf_counter()
+        try:
+            if get_scheduler is not None:
+                feedback = get_scheduler().call(judge, arguments)
+            else:
+                feedback = judge(**arguments)
+        finally:
+            metrics.observe('JudgeLatency', (time.perf_counter() - started) * 1000, Scorer=judge_name)
+
+        if cache is not None and isinstance(feedback, Feedback) and feedback.error is None:
+            cache.put(key, {'value': feedback.value, 'rationale': feedback.rationale})
+        return feedback
+
+    @scorer(name=judge_name)
+    def wrapped_judge(inputs, outputs, trace=None):
+        try:
+            feedback = judge_once(inputs, outputs)
+        except Exception:
+            record_assessment(trace, judge_name, ok=False)
+            raise
+        record_assessment(trace, judge_name, ok=getattr(feedback, 'error', None) is None)
+        return feedback
+
+    return wrapped_judge
+
+
+def get_evaluation_scorers() -> Dict[str, Any]:
+    """
+    Evaluation scorers for this container, built on first use.
+
+    ``mlflow.genai`` and its judges are imported here rather than at module
+    import, so invocations that never evaluate (skipped files, shard workers,
+    error-only files) do not pay for them.
+
+    Returns:
+        Dict with the wrapped LLM ``judges``, the ``tokens_words`` scorer and
+        the ``batch_criteria`` of the judges for batched prompts
+    """
+    global _evaluation_scorers
+
+    if _evaluation_scorers is None:
+        started = time.perf_counter()
+        from mlflow.genai import scorer
+        from mlflow.genai.judges import make_judge
+        from mlflow.genai.scorers import Safety, RelevanceToQuery, Fluency, Guidelines
+
+        mlflow.autolog(disable=True)
+
+        # Define custom scorers
+        @scorer
+        def tokens_words(outputs, trace=None) -> int:
+            """Approximate words in the response"""
+            try:
+                outputs = rehydrate_payloads(outputs, get_payload_offloader())
+                if isinstance(outputs, dict):
+                    words = len(outputs.get('generated_text', '').split())
+                else:
+                    words = len(str(outputs).split())
+            except:
+                words = 0
+            record_assessment(trace, 'tokens_words', ok=True)
+            return words
+
+        follows_objective = "The generated response must follow the objective in the request."
+        professional_tone = "The response must be in a professional tone."
+
+        # Create a judge that evaluates coherence using MLflow template-based scorers
+        coherence_judge = make_judge(
+            name="coherence",
+            instructions=(
+                "Evaluate if the response is coherent, maintaining a constant tone "
+                "and following a clear flow of thoughts/concepts"
+                "Question: {{ inputs }}\n"
+                "Response: {{ outputs }}\n"
+            ),
+            feedback_value_type=Literal["coherent", "somewhat coherent", "incoherent"],
+            model= BEDROCK_MODEL_ID
+        )
+
+        # Define scorers for evaluation
+
+        judges = [
+            Safety(
+                model=BEDROCK_MODEL_ID,
+                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
+            ),
+            RelevanceToQuery(
+                model=BEDROCK_MODEL_ID,
+                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
+            ),
+            Fluency(
+                model=BEDROCK_MODEL_ID,
+                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
+            ),
+            Guidelines(
+                name="follows_objective",
+                guidelines=follows_objective,
+                model=BEDROCK_MODEL_ID,
+                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
+            ),
+            Guidelines(
+                name="professional_tone",
+                guidelines=professional_tone,
+                model=BEDROCK_MODEL_ID,
+                parameters=MLFLOW_EVALUATION_MODEL_PARAM,
+            ),
+            coherence_judge,
+        ]
+
+        # Settle clear cases in the cascade, serve repeated (inputs, outputs)
+        # verdicts from the judge cache and rate-limit the remaining Bedrock calls
+        judges = [
+            wrap_judge(judge, get_judge_cache(), evaluation_judge_scheduler, get_evaluation_cascade(), get_batch_judge())
+            for judge in judges
+        ]
+
+        # Criteria of each judge in batched prompts
+        batch_criteria = {
+            **BATCH_CRITERIA,
+            'follows_objective': (follows_objective, YES_NO),
+            'professional_tone': (professional_tone, YES_NO),
+        }
+
+        _evaluation_scorers = {'judges': judges, 'tokens_words': tokens_words, 'batch_criteria': batch_criteria}
+        record_lazy_init("evaluation scorers", started)
+
+    return _evaluation_scorers
+
+
+def logged_traces(trace_ids: List[str]) -> List[Optional[Trace]]:
+    """Traces of the given IDs kept by this container since they were logged, None for those it no longer has."""
+    with _logged_traces_lock:
+        return [_logged_traces.get(trace_id) for trace_id in trace_ids]
+
+
+def search_traces_by_id(experiment_id: str, trace_ids: List[str]) -> List[Trace]:
+    """Traces of the given IDs in the experiment, fetched ``SEARCH_TRACES_MAX_IDS`` at a time."""
+    traces = []
+    for start in range(0, len(trace_ids), SEARCH_TRACES_MAX_IDS):
+        chunk = trace_ids[start:start + SEARCH_TRACES_MAX_IDS]
+        ids = ", ".join(f"'{trace_id}'" for trace_id in chunk)
+        with metrics.timer('SearchTraces'):
+            traces.extend(mlflow.search_traces(
+                locations=[experiment_id],
+                filter_string=f"attributes.request_id IN ({ids})",
+                return_type='list',
+            ))
+    return traces
+
+
+def load_traces(s3_file_key: str, experiment_id: str, trace_ids: Optional[List[str]] = None) -> List[Trace]:
+    """
+    Traces to evaluate for a capture file.
+
+    Traces logged by this container are kept in memory (see
+    ``LOGGED_TRACES_MAX_SIZE``), so the traces of a file ingested in the same
+    invocation need no request. Those it no longer has (a cold start, a
+    resumed file or shard, a window of files ingested by other invocations)
+    are fetched by ID. Without IDs (reprocessing), the experiment is searched
+    by trace name. An empty ID list means nothing new was logged.
+
+    Args:
+        s3_file_key: S3 key of the source file (trace name)
+        experiment_id: Experiment of the traces
+        trace_ids: IDs of the traces logged for the file, if known
+
+    Returns:
+        List of traces, in the order of ``trace_ids`` when given
+    """
+    start = time.perf_counter()
+
+    if trace_ids is None:
+        with metrics.timer('SearchTraces'):
+            traces = mlflow.search_traces(
+                locations=[experiment_id],
+                filter_string=f"name = '{s3_file_key}'",
+                return_type='list',
+            )
+            # Traces of batched exports are created from their span, without the trace name tag
+            if not traces and TRACE_EXPORT_MODE == 'batch':
+                traces = mlflow.search_traces(
+                    locations=[experiment_id],
+                    filter_string=f"span.name = '{s3_file_key}'",
+                    return_type='list',
+                )
+        logger.info(f"Found {len(traces)} traces with search_traces in {time.perf_counter() - start:.3f}s")
+        metrics.add('TracesLoaded', len(traces))
+        return traces
+
+    traces = logged_traces(trace_ids)
+    missing = [trace_id for trace_id, trace in zip(trace_ids, traces) if trace is None]
+    if missing:
+        found = {trace.info.trace_id: trace for trace in search_traces_by_id(experiment_id, missing)}
+        traces = [trace or found.get(trace_id) for trace_id, trace in zip(trace_ids, traces)]
+    traces = [trace for trace in traces if trace is not None]
+
+    logger.info(
+        f"Loaded {len(traces)} traces ({len(trace_ids) - len(missing)} kept in memory, {len(missing)} fetched by ID)"
+        f" in {time.perf_counter() - start:.3f}s"
+    )
+    metrics.add('TracesLoaded', len(traces))
+    return traces
+
+
+def get_hourly_budget(endpoint: str) -> Optional[Any]:
+    """Hourly judge budget of an endpoint in this container, created on first use. None when unlimited."""
+    per_hour = endpoint_setting(endpoint, 'JUDGE_BUDGET_PER_HOUR', JUDGE_BUDGET_PER_HOUR)
+    if per_hour <= 0:
+        return None
+
+    if endpoint not in _hourly_budgets:
+        if JUDGE_BUDGET_BACKEND == 's3':
+            _hourly_budgets[endpoint] = S3HourlyBudget(
+                per_hour, s3_client, DATA_CAPTURE_BUCKET, f"{JUDGE_BUDGET_S3_PREFIX.rstrip('/')}/{endpoint}/"
+            )
+        else:
+            _hourly_budgets[endpoint] = HourlyBudget(per_hour)
+
+    return _hourly_budgets[endpoint]
+
+
+def select_judge_traces(
+    traces: List[Any], trace_strata: Dict[str, str], endpoint: str
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Split traces into those sent to the LLM judges and the rest, within the judge budgets of their endpoint.
+
+    Sampled traces are tagged with ``judge_sample_weight`` (and their stratum)
+    so weighted judge aggregates estimate quality over all traffic.
+
+    Args:
+        traces: Traces of the file
+        trace_strata: Trace ID -> sampling stratum
+        endpoint: Endpoint of the traces
+
+    Returns:
+        (traces to judge, remaining traces)
+    """
+    per_file = endpoint_setting(endpoint, 'JUDGE_BUDGET_PER_FILE', JUDGE_BUDGET_PER_FILE)
+    selected, summary = plan_judge_sample(trace_strata, per_file, get_hourly_budget(endpoint))
+    logger.info(f"Judge sampling: {summary}")
+
+    judged, remaining = [], []
+    for trace in traces:
+        trace_id = trace.info.trace_id
+        if trace_id not in selected:
+            remaining.append(trace)
+            continue
+
+        judged.append(trace)
+        try:
+            mlflow.set_trace_tag(trace_id, "judge_sample_weight", str(round(selected[trace_id], 6)))
+            mlflow.set_trace_tag(trace_id, "judge_stratum", trace_strata[trace_id])
+        except Exception as e:
+            logger.warning(f"Could not tag sample weight on trace {trace_id}: {e}")
+
+    return judged, remaining
+
+
+def trace_prompt(trace: Any) -> Any:
+    """Prompt logged on the root span of a trace, None when it cannot be read."""
+    try:
+        return trace.data.spans[0].inputs.get('prompt')
+    except Exception:
+        return None
+
+
+def split_safe_templates(traces: List[Any], cascade: EvaluationCascade, judge_count: int) -> Tuple[List[Any], List[Any]]:
+    """
+    Split traces into those whose prompt is a known-safe template and the rest.
+
+    Template traces are tagged ``evaluation_tier=template`` and counted in the
+    cascade as ``judge_count`` avoided judge calls each.
+
+    Returns:
+        (traces to judge, template traces)
+    """
+    judged, templated = [], []
+    for trace in traces:
+        if not cascade.is_safe_template(trace_prompt(trace)):
+            judged.append(trace)
+            continue
+
+        templated.append(trace)
+        try:
+            mlflow.set_trace_tag(trace.info.trace_id, "evaluation_tier", "template")
+        except Exception as e:
+            logger.warning(f"Could not tag evaluation tier on trace {trace.info.trace_id}: {e}")
+
+    cascade.count('template', len(templated) * judge_count)
+    return judged, templated
+
+
+def prefetch_batched_verdicts(traces: List[Any], evaluation_scorers: Dict[str, Any]) -> None:
+    """
+    Judge short traces in batches before the evaluation, so the judges find their verdicts.
+
+    Traces the cascade settles, traces with offloaded payloads and traces
+    longer than ``JUDGE_BATCH_MAX_ITEM_CHARS`` are left to the per-trace
+    judges. Cached verdicts are handed over as they are.
+    """
+    batch_judge = get_batch_judge()
+    if batch_judge is None:
+        return
+
+    cache = get_judge_cache()
+    cascade = get_evaluation_cascade()
+    requests: Dict[str, List[Tuple[str, Any, Any]]] = {}
+    for trace in traces:
+        try:
+            root_span = trace.data.spans[0]
+            inputs, outputs = root_span.inputs, root_span.outputs
+        except Exception:
+            continue
+        if has_pointer(inputs) or has_pointer(outputs) or not batch_judge.is_batchable(inputs, outputs):
+            continue
+
+        for judge in evaluation_scorers['judges']:
+            if cascade is not None and cascade.verdict(judge.name, outputs, count=False) is not None:
+                continue
+            key = make_cache_key(
+                inputs, outputs, judge.name, BEDROCK_MODEL_ID, MLFLOW_EVALUATION_MODEL_PARAM, BATCH_JUDGE_MODE
+            )
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                batch_judge.store(key, {**cached, 'source': 'cache'})
+                continue
+            requests.setdefault(judge.name, []).append((key, inputs, outputs))
+
+    with metrics.timer('JudgeBatch'):
+        batch_judge.prefetch(requests, evaluation_scorers['batch_criteria'], max_workers=JUDGE_MAX_CONCURRENCY)
+
+
+def select_traces(traces: List[Trace], trace_ids: List[str]) -> List[Trace]:
+    """The traces with the given IDs."""
+    wanted = set(trace_ids)
+    return [trace for trace in traces if trace.info.trace_id in wanted]
+
+
+def evaluate_traces(traces: List[Trace], scorers: List[Any]) -> None:
+    """
+    Run mlflow.genai.evaluate, then retry only the (trace, scorer) cells that are missing or failed.
+
+    The scorers record each cell in the evaluation's coverage matrix. A pass
+    after the first submits just the traces with pending cells, grouped by
+    their pending scorers, so a failed pass (such as
+    https://github.com/mlflow/mlflow/issues/21002) or a failed judge call does
+    not re-run, and re-bill, the cells that already have an assessment. At most
+    ``EVALUATION_MAX_ATTEMPTS`` passes are made.
+    """
+    coverage = _evaluation_coverage
+    if coverage is None:
+        mlflow.genai.evaluate(data=traces, scorers=scorers)
+        return
+
+    trace_ids = [trace.info.trace_id for trace in traces]
+
+    coverage.add(trace_ids, [s.name for s in scorers])
+    for attempt in range(1, EVALUATION_MAX_ATTEMPTS + 1):
+        pending = coverage.pending(trace_ids)
+        if not pending:
+            return
+
+        groups: Dict[FrozenSet[str], List[str]] = {}
+        for trace_id, names in pending.items():
+            groups.setdefault(names, []).append(trace_id)
+
+        if attempt > 1:
+            cells = sum(len(names) for names in pending.values())
+            logger.info(f"Evaluation pass {attempt}: retrying {cells} cells of {len(pending)} traces")
+            metrics.add('EvaluationRetriedCells', cells)
+
+        for names, group_ids in groups.items():
+            data = traces if len(group_ids) == len(trace_ids) else select_traces(traces, group_ids)
+            try:
+                mlflow.genai.evaluate(data=data, scorers=[s for s in scorers if s.name in names])
+            except Exception as e:
+                logger.warning(f"Evaluation pass {attempt} failed for {len(group_ids)} traces: {e}")
+
+
+def log_coverage(s3_file_key: str, coverage: CoverageMatrix) -> None:
+    """Log the coverage of an evaluation and tag traces whose assessments are incomplete."""
+    summary = coverage.summary()
+    logger.info(f"Evaluation coverage for {s3_file_key}: {json.dumps(summary)}")
+
+    incomplete = coverage.incomplete()
+    metrics.add('AssessmentsMissing', sum(len(cells) for cells in incomplete.values()))
+    if not incomplete:
+        return
+
+    logger.warning(f"Missing assessments for {len(incomplete)} traces of {s3_file_key}: {json.dumps(incomplete)}")
+    for trace_id, cells in incomplete.items():
+        try:
+            mlflow.set_trace_tag(trace_id, "missing_assessments", ",".join(sorted(cells)))
+        except Exception as e:
+            logger.warning(f"Could not tag missing assessments on trace {trace_id}: {e}")
+
+
+def run_evaluations(
+    s3_file_key: str,
+    trace_ids: Optional[List[str]] = None,
+    trace_strata: Optional[Dict[str, str]] = None,
+    endpoint: Optional[str] = None,
+) -> None:
+    """
+    Run GenAI evaluations on traces from the specified S3 file, in the experiment of its endpoint.
+
+    With judge budgets configured and the trace strata known, only a
+    stratified sample of the traces goes to the LLM judges; the cheap
+    ``tokens_words`` scorer still runs on every trace. In ``cascade`` mode,
+    known-safe prompt templates skip the judges and clear cases are settled
+    without Bedrock (see ``EvaluationCascade``). Missing or failed
+    (trace, scorer) cells are retried on their own and the final coverage is
+    logged. Files whose traces are all error responses are not evaluated.
+    Judge budgets and the judge call scheduler are those of the endpoint.
+
+    Args:
+        s3_file_key: S3 key to filter traces, or the label of a window of files
+        trace_ids: IDs of the traces logged for the file(s); searched by name when omitted
+        trace_strata: Trace ID -> sampling stratum of the logged traces
+        endpoint: Endpoint of the traces, derived from ``s3_file_key`` when omitted
+    """
+    global _evaluation_coverage, _evaluation_endpoint
+
+    endpoint = endpoint or endpoint_for_key(s3_file_key)
+    try:
+        logger.info(f"Running mlflow genai evaluations on traces from {s3_file_key}")
+
+        # Files holding only error responses have nothing for the judges to assess
+        if trace_strata and all(stratum.startswith('error=1') for stratum in trace_strata.values()):
+            logger.info(f"Only error responses in {s3_file_key}, skipping evaluation")
+            return
+
+        # mlflow.genai.evaluate logs its run to the active experiment
+        experiment_id = activate_experiment(endpoint)
+
+        # Traces from this file
+        traces = load_traces(s3_file_key, experiment_id, trace_ids)
+
+        if len(traces) == 0:
+            logger.warning(f"No traces found for {s3_file_key}")
+            return
+
+        logger.info(f"Found {len(traces)} traces to evaluate")
+
+        # Scorers are built once per container; the stats are per evaluation
+        evaluation_scorers = get_evaluation_scorers()
+        tokens_words = evaluation_scorers['tokens_words']
+        scorers = evaluation_scorers['judges'] + [tokens_words]
+
+        # Outcome of every (trace, scorer) cell, filled in by the scorers
+        _evaluation_coverage = CoverageMatrix()
+
+        judge_cache = get_judge_cache()
+        if judge_cache is not None:
+            judge_cache.reset_stats()
+        _evaluation_endpoint = endpoint
+        judge_scheduler = get_judge_scheduler(endpoint)
+        judge_scheduler.reset_stats()
+        payload_offloader = get_payload_offloader()
+        if payload_offloader is not None:
+            payload_offloader.reset_stats()
+        evaluation_cascade = get_evaluation_cascade()
+        if evaluation_cascade is not None:
+            evaluation_cascade.reset_stats()
+        batch_judge = get_batch_judge()
+        if batch_judge is not None:
+            batch_judge.reset_stats()
+            batch_judge.scheduler = judge_scheduler
+
+        # Only a budgeted, stratified sample goes to the LLM judges
+        # (traces found by search on reprocessing carry no strata and are all judged)
+        judged_traces, unjudged_traces = traces, []
+        sampling_enabled = (
+            endpoint_setting(endpoint, 'JUDGE_BUDGET_PER_FILE', JUDGE_BUDGET_PER_FILE) > 0
+            or endpoint_setting(endpoint, 'JUDGE_BUDGET_PER_HOUR', JUDGE_BUDGET_PER_HOUR) > 0
+        )
+        if sampling_enabled and trace_strata:
+            judged_traces, unjudged_traces = select_judge_traces(traces, trace_strata, endpoint)
+
+        # Known-safe prompt templates skip the judges (cascade tier 1); the
+        # judges settle empty/error responses and refusals themselves (tier 2)
+        if evaluation_cascade is not None:
+            judged_traces, templated_traces = split_safe_templates(
+                judged_traces, evaluation_cascade, len(evaluation_scorers['judges'])
+            )
+            unjudged_traces = unjudged_traces + templated_traces
+
+        logger.info(f"Start mlflow genai trace evaluate")
+        with metrics.timer('Evaluate'):
+            if judged_traces:
+                if batch_judge is not None:
+                    prefetch_batched_verdicts(judged_traces, evaluation_scorers)
+                evaluate_traces(judged_traces, scorers)
+            if unjudged_traces:
+                evaluate_traces(unjudged_traces, [tokens_words])
+        metrics.add('TracesJudged', len(judged_traces))
+        metrics.add('TracesEvaluated', len(traces))
+        log_coverage(s3_file_key, _evaluation_coverage)
+
+        logger.info(f"Evaluations completed successfully")
+        if judge_cache is not None:
+            logger.info(f"Judge cache stats: {judge_cache.stats()}")
+        logger.info(f"Judge scheduler stats: {judge_scheduler.stats()}")
+        if payload_offloader is not None:
+            metrics.add('PayloadsRehydrated', payload_offloader.rehydrated)
+        if evaluation_cascade is not None:
+            cascade_stats = evaluation_cascade.stats()
+            logger.info(f"Evaluation cascade stats: {cascade_stats}")
+            metrics.add('CascadeTemplateCalls', cascade_stats['template'])
+            metrics.add('CascadeDeterministicCalls', cascade_stats['deterministic'])
+            metrics.add('CascadeEscalatedCalls', cascade_stats['escalated'])
+        if batch_judge is not None:
+            batch_stats = batch_judge.stats()
+            logger.info(f"Batch judge stats: {batch_stats}")
+            metrics.add('JudgeBatchCalls', batch_stats['calls'])
+            metrics.add('JudgeBatchVerdicts', batch_stats['verdicts'])
+            metrics.add('JudgeBatchFallbacks', batch_stats['fallbacks'])
+            # Verdicts of traces the evaluation did not reach are not kept for the next file
+            batch_judge.clear()
 
     except Exception as e:
         logger.error(f"Error running evaluations: {e}", exc_info=True)
         # Don't raise exception - evaluations are optional
+
+
+MODULE_INIT_SECONDS = time.perf_counter() - _MODULE_INIT_STARTED
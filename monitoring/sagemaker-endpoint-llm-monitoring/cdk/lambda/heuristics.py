@@ -0,0 +1,118 @@
+"""
+Cheap heuristic quality signals computed for a batch of capture records at once.
+
+The prompts and responses of a batch are put in one pandas frame and every
+signal is computed column-wise, instead of dispatching a scorer per trace:
+
+- ``prompt_words``/``prompt_chars``, ``response_words``/``response_chars``
+- ``repetition_ratio``: share of repeated words in the response (1 - unique/total)
+- ``truncated``: the generation stopped at ``max_new_tokens`` (``finish_reason``
+  ``length``, or the generated token count reached the limit)
+- ``empty_output``: response is empty or whitespace
+- ``refusal``: response contains a refusal marker
+- ``length_ratio``: response chars / prompt chars
+
+pandas is a dependency of MLflow and is imported on first use.
+"""
+from typing import Any, Dict, List, Optional
+
+from endpoint_stats import CHARS_PER_TOKEN
+
+# Case-insensitive markers of a refused request
+REFUSAL_MARKERS = (
+    r"i'?m sorry,? but",
+    r"i (?:can ?not|can't|am unable to|won't) (?:help|assist|provide|comply)",
+    r"as an ai(?: language model)?",
+    r"i'?m not able to (?:help|assist|provide)",
+)
+
+# Share of max_new_tokens from which a response counts as truncated when only estimated tokens are known
+TRUNCATION_TOLERANCE = 0.95
+
+
+def response_text(response: Any) -> str:
+    """Generated text of a parsed response (dict or list of dicts); '' when there is none."""
+    if isinstance(response, list) and response and isinstance(response[0], dict):
+        response = response[0]
+    if isinstance(response, dict):
+        text = response.get('generated_text')
+        return text if isinstance(text, str) else ''
+    return response if isinstance(response, str) else ''
+
+
+def extract_columns(parsed_records: List[Dict]) -> Dict[str, List[Any]]:
+    """Columns of the heuristics frame, one row per parsed capture record."""
+    columns: Dict[str, List[Any]] = {
+        'prompt': [], 'response': [], 'max_new_tokens': [], 'generated_tokens': [], 'finish_reason': [],
+    }
+    for parsed_record in parsed_records:
+        request = parsed_record.get('request')
+        prompt = request if isinstance(request, str) else ''
+        request = request if isinstance(request, dict) else {}
+        prompt = request.get('inputs', prompt)
+        parameters = request.get('parameters')
+        max_new_tokens = parameters.get('max_new_tokens') if isinstance(parameters, dict) else None
+
+        response = parsed_record.get('response')
+        first = response[0] if isinstance(response, list) and response and isinstance(response[0], dict) else response
+        details = first.get('details') if isinstance(first, dict) else None
+        details = details if isinstance(details, dict) else {}
+        finish_reason = (first.get('finish_reason') if isinstance(first, dict) else None) or details.get('finish_reason')
+
+        columns['prompt'].append(prompt if isinstance(prompt, str) else str(prompt))
+        columns['response'].append(response_text(response))
+        columns['max_new_tokens'].append(max_new_tokens if isinstance(max_new_tokens, (int, float)) else None)
+        columns['generated_tokens'].append(details.get('generated_tokens'))
+        columns['finish_reason'].append(finish_reason)
+    return columns
+
+
+def compute_heuristics(parsed_records: List[Dict]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Heuristic signals of each record of a batch.
+
+    Args:
+        parsed_records: Records from ``parse_data_capture_record``
+
+    Returns:
+        One dict of signals per record, in order; None for error responses
+    """
+    if not parsed_records:
+        return []
+
+    import pandas as pd
+
+    frame = pd.DataFrame(extract_columns(parsed_records))
+    prompt, response = frame['prompt'].astype(object), frame['response'].astype(object)
+
+    # One row per response word, grouped back by record for the total and distinct counts
+    words = response.str.lower().str.split().explode().dropna()
+    grouped = words.groupby(level=0)
+    response_words = grouped.size().reindex(frame.index, fill_value=0)
+    unique_words = grouped.nunique().reindex(frame.index, fill_value=0)
+
+    response_chars = response.str.len()
+    prompt_chars = prompt.str.len()
+    max_new_tokens = pd.to_numeric(frame['max_new_tokens'], errors='coerce')
+    generated_tokens = pd.to_numeric(frame['generated_tokens'], errors='coerce')
+    estimated = generated_tokens.isna()
+    generated_tokens = generated_tokens.fillna(response_chars / CHARS_PER_TOKEN)
+    limit = max_new_tokens.where(~estimated, max_new_tokens * TRUNCATION_TOLERANCE)
+
+    signals = pd.DataFrame({
+        'prompt_words': prompt.str.split().str.len().fillna(0).astype(int),
+        'prompt_chars': prompt_chars.astype(int),
+        'response_words': response_words.astype(int),
+        'response_chars': response_chars.astype(int),
+        'repetition_ratio': (1 - unique_words / response_words.where(response_words > 0)).fillna(0.0).round(4),
+        'truncated': frame['finish_reason'].eq('length') | (generated_tokens >= limit).fillna(False),
+        'empty_output': response.str.strip().eq(''),
+        'refusal': response.str.contains('|'.join(REFUSAL_MARKERS), case=False, regex=True).fillna(False),
+        'length_ratio': (response_chars / prompt_chars.clip(lower=1)).round(4),
+    })
+
+    rows = signals.to_dict('records')
+    return [
+        None if parsed_record.get('is_error') else {name: value.item() if hasattr(value, 'item') else value for name, value in row.items()}
+        for parsed_record, row in zip(parsed_records, rows)
+    ]
@@ -0,0 +1,227 @@
+"""
+Index of already-ingested SageMaker data capture event IDs.
+
+Step Functions retries and duplicate S3 events re-deliver files that were
+(partly) ingested before. The index records every ``eventMetadata.eventId``
+whose trace was written, so re-delivered records can be skipped without any
+MLflow write or judge call.
+
+With the local SQLite backend, a Bloom filter sits in front of the backend.
+Event IDs the filter has never seen are new without a backend lookup, which
+is the common case; only possible duplicates are confirmed against the
+backend. The filter only knows what this container wrote, so it is not used
+with the shared S3 backend. That backend records the event IDs of each
+capture file in a few objects under the file's key and reads them once per
+file and invocation, so IDs written by any container, up to the last batch
+before a crash, are found.
+"""
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings. Filters of the same size merge with ``union``."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, bits: Optional[bytes] = None):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+    def union(self, other_bits: bytes) -> None:
+        if len(other_bits) != len(self.bits):
+            logger.warning("Ignoring Bloom filter snapshot of a different size")
+            return
+        merged = int.from_bytes(self.bits, 'little') | int.from_bytes(other_bits, 'little')
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'little'))
+
+
+class SQLiteIndexBackend:
+    """Event IDs in a local SQLite file, per container. Local stand-in for the S3 backend."""
+
+    shared = False
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS ingested_events (event_id TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bloom_snapshot (id INTEGER PRIMARY KEY, bits BLOB)")
+        self._conn.commit()
+
+    def contains_many(self, event_ids: Iterable[str]) -> Set[str]:
+        event_ids = list(event_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT event_id FROM ingested_events WHERE event_id IN ({','.join('?' * len(event_ids))})",
+                event_ids,
+            ).fetchall() if event_ids else []
+        return {row[0] for row in rows}
+
+    def add_many(self, event_ids: Iterable[str], s3_file_key: str = '') -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO ingested_events (event_id) VALUES (?)",
+                [(event_id,) for event_id in event_ids],
+            )
+            self._conn.commit()
+
+    def load_bloom(self) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT bits FROM bloom_snapshot WHERE id = 1").fetchone()
+        return row[0] if row else None
+
+    def save_bloom(self, bloom: BloomFilter) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO bloom_snapshot (id, bits) VALUES (1, ?)", (bytes(bloom.bits),)
+            )
+            self._conn.commit()
+
+
+class S3IndexBackend:
+    """
+    Event IDs as JSON marker objects under an S3 prefix, shared by all containers.
+
+    Each ``add_many`` call (one trace writer flush) writes one object listing
+    its event IDs under the capture file's key, so a file costs one PUT per
+    flush and one listing plus a GET per object to read back.
+    """
+
+    shared = True
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def _file_prefix(self, s3_file_key: str) -> str:
+        return f"{self.prefix}files/{s3_file_key}/"
+
+    def load_file(self, s3_file_key: str) -> Set[str]:
+        """Event IDs recorded for a capture file."""
+        event_ids: Set[str] = set()
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._file_prefix(s3_file_key)):
+            for obj in page.get('Contents', []):
+                body = self.s3_client.get_object(Bucket=self.bucket, Key=obj['Key'])['Body'].read()
+                event_ids.update(json.loads(body))
+        return event_ids
+
+    def add_many(self, event_ids: Iterable[str], s3_file_key: str = '') -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self._file_prefix(s3_file_key)}{uuid.uuid4().hex}.json",
+            Body=json.dumps(list(event_ids)).encode('utf-8'),
+            ContentType='application/json',
+        )
+
+
+class IngestionIndex:
+    """
+    Dedup index of ingested event IDs, in front of a persistent backend.
+
+    With a local backend, a Bloom filter miss means the event was never
+    ingested and a hit may be a false positive, confirmed against the
+    backend. With a shared backend, the IDs of a capture file are read from
+    the backend the first time the file is checked and kept until ``save``
+    ends the invocation. Backend failures are logged and treated as "not
+    ingested", so records are never dropped because of the index.
+    """
+
+    def __init__(self, backend: Any, bloom_capacity: int = 1000000, bloom_error_rate: float = 0.01):
+        self.backend = backend
+        self.bloom = None if backend.shared else BloomFilter(bloom_capacity, bloom_error_rate)
+        self._files: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+        if self.bloom is not None:
+            try:
+                snapshot = backend.load_bloom()
+            except Exception as e:
+                logger.warning(f"Could not load ingestion index Bloom filter: {e}")
+                snapshot = None
+            if snapshot:
+                self.bloom.union(snapshot)
+
+    def _file_ids(self, s3_file_key: str) -> Set[str]:
+        with self._lock:
+            if s3_file_key not in self._files:
+                try:
+                    self._files[s3_file_key] = self.backend.load_file(s3_file_key)
+                except Exception as e:
+                    logger.warning(f"Could not read the ingestion index of {s3_file_key}: {e}")
+                    self._files[s3_file_key] = set()
+            return self._files[s3_file_key]
+
+    def seen(self, event_id: Optional[str], s3_file_key: str = '') -> bool:
+        """Whether the event of a capture file has already been ingested."""
+        if not event_id:
+            return False
+
+        if self.bloom is None:
+            return event_id in self._file_ids(s3_file_key)
+
+        with self._lock:
+            if event_id not in self.bloom:
+                return False
+
+        try:
+            return event_id in self.backend.contains_many([event_id])
+        except Exception as e:
+            logger.warning(f"Ingestion index lookup failed for {event_id}: {e}")
+            return False
+
+    def mark(self, event_ids: Iterable[Optional[str]], s3_file_key: str = '') -> None:
+        """Record events of a capture file whose traces were written."""
+        event_ids = [event_id for event_id in event_ids if event_id]
+        if not event_ids:
+            return
+
+        try:
+            self.backend.add_many(event_ids, s3_file_key)
+        except Exception as e:
+            logger.warning(f"Could not record {len(event_ids)} events in the ingestion index: {e}")
+            return
+
+        with self._lock:
+            if self.bloom is None:
+                self._files.setdefault(s3_file_key, set()).update(event_ids)
+                return
+            for event_id in event_ids:
+                self.bloom.add(event_id)
+
+    def save(self) -> None:
+        """
+        End of an invocation: persist the Bloom filter of a local backend, and
+        forget the file IDs read from a shared one so the next invocation sees
+        what other containers wrote since.
+        """
+        with self._lock:
+            self._files = {}
+            if self.bloom is None:
+                return
+        try:
+            with self._lock:
+                self.backend.save_bloom(self.bloom)
+        except Exception as e:
+            logger.warning(f"Could not save ingestion index Bloom filter: {e}")
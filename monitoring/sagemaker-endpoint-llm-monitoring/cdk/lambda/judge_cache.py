@@ -0,0 +1,198 @@
+"""
+Persistent cache for LLM-judge results.
+
+Judge verdicts are keyed on a hash of the trace inputs/outputs, the scorer
+name, the judge model ID, the judge model parameters and, for verdicts not
+given by the per-trace judge, the judge mode, so repeated prompts
+(health checks, templated prompts, retries) reuse an earlier verdict instead of
+calling Bedrock again. Results are stored in a local SQLite file or in S3,
+with an in-memory LRU in front of either backend.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    inputs: Any, outputs: Any, scorer_name: str, model_id: str, model_params: Dict, judge_mode: Optional[str] = None
+) -> str:
+    """
+    Content hash identifying a single judge verdict.
+
+    ``judge_mode`` tells apart verdicts given by a different prompt than the
+    per-trace judge's (such as ``'batch-v1'``), which keep their own entries.
+    """
+    parts = [inputs, outputs, scorer_name, model_id, model_params]
+    if judge_mode is not None:
+        parts.append(judge_mode)
+    payload = json.dumps(
+        parts,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """
+    Judge results in a local SQLite file.
+
+    Entries older than the TTL are ignored on read, and the least recently
+    used entries are evicted once ``max_entries`` is exceeded. On Lambda the
+    file lives in ``/tmp`` and is shared by invocations of a warm container.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS judge_results_accessed ON judge_results (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, ttl_seconds: float) -> Optional[Tuple[Dict, float]]:
+        """Value and creation time of an unexpired entry, None otherwise."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM judge_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > ttl_seconds:
+                self._conn.execute("DELETE FROM judge_results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE judge_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judge_results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM judge_results WHERE key IN ("
+                "SELECT key FROM judge_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+class S3CacheBackend:
+    """
+    Judge results stored as one JSON object per key under an S3 prefix.
+
+    Shared across containers and deployments. Expired entries are ignored on
+    read; configure an S3 lifecycle rule on the prefix to delete them.
+    """
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def get(self, key: str, ttl_seconds: float) -> Optional[Tuple[Dict, float]]:
+        """Value and creation time of an unexpired entry, None otherwise."""
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        entry = json.loads(obj['Body'].read())
+        if time.time() - entry['created_at'] > ttl_seconds:
+            return None
+        return entry['value'], entry['created_at']
+
+    def put(self, key: str, value: Dict) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps({'created_at': time.time(), 'value': value}),
+            ContentType='application/json',
+        )
+
+
+class JudgeResultCache:
+    """
+    Judge result cache with an in-memory LRU in front of a persistent backend.
+
+    Memory entries keep the creation time of the backend entry they were
+    read from, so they expire with it. Backend failures are logged and
+    treated as misses so evaluation never fails because of the cache.
+    """
+
+    def __init__(self, backend: Any, ttl_seconds: float, max_memory_entries: int = 10000):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        try:
+            entry = self.backend.get(key, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Judge cache read failed: {e}")
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            value, created_at = entry
+            self._remember(key, value, created_at)
+        return value
+
+    def put(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._remember(key, value, time.time())
+        try:
+            self.backend.put(key, value)
+        except Exception as e:
+            logger.warning(f"Judge cache write failed: {e}")
+
+    def _remember(self, key: str, value: Dict, created_at: float) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since the last ``reset_stats``."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
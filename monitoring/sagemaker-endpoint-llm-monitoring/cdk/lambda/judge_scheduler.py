@@ -0,0 +1,223 @@
+"""
+Rate-limited, adaptive execution of LLM-judge calls.
+
+``mlflow.genai.evaluate`` fans scorer calls out over its own thread pool. The
+scheduler sits inside each judge call and keeps that fan-out within the
+Bedrock quota:
+
+- token buckets cap requests/min and tokens/min,
+- an AIMD limiter caps concurrent calls, halving the limit on throttling and
+  growing it by one after a run of successful calls,
+- a throttled or failed call is retried on its own (that single trace and
+  scorer), with exponential backoff, instead of re-running the evaluation.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_MARKERS = (
+    'throttl',
+    'too many requests',
+    'rate limit',
+    'ratelimit',
+    'serviceunavailable',
+    'service unavailable',
+)
+
+
+def is_throttling_error(error: Any) -> bool:
+    """Whether an exception or error message indicates Bedrock throttling."""
+    if error is None:
+        return False
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in THROTTLING_MARKERS)
+
+
+def estimate_tokens(arguments: Dict[str, Any], max_output_tokens: int) -> int:
+    """Rough judge call size: ~4 characters per prompt token plus the output budget."""
+    return len(json.dumps(arguments, default=str)) // 4 + max_output_tokens
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``. A rate <= 0 disables the limit."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self._tokens = rate_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """Block until ``amount`` tokens are available. Returns the seconds waited."""
+        if self.rate_per_second <= 0:
+            return 0.0
+
+        # Requests larger than the bucket would never fit; let them through once it is full
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait_seconds = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease.
+
+    The limit grows by one after ``increase_after`` consecutive successes and
+    halves (down to ``min_limit``) on throttling.
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int = 1, max_limit: int = 64, increase_after: int = 10):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase_after = increase_after
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class JudgeScheduler:
+    """
+    Runs judge calls under request/token rate limits and an adaptive concurrency limit.
+
+    Counters are shared across all judges wrapped by the scheduler and exposed
+    through ``stats``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_attempts: int = 4,
+        backoff_seconds: float = 1.0,
+        max_output_tokens: int = 512,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.limiter = AIMDLimiter(max_concurrency, max_limit=max_concurrency)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_output_tokens = max_output_tokens
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._started = time.monotonic()
+            self._latencies: List[float] = []
+            self._counters = {
+                'calls': 0,
+                'succeeded': 0,
+                'failed': 0,
+                'throttled': 0,
+                'retries': 0,
+                'rate_limit_wait_seconds': 0.0,
+            }
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def call(self, judge: Callable[..., Any], arguments: Dict[str, Any]) -> Any:
+        """
+        Call ``judge(**arguments)`` for one (trace, scorer) pair, retrying throttled or failed attempts.
+
+        A judge that reports the failure in a returned ``Feedback.error``
+        instead of raising is treated the same as one that raises. The last
+        result or exception is returned/raised once attempts run out.
+        """
+        tokens = estimate_tokens(arguments, self.max_output_tokens)
+
+        for attempt in range(1, self.max_attempts + 1):
+            waited = self.request_bucket.acquire(1) + self.token_bucket.acquire(tokens)
+            self._count('rate_limit_wait_seconds', waited)
+
+            self.limiter.acquire()
+            start = time.monotonic()
+            error = None
+            try:
+                result = judge(**arguments)
+                error = getattr(result, 'error', None)
+            except Exception as e:
+                result = None
+                error = e
+            finally:
+                throttled = is_throttling_error(error)
+                self.limiter.release(throttled)
+
+            with self._lock:
+                self._counters['calls'] += 1
+                self._latencies.append(time.monotonic() - start)
+                if throttled:
+                    self._counters['throttled'] += 1
+
+            if error is None:
+                self._count('succeeded')
+                return result
+
+            if attempt == self.max_attempts:
+                self._count('failed')
+                if result is None:
+                    raise error
+                return result
+
+            self._count('retries')
+            delay = self.backoff_seconds * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and latency counters since the last ``reset_stats``."""
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+            elapsed = time.monotonic() - self._started
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        counters['rate_limit_wait_seconds'] = round(counters['rate_limit_wait_seconds'], 3)
+        counters.update({
+            'calls_per_second': round(counters['calls'] / elapsed, 2) if elapsed > 0 else 0.0,
+            'latency_p50_seconds': percentile(0.5),
+            'latency_p95_seconds': percentile(0.95),
+            'concurrency_limit': self.limiter.limit,
+        })
+        return counters
@@ -0,0 +1,126 @@
+"""
+Per-invocation stage metrics emitted as CloudWatch Embedded Metric Format (EMF).
+
+Metrics are accumulated in memory during an invocation and written as JSON
+lines to stdout at the end. CloudWatch Logs extracts them into metrics with
+no PutMetricData calls. Lines are printed rather than logged because the
+Lambda log formatter prefixes messages, and EMF needs the bare JSON document.
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+# CloudWatch accepts at most this many values per metric in one EMF document
+MAX_VALUES_PER_METRIC = 100
+
+
+class MetricsRecorder:
+    """
+    Thread-safe accumulator of counters and value distributions for one invocation.
+
+    - ``add`` sums a value (record counts, bytes, time spent in a stage).
+      Stage timers used from several worker threads therefore report the
+      total time across threads, not wall time.
+    - ``observe`` keeps individual values, optionally under extra dimensions
+      such as the scorer name, so CloudWatch can compute percentiles.
+    """
+
+    def __init__(self, namespace: str, enabled: bool = True):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals: Dict[str, float] = {}
+            self._observations: Dict[Tuple[Tuple[str, str], ...], Dict[str, List[float]]] = {}
+            self._units: Dict[str, str] = {}
+
+    def add(self, name: str, value: float = 1, unit: str = 'Count') -> None:
+        """Add ``value`` to the ``name`` total."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0) + value
+            self._units[name] = unit
+
+    def observe(self, name: str, value: float, unit: str = 'Milliseconds', **dimensions: str) -> None:
+        """Record one ``name`` value, under extra ``dimensions`` if given."""
+        if not self.enabled:
+            return
+        key = tuple(sorted(dimensions.items()))
+        with self._lock:
+            self._observations.setdefault(key, {}).setdefault(name, []).append(value)
+            self._units[name] = unit
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Add the time spent in the block to ``{stage}Time`` (milliseconds)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{stage}Time", (time.perf_counter() - start) * 1000, 'Milliseconds')
+
+    def _document(self, dimensions: Dict[str, str], values: Dict[str, Any], timestamp: int) -> Dict[str, Any]:
+        return {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [sorted(dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': self._units[name]} for name in sorted(values)],
+                }],
+            },
+            **dimensions,
+            **values,
+        }
+
+    def documents(self, dimensions: Dict[str, str]) -> List[Dict[str, Any]]:
+        """EMF documents for everything recorded since the last ``reset``."""
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            totals = {name: round(value, 3) for name, value in self._totals.items()}
+            observations = {key: {n: list(v) for n, v in metrics.items()} for key, metrics in self._observations.items()}
+
+        documents = []
+        if totals:
+            documents.append(self._document(dimensions, totals, timestamp))
+
+        for key, metrics in observations.items():
+            doc_dimensions = {**dimensions, **dict(key)}
+            longest = max(len(values) for values in metrics.values())
+            for start in range(0, longest, MAX_VALUES_PER_METRIC):
+                chunk = {
+                    name: [round(v, 3) for v in values[start:start + MAX_VALUES_PER_METRIC]]
+                    for name, values in metrics.items()
+                    if values[start:start + MAX_VALUES_PER_METRIC]
+                }
+                documents.append(self._document(doc_dimensions, chunk, timestamp))
+        return documents
+
+    def emit(self, dimensions: Dict[str, str], stream: Optional[TextIO] = None) -> List[Dict[str, Any]]:
+        """
+        Write the EMF documents as JSON lines and reset the recorder.
+
+        Args:
+            dimensions: Dimensions of every metric (e.g. endpoint and mode)
+            stream: Where to write, stdout by default
+
+        Returns:
+            The emitted documents
+        """
+        if not self.enabled:
+            return []
+
+        documents = self.documents(dimensions)
+        stream = stream or sys.stdout
+        for document in documents:
+            stream.write(json.dumps(document) + '\n')
+        stream.flush()
+        self.reset()
+        return documents
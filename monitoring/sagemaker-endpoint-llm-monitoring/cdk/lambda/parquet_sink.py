@@ -0,0 +1,252 @@
+"""
+Columnar copy of parsed capture records as Parquet, for analytic queries.
+
+Each ingested record becomes one row. Rows are written as Hive-partitioned
+files, so engines such as DuckDB, pandas and Athena can prune by endpoint
+and day:
+
+    <prefix>endpoint=<endpoint name>/date=<YYYY-MM-DD>/<time>-<id>.parquet
+
+The files use compact types (dictionary-encoded low-cardinality strings,
+16/32-bit integers, float32 ratios, millisecond UTC timestamps), zstd
+compression and row-group statistics. Rows are sorted by ``inference_time``,
+so time filters skip row groups. Prompt and response text are stored too;
+column pruning keeps them off the read path of queries that do not select them.
+
+pyarrow is a dependency of MLflow and is imported on first use.
+"""
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from heuristics import extract_columns
+from streaming import iso_to_epoch_ms
+
+# Hive's name for a partition whose value is unknown
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+HEURISTIC_COLUMNS = (
+    ('prompt_words', 'int32'),
+    ('prompt_chars', 'int32'),
+    ('response_words', 'int32'),
+    ('response_chars', 'int32'),
+    ('repetition_ratio', 'float32'),
+    ('truncated', 'bool_'),
+    ('empty_output', 'bool_'),
+    ('refusal', 'bool_'),
+)
+
+
+def parquet_schema() -> Any:
+    """Schema of the Parquet files. The partition columns, ``endpoint`` and ``date``, live in the path."""
+    import pyarrow as pa
+
+    text_dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ('event_id', pa.string()),
+            ('inference_time', pa.timestamp('ms', tz='UTC')),
+            ('s3_file_key', text_dictionary),
+            ('status_code', pa.int16()),
+            ('is_error', pa.bool_()),
+            ('error_message', pa.string()),
+            ('request_bytes', pa.int32()),
+            ('response_bytes', pa.int32()),
+            ('max_new_tokens', pa.int32()),
+            ('generated_tokens', pa.int32()),
+            ('finish_reason', text_dictionary),
+            ('streamed', pa.bool_()),
+            ('stream_chunks', pa.int32()),
+            ('ttft_ms', pa.float32()),
+        ]
+        + [(name, getattr(pa, type_name)()) for name, type_name in HEURISTIC_COLUMNS]
+        + [
+            ('prompt', pa.string()),
+            ('response_text', pa.string()),
+        ]
+    )
+
+
+def as_int(value: Any, bits: int = 64) -> Optional[int]:
+    """``value`` as an integer of a ``bits``-bit signed column; None when it is not one."""
+    try:
+        number = int(value) if value is not None and not isinstance(value, bool) else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if number is None or not -2 ** (bits - 1) <= number < 2 ** (bits - 1):
+        return None
+    return number
+
+
+def as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None and not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def as_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+def partition_date(epoch_ms: Optional[float]) -> str:
+    if epoch_ms is None:
+        return NULL_PARTITION
+    return datetime.fromtimestamp(epoch_ms / 1000, timezone.utc).strftime('%Y-%m-%d')
+
+
+def build_columns(parsed_records: List[Dict], s3_file_key: str) -> Dict[str, List[Any]]:
+    """
+    Column values of ``parsed_records``, named as in ``parquet_schema``.
+
+    A value that does not fit its column (a non-numeric status code, a
+    count out of range) becomes a null rather than failing the whole file.
+    """
+    text = extract_columns(parsed_records)
+    columns: Dict[str, List[Any]] = {name: [] for name in parquet_schema().names}
+    for position, parsed_record in enumerate(parsed_records):
+        stream = parsed_record.get('stream') or {}
+        signals = parsed_record.get('heuristics') or {}
+        columns['event_id'].append(as_text(parsed_record.get('event_id')))
+        columns['inference_time'].append(as_int(iso_to_epoch_ms(parsed_record.get('timestamp'))))
+        columns['s3_file_key'].append(s3_file_key)
+        columns['status_code'].append(as_int(parsed_record.get('status_code'), 16))
+        columns['is_error'].append(bool(parsed_record.get('is_error', False)))
+        columns['error_message'].append(as_text(parsed_record.get('error_message')))
+        columns['request_bytes'].append(as_int(parsed_record.get('request_bytes'), 32))
+        columns['response_bytes'].append(as_int(parsed_record.get('response_bytes'), 32))
+        columns['max_new_tokens'].append(as_int(text['max_new_tokens'][position], 32))
+        columns['generated_tokens'].append(as_int(text['generated_tokens'][position], 32))
+        finish_reason = text['finish_reason'][position]
+        columns['finish_reason'].append(finish_reason if isinstance(finish_reason, str) else None)
+        columns['streamed'].append(bool(stream))
+        columns['stream_chunks'].append(as_int(stream.get('chunks'), 32))
+        columns['ttft_ms'].append(as_float(stream.get('ttft_ms')))
+        for name, _ in HEURISTIC_COLUMNS:
+            columns[name].append(signals.get(name))
+        columns['prompt'].append(text['prompt'][position])
+        columns['response_text'].append(text['response'][position])
+    return columns
+
+
+def build_table(columns: Dict[str, List[Any]]) -> Any:
+    """Arrow table of ``columns``, sorted by ``inference_time``."""
+    import pyarrow as pa
+
+    schema = parquet_schema()
+    arrays = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+    return table.sort_by('inference_time')
+
+
+class LocalParquetStore:
+    """Parquet files in a local directory. Local stand-in for the S3 store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def put(self, key: str, body: bytes) -> str:
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+        return f"file://{path}"
+
+
+class S3ParquetStore:
+    """Parquet files as objects under an S3 prefix."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def put(self, key: str, body: bytes) -> str:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}",
+            Body=body,
+            ContentType='application/vnd.apache.parquet',
+        )
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+
+class ParquetSink:
+    """
+    Buffers parsed records and writes them as partitioned Parquet files.
+
+    Records are kept by reference until ``flush``, so signals attached to them
+    after ``add`` (such as the heuristics of a trace batch) end up in the row.
+
+    Args:
+        store: ``LocalParquetStore`` or ``S3ParquetStore``
+        s3_file_key: Capture file the records come from
+        max_rows: Buffered rows at which ``full`` turns True
+        row_group_size: Rows per Parquet row group
+    """
+
+    def __init__(self, store: Any, s3_file_key: str, max_rows: int = 50000, row_group_size: int = 10000):
+        self.store = store
+        self.s3_file_key = s3_file_key
+        self.max_rows = max(max_rows, 1)
+        self.row_group_size = max(row_group_size, 1)
+        self._records: List[Tuple[str, Dict]] = []
+        self.rows_written = 0
+        self.files_written = 0
+        self.bytes_written = 0
+
+    def add(self, parsed_record: Dict, endpoint: str) -> None:
+        self._records.append((endpoint, parsed_record))
+
+    @property
+    def buffered(self) -> int:
+        return len(self._records)
+
+    @property
+    def full(self) -> bool:
+        return self.buffered >= self.max_rows
+
+    def flush(self) -> List[str]:
+        """
+        Write the buffered records, one file per (endpoint, date) partition.
+
+        Returns:
+            URIs of the written files
+        """
+        import pyarrow.parquet as pq
+
+        records, self._records = self._records, []
+        partitions: Dict[Tuple[str, str], List[Dict]] = {}
+        for endpoint, parsed_record in records:
+            date = partition_date(iso_to_epoch_ms(parsed_record.get('timestamp')))
+            partitions.setdefault((endpoint or NULL_PARTITION, date), []).append(parsed_record)
+
+        uris = []
+        for (endpoint, date), parsed_records in sorted(partitions.items()):
+            table = build_table(build_columns(parsed_records, self.s3_file_key))
+            buffer = io.BytesIO()
+            pq.write_table(
+                table,
+                buffer,
+                row_group_size=self.row_group_size,
+                compression='zstd',
+                write_statistics=True,
+            )
+            name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:12]}.parquet"
+            uris.append(self.store.put(f"endpoint={endpoint}/date={date}/{name}", buffer.getvalue()))
+            self.rows_written += table.num_rows
+            self.files_written += 1
+            self.bytes_written += buffer.tell()
+        return uris
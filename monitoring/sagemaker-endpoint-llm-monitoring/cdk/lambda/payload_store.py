@@ -0,0 +1,172 @@
+"""
+Offloading of oversized span payloads to object storage.
+
+Prompts and generations above a size threshold are written gzip-compressed
+to S3 (or a local directory stand-in), addressed by the SHA-256 of their
+content, so repeated payloads are stored once. The span keeps a pointer with
+a truncated preview instead of the full text::
+
+    {"offloaded_payload": "s3://bucket/mlflow-payloads/ab/ab12....json.gz",
+     "bytes": 48213, "sha256": "ab12...", "preview": "First characters..."}
+
+Evaluation rehydrates pointers back into the original value when a scorer
+needs the full text.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+POINTER_KEY = 'offloaded_payload'
+
+
+class LocalPayloadStore:
+    """Payloads as files in a local directory. Local stand-in for the S3 store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, digest: str, body: bytes) -> str:
+        path = os.path.join(self.directory, f"{digest}.json.gz")
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(body)
+            os.replace(f"{path}.tmp", path)
+        return f"file://{path}"
+
+    def get(self, uri: str) -> bytes:
+        with open(uri[len('file://'):], 'rb') as f:
+            return f.read()
+
+
+class S3PayloadStore:
+    """Payloads as objects under an S3 prefix."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def put(self, digest: str, body: bytes) -> str:
+        key = f"{self.prefix}{digest[:2]}/{digest}.json.gz"
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType='application/json',
+            ContentEncoding='gzip',
+        )
+        return f"s3://{self.bucket}/{key}"
+
+    def get(self, uri: str) -> bytes:
+        bucket, key = uri[len('s3://'):].split('/', 1)
+        return self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+def is_pointer(value: Any) -> bool:
+    return isinstance(value, dict) and POINTER_KEY in value
+
+
+def has_pointer(value: Any) -> bool:
+    """Whether ``value`` or one of its fields (for a dict) is an offloaded payload pointer."""
+    return is_pointer(value) or (isinstance(value, dict) and any(is_pointer(field) for field in value.values()))
+
+
+class PayloadOffloader:
+    """
+    Size-threshold policy for span payloads.
+
+    ``offload`` replaces a value whose JSON encoding exceeds ``threshold_bytes``
+    with a pointer; ``offload_fields`` does the same for each field of a dict,
+    so small fields such as generation parameters stay inline. ``rehydrate``
+    reverses both, keeping recently loaded payloads in a small LRU so several
+    scorers of the same trace fetch each payload once.
+    """
+
+    def __init__(self, store: Any, threshold_bytes: int, preview_chars: int = 1000, cache_entries: int = 256):
+        self.store = store
+        self.threshold_bytes = threshold_bytes
+        self.preview_chars = preview_chars
+        self.cache_entries = cache_entries
+        self._cache: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.rehydrated = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'offloaded': self.offloaded, 'offloaded_bytes': self.offloaded_bytes, 'rehydrated': self.rehydrated}
+
+    def _encode(self, value: Any) -> Tuple[bytes, str]:
+        if isinstance(value, str):
+            text = value
+            encoded = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        else:
+            encoded = json.dumps(value, default=str, ensure_ascii=False).encode('utf-8')
+            text = encoded.decode('utf-8')
+        return encoded, text
+
+    def offload(self, value: Any) -> Any:
+        """``value`` itself when small enough, else a pointer to its stored copy."""
+        if value is None or isinstance(value, (bool, int, float)) or is_pointer(value):
+            return value
+        # Cheap upper bound before encoding: a character takes at most 6 bytes (a \u escape of a
+        # control character; UTF-8 needs 4), plus the quotes
+        if isinstance(value, str) and len(value) * 6 + 2 <= self.threshold_bytes:
+            return value
+
+        encoded, text = self._encode(value)
+        if len(encoded) <= self.threshold_bytes:
+            return value
+
+        digest = hashlib.sha256(encoded).hexdigest()
+        uri = self.store.put(digest, gzip.compress(encoded))
+        with self._lock:
+            self.offloaded += 1
+            self.offloaded_bytes += len(encoded)
+        return {
+            POINTER_KEY: uri,
+            'bytes': len(encoded),
+            'sha256': digest,
+            'preview': text[:self.preview_chars],
+        }
+
+    def offload_fields(self, value: Any) -> Any:
+        """Offload each oversized field of a dict, or the whole value when it is not a dict."""
+        if isinstance(value, dict) and not is_pointer(value):
+            return {name: self.offload(field) for name, field in value.items()}
+        return self.offload(value)
+
+    def _load(self, uri: str) -> Any:
+        with self._lock:
+            if uri in self._cache:
+                self._cache.move_to_end(uri)
+                return self._cache[uri]
+
+        value = json.loads(gzip.decompress(self.store.get(uri)))
+        with self._lock:
+            self.rehydrated += 1
+            self._cache[uri] = value
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def rehydrate(self, value: Any) -> Any:
+        """Replace a pointer, or pointers among the fields of a dict, with the stored values."""
+        if is_pointer(value):
+            return self._load(value[POINTER_KEY])
+        if isinstance(value, dict) and any(is_pointer(field) for field in value.values()):
+            return {name: self._load(field[POINTER_KEY]) if is_pointer(field) else field for name, field in value.items()}
+        return value
+
+
+def rehydrate_payloads(value: Any, offloader: Optional[PayloadOffloader]) -> Any:
+    """Rehydrate ``value`` with ``offloader``, or return it unchanged when offloading is disabled."""
+    return offloader.rehydrate(value) if offloader is not None else value
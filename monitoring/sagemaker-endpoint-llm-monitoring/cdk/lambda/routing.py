@@ -0,0 +1,115 @@
+"""
+Routing of capture files to the MLflow experiment of their endpoint.
+
+SageMaker data capture writes the files of each endpoint under::
+
+    <prefix>/<endpoint name>/<variant name>/YYYY/MM/DD/HH/<file>.jsonl
+
+so one function subscribed to the capture prefixes of several endpoints can
+tell from the S3 key which endpoint a file belongs to. Each endpoint gets its
+own experiment, named by an explicit mapping or by a name template with an
+``{endpoint}`` placeholder (a template without one sends every endpoint to
+the same experiment). Files whose key does not follow the layout belong to
+a default endpoint, which keeps the default experiment: a template applied
+to a guessed endpoint name would scatter them into experiments of their own.
+
+Experiment IDs are resolved once per container and endpoint, creating the
+experiment if needed. Traces and runs are then logged with the ID directly,
+so routing a file costs no ``set_experiment`` round trip.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+ENDPOINT_PLACEHOLDER = '{endpoint}'
+
+
+def endpoint_from_key(s3_key: str) -> Optional[str]:
+    """Endpoint name in a data capture key, None when the key does not follow the capture layout."""
+    parts = s3_key.split('/')
+    # <endpoint>/<variant>/YYYY/MM/DD/HH/<file>
+    if len(parts) < 7:
+        return None
+    year, month, day, hour = parts[-5:-1]
+    if len(year) != 4 or not all(len(part) == 2 for part in (month, day, hour)):
+        return None
+    if not all(part.isdigit() for part in (year, month, day, hour)):
+        return None
+    if not (1 <= int(month) <= 12 and 1 <= int(day) <= 31 and int(hour) <= 23):
+        return None
+    return parts[-7] or None
+
+
+class ExperimentRouter:
+    """
+    Endpoint -> MLflow experiment ID, resolved on first use and cached.
+
+    Args:
+        client: ``MlflowClient`` of the tracking server
+        name_template: Experiment name, ``{endpoint}`` is replaced by the endpoint name
+        names: Endpoint -> experiment name, overriding the template
+        default_endpoint: Endpoint of files whose key has none (see ``endpoint_from_key``)
+        default_name: Experiment of ``default_endpoint`` unless ``names`` has one
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        name_template: str,
+        names: Optional[Dict[str, str]] = None,
+        default_endpoint: Optional[str] = None,
+        default_name: Optional[str] = None,
+    ):
+        self.client = client
+        self.name_template = name_template
+        self.names = names or {}
+        self.default_endpoint = default_endpoint
+        self.default_name = default_name
+        self._experiment_ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def experiment_name(self, endpoint: str) -> str:
+        if endpoint in self.names:
+            return self.names[endpoint]
+        if endpoint == self.default_endpoint and self.default_name:
+            return self.default_name
+        return self.name_template.replace(ENDPOINT_PLACEHOLDER, endpoint)
+
+    def cached(self, endpoint: str) -> Optional[str]:
+        """Experiment ID of the endpoint if already resolved."""
+        return self._experiment_ids.get(endpoint)
+
+    def experiment_id(self, endpoint: str) -> str:
+        """
+        Experiment ID of the endpoint, resolved (and the experiment created) on first use.
+
+        Raises:
+            ValueError: The experiment was deleted
+        """
+        with self._lock:
+            if endpoint in self._experiment_ids:
+                return self._experiment_ids[endpoint]
+
+            name = self.experiment_name(endpoint)
+            # Endpoints sharing an experiment share its ID without another lookup
+            experiment_id = next(
+                (cached_id for other, cached_id in self._experiment_ids.items() if self.experiment_name(other) == name),
+                None,
+            )
+            if experiment_id is None:
+                experiment_id = self._resolve(name)
+            self._experiment_ids[endpoint] = experiment_id
+            return experiment_id
+
+    def _resolve(self, name: str) -> str:
+        experiment = self.client.get_experiment_by_name(name)
+        if experiment is None:
+            try:
+                return self.client.create_experiment(name)
+            except Exception:
+                # Created meanwhile by another container
+                experiment = self.client.get_experiment_by_name(name)
+                if experiment is None:
+                    raise
+        if experiment.lifecycle_stage == 'deleted':
+            raise ValueError(f"Experiment {name} is deleted; restore it or route the endpoint elsewhere")
+        return experiment.experiment_id
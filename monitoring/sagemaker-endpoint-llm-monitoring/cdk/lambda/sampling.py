@@ -0,0 +1,207 @@
+"""
+Budgeted, stratified sampling of traces for LLM-judge evaluation.
+
+Traces are grouped into strata by error flag, status code, prompt length and
+endpoint. A judge budget (traces per file and per hour) is allocated across
+strata, every stratum getting at least one trace when the budget allows, and
+traces are drawn uniformly within each stratum. Each sampled trace carries the
+weight N_h / n_h (stratum size over stratum sample size), so weighted
+aggregates of judge scores are unbiased estimates over all traffic.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompt length buckets (characters) used for stratification
+PROMPT_LENGTH_BUCKETS = ((256, 'short'), (2048, 'medium'))
+
+
+def prompt_length_bucket(prompt: Any) -> str:
+    length = len(prompt) if isinstance(prompt, str) else len(json.dumps(prompt, default=str))
+    for limit, name in PROMPT_LENGTH_BUCKETS:
+        if length < limit:
+            return name
+    return 'long'
+
+
+def stratum_key(parsed_record: Dict, endpoint_name: str) -> str:
+    """Stratum of a parsed data capture record."""
+    request = parsed_record.get('request', {})
+    prompt = request.get('inputs', '') if isinstance(request, dict) else request
+    return '|'.join([
+        f"error={int(bool(parsed_record.get('is_error', False)))}",
+        f"status={parsed_record.get('status_code', 200)}",
+        f"prompt={prompt_length_bucket(prompt)}",
+        f"endpoint={endpoint_name}",
+    ])
+
+
+def allocate(strata_sizes: Dict[str, int], budget: int) -> Dict[str, int]:
+    """
+    Split ``budget`` samples across strata.
+
+    Every stratum gets one sample first (error strata and then the largest
+    first, while budget remains); the rest is split proportionally to
+    stratum size by largest remainder, capped at the stratum size.
+    """
+    if budget >= sum(strata_sizes.values()):
+        return dict(strata_sizes)
+
+    order = sorted(strata_sizes, key=lambda s: (not s.startswith('error=1'), -strata_sizes[s]))
+    allocation = {stratum: 0 for stratum in strata_sizes}
+    for stratum in order[:budget]:
+        allocation[stratum] = 1
+
+    remaining = budget - sum(allocation.values())
+    while remaining > 0:
+        capacity = {s: strata_sizes[s] - allocation[s] for s in order if strata_sizes[s] > allocation[s]}
+        total = sum(capacity.values())
+        shares = {s: remaining * capacity[s] / total for s in capacity}
+        granted = {s: min(int(shares[s]), capacity[s]) for s in capacity}
+        leftover = remaining - sum(granted.values())
+        for s in sorted(capacity, key=lambda s: shares[s] - int(shares[s]), reverse=True):
+            if leftover == 0:
+                break
+            if granted[s] < capacity[s]:
+                granted[s] += 1
+                leftover -= 1
+        for s, n in granted.items():
+            allocation[s] += n
+        remaining = budget - sum(allocation.values())
+
+    return allocation
+
+
+def stratified_sample(
+    trace_strata: Dict[str, str],
+    budget: int,
+    rng: Optional[random.Random] = None,
+) -> Dict[str, float]:
+    """
+    Choose up to ``budget`` traces to judge.
+
+    Args:
+        trace_strata: Trace ID -> stratum key
+        budget: Maximum number of traces to select
+        rng: Random generator, for reproducible sampling
+
+    Returns:
+        Selected trace ID -> sample weight (N_h / n_h)
+    """
+    rng = rng or random.Random()
+    by_stratum: Dict[str, List[str]] = defaultdict(list)
+    for trace_id, stratum in trace_strata.items():
+        by_stratum[stratum].append(trace_id)
+
+    allocation = allocate({s: len(ids) for s, ids in by_stratum.items()}, max(budget, 0))
+
+    selected = {}
+    for stratum, trace_ids in by_stratum.items():
+        n = allocation[stratum]
+        if n == 0:
+            continue
+        weight = len(trace_ids) / n
+        for trace_id in rng.sample(trace_ids, n):
+            selected[trace_id] = weight
+    return selected
+
+
+class HourlyBudget:
+    """
+    Judge budget per clock hour, kept in process memory.
+
+    Only counts traces judged by this container; use ``S3HourlyBudget`` to
+    share the budget across concurrent invocations.
+    """
+
+    def __init__(self, per_hour: int):
+        self.per_hour = per_hour
+        self._used: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, requested: int) -> int:
+        """Reserve up to ``requested`` traces from the current hour. Returns the number granted."""
+        hour = time.strftime('%Y%m%d%H', time.gmtime())
+        with self._lock:
+            used = self._used.get(hour, 0)
+            granted = max(0, min(requested, self.per_hour - used))
+            self._used = {hour: used + granted}
+        return granted
+
+
+class S3HourlyBudget:
+    """
+    Judge budget per clock hour, shared through one counter object per hour in S3.
+
+    The counter is updated with conditional writes so concurrent invocations
+    cannot both spend the same remaining budget.
+    """
+
+    def __init__(self, per_hour: int, s3_client: Any, bucket: str, prefix: str, max_attempts: int = 10):
+        self.per_hour = per_hour
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+        self.max_attempts = max_attempts
+
+    def reserve(self, requested: int) -> int:
+        key = f"{self.prefix}{time.strftime('%Y%m%d%H', time.gmtime())}.json"
+
+        for _ in range(self.max_attempts):
+            try:
+                obj = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+                used, condition = json.loads(obj['Body'].read())['used'], {'IfMatch': obj['ETag']}
+            except self.s3_client.exceptions.NoSuchKey:
+                used, condition = 0, {'IfNoneMatch': '*'}
+
+            granted = max(0, min(requested, self.per_hour - used))
+            if granted == 0:
+                return 0
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.bucket, Key=key, Body=json.dumps({'used': used + granted}), **condition
+                )
+                return granted
+            except self.s3_client.exceptions.ClientError as e:
+                if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    raise
+
+        logger.warning("Could not reserve hourly judge budget after concurrent updates")
+        return 0
+
+
+def plan_judge_sample(
+    trace_strata: Dict[str, str],
+    per_file_budget: int,
+    hourly_budget: Optional[Any] = None,
+) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """
+    Select the traces of one file to send to the LLM judges.
+
+    Args:
+        trace_strata: Trace ID -> stratum key for every trace of the file
+        per_file_budget: Maximum traces judged per file, 0 for no per-file limit
+        hourly_budget: Optional ``HourlyBudget``/``S3HourlyBudget``
+
+    Returns:
+        Selected trace ID -> sample weight, and a summary of the sampling
+    """
+    budget = len(trace_strata)
+    if per_file_budget > 0:
+        budget = min(budget, per_file_budget)
+    if hourly_budget is not None:
+        budget = hourly_budget.reserve(budget)
+
+    selected = stratified_sample(trace_strata, budget)
+    summary = {
+        'traces': len(trace_strata),
+        'judged': len(selected),
+        'strata': len(set(trace_strata.values())),
+    }
+    return selected, summary
@@ -0,0 +1,104 @@
+"""
+Byte-range sharding of large capture files.
+
+The planner splits a plain JSONL capture file into contiguous byte ranges
+whose boundaries fall right after a newline, so every shard holds whole
+records and can be ingested independently. Shard results are merged by the
+reducer before a single evaluation of the file.
+"""
+from typing import Any, Dict, List, Optional
+
+from endpoint_stats import merge_stats
+
+
+def find_line_start(s3_client: Any, bucket: str, key: str, position: int, size: int, probe_size: int) -> int:
+    """
+    First line start at or after ``position``.
+
+    Reads ``probe_size`` bytes at a time from the byte before ``position``
+    until a newline is found. Returns ``size`` when there is no further line.
+    """
+    probe_start = position - 1
+    while probe_start < size:
+        probe_end = min(size, probe_start + probe_size)
+        data = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={probe_start}-{probe_end - 1}")['Body'].read()
+        newline = data.find(b'\n')
+        if newline >= 0:
+            return probe_start + newline + 1
+        probe_start = probe_end
+    return size
+
+
+def plan_shards(
+    s3_client: Any,
+    bucket: str,
+    key: str,
+    shard_size: int,
+    probe_size: int = 64 * 1024,
+) -> List[Dict[str, Optional[int]]]:
+    """
+    Split a capture file into line-aligned byte ranges of about ``shard_size`` bytes.
+
+    Compressed files cannot be read from an arbitrary offset and come back as
+    a single shard covering the whole file.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Bucket of the capture file
+        key: S3 key of the capture file
+        shard_size: Target shard size in bytes
+        probe_size: Bytes read per request when looking for a line boundary
+
+    Returns:
+        Shards as ``{'start': offset, 'end': offset}`` (end exclusive, None for end of file)
+    """
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    size = head['ContentLength']
+    if key.endswith('.gz') or head.get('ContentEncoding') == 'gzip' or size <= shard_size:
+        return [{'start': 0, 'end': None}]
+
+    boundaries = [0]
+    for position in range(shard_size, size, shard_size):
+        if position <= boundaries[-1]:
+            # The previous boundary moved past this one because of a long line
+            continue
+        boundary = find_line_start(s3_client, bucket, key, position, size, probe_size)
+        if boundary >= size:
+            break
+        boundaries.append(boundary)
+    boundaries.append(size)
+
+    return [{'start': start, 'end': end} for start, end in zip(boundaries, boundaries[1:])]
+
+
+def merge_shard_states(states: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Combine the final checkpoints of a file's shards.
+
+    Args:
+        states: Shard checkpoint states, None for a shard whose checkpoint is missing
+
+    Returns:
+        Summed record counts and merged endpoint statistics, plus the trace
+        IDs and strata of all shards. Traces or statistics are None when
+        any shard's are unknown
+    """
+    counts = {'total': 0, 'processed': 0, 'errors': 0, 'skipped': 0}
+    trace_ids: Optional[List[str]] = []
+    trace_strata: Optional[Dict[str, str]] = {}
+
+    for state in states:
+        if state is None or state['trace_ids'] is None:
+            trace_ids = trace_strata = None
+        if state is None:
+            continue
+        for name in counts:
+            counts[name] += state['counts'][name]
+        if trace_ids is not None:
+            trace_ids.extend(state['trace_ids'])
+            trace_strata.update(state['trace_strata'])
+
+    stats = [state.get('endpoint_stats') if state else None for state in states]
+    endpoint_stats = merge_stats(*stats) if all(data is not None for data in stats) else None
+
+    return {'counts': counts, 'trace_ids': trace_ids, 'trace_strata': trace_strata, 'endpoint_stats': endpoint_stats}
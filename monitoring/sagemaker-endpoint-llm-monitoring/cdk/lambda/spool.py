@@ -0,0 +1,274 @@
+"""
+Spool of parsed capture records that could not be written to MLflow.
+
+When the tracking server fails or is too slow, records are appended to a
+gzip-compressed JSON Lines segment in a local working directory instead of
+being dropped. Each append ends with a zlib sync flush, so everything
+appended survives a crash of the writer even though the gzip trailer is
+missing. A segment is sealed (closed and handed to its store) once it holds
+``segment_max_records`` records, and at the end of each invocation; sealed
+segments are never modified again. A sealed segment the store cannot take
+yet (S3 unavailable too) stays in the working directory and is handed over
+at the next seal. A replay later reads sealed segments oldest first, writes
+their records to MLflow and deletes each segment once it is drained.
+
+A spool entry is::
+
+    {"s3_file_key": "...", "record": {<parsed capture record>}, "uncertain": false,
+     "reason": "...", "spooled_at": "2025-01-01T00:00:00+00:00"}
+
+``uncertain`` marks records whose trace may already have reached MLflow
+before the failure was noticed (see ``AsyncTraceWriter``).
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+
+def read_segment_entries(body: bytes) -> List[Dict[str, Any]]:
+    """
+    Entries of a segment, including one whose gzip trailer is missing.
+
+    A partly written last line (the writer died mid-append) is skipped.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    data = decompressor.decompress(body)
+    # Appended gzip members, if any, follow the first one
+    while decompressor.unused_data:
+        rest = decompressor.unused_data
+        decompressor = zlib.decompressobj(wbits=31)
+        data += decompressor.decompress(rest)
+
+    entries = []
+    for line in data.split(b'\n'):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            logger.warning("Skipping a truncated spool entry")
+    return entries
+
+
+class LocalSpoolStore:
+    """Sealed segments as files in a local directory. Local stand-in for the S3 store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, name: str, path: str) -> None:
+        os.replace(path, os.path.join(self.directory, name))
+
+    def list(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+
+    def get(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            return f.read()
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+
+class S3SpoolStore:
+    """Sealed segments as objects under an S3 prefix, shared by all containers."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def put(self, name: str, path: str) -> None:
+        with open(path, 'rb') as f:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=f"{self.prefix}{name}",
+                Body=f.read(),
+                ContentType='application/x-ndjson',
+                ContentEncoding='gzip',
+            )
+        os.remove(path)
+
+    def list(self) -> List[str]:
+        names = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                name = obj['Key'][len(self.prefix):]
+                if name.endswith(SEGMENT_SUFFIX):
+                    names.append(name)
+        return sorted(names)
+
+    def get(self, name: str) -> bytes:
+        return self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{name}")['Body'].read()
+
+    def delete(self, name: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket, Key=f"{self.prefix}{name}")
+
+
+class TraceSpool:
+    """
+    Append-only spool with one open segment per container.
+
+    Args:
+        store: ``LocalSpoolStore`` or ``S3SpoolStore`` receiving sealed segments
+        directory: Local working directory of the open segment
+        segment_max_records: Records after which the open segment is sealed
+    """
+
+    def __init__(self, store: Any, directory: str, segment_max_records: int = 1000):
+        self.store = store
+        self.directory = directory
+        self.segment_max_records = max(segment_max_records, 1)
+        self._file: Optional[gzip.GzipFile] = None
+        self._path: Optional[str] = None
+        self._records = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.reset_stats()
+        self._recover()
+        self._publish()
+
+    def reset_stats(self) -> None:
+        self.spooled = 0
+        self.sealed = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'spooled': self.spooled, 'sealed': self.sealed}
+
+    def _recover(self) -> None:
+        """Close segments left open by an earlier invocation of this container that did not finish."""
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(f"{SEGMENT_SUFFIX}.open"):
+                logger.warning(f"Sealing spool segment {name} left open by an earlier invocation")
+                path = os.path.join(self.directory, name)
+                os.replace(path, path[:-len('.open')])
+
+    def _publish(self) -> None:
+        """Hand closed segments in the working directory to the store; failures are retried at the next seal."""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                self.store.put(name, os.path.join(self.directory, name))
+                self.sealed += 1
+            except Exception as e:
+                logger.warning(f"Could not store spool segment {name}, keeping it locally: {e}")
+
+    def append(self, s3_file_key: str, records: List[Dict[str, Any]], reason: str, uncertain: bool = False) -> None:
+        """Append records of one capture file, durably, to the open segment."""
+        spooled_at = datetime.now(timezone.utc).isoformat()
+        self.requeue([
+            {'s3_file_key': s3_file_key, 'record': record, 'uncertain': uncertain, 'reason': reason, 'spooled_at': spooled_at}
+            for record in records
+        ])
+
+    def requeue(self, entries: List[Dict[str, Any]]) -> None:
+        """Append spool entries as they are, e.g. the part of a segment a replay did not get to."""
+        if not entries:
+            return
+        lines = b''.join(json.dumps(entry, default=str).encode('utf-8') + b'\n' for entry in entries)
+
+        with self._lock:
+            if self._file is None:
+                # Names sort by creation time, to the nanosecond, so replay drains the oldest segments first
+                created_ns = time.time_ns()
+                created = time.strftime('%Y%m%dT%H%M%S', time.gmtime(created_ns // 1_000_000_000))
+                name = f"{created}.{created_ns % 1_000_000_000:09d}-{uuid.uuid4().hex[:12]}{SEGMENT_SUFFIX}"
+                self._path = os.path.join(self.directory, f"{name}.open")
+                self._file = gzip.GzipFile(self._path, 'ab')
+                self._records = 0
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileobj.fileno())
+            self._records += len(entries)
+            self.spooled += len(entries)
+
+            if self._records >= self.segment_max_records:
+                self._seal()
+
+    def _seal(self) -> None:
+        self._file.close()
+        path, self._file, self._path = self._path, None, None
+        os.replace(path, path[:-len('.open')])
+        logger.info(f"Sealed spool segment {os.path.basename(path)[:-len('.open')]} with {self._records} records")
+        self._publish()
+
+    def seal(self) -> None:
+        """Seal the open segment, if any, and hand over segments still waiting for the store."""
+        with self._lock:
+            if self._file is not None:
+                self._seal()
+            else:
+                self._publish()
+
+    def segments(self) -> List[str]:
+        """Sealed segments, oldest first."""
+        return self.store.list()
+
+    def read(self, name: str) -> List[Dict[str, Any]]:
+        return read_segment_entries(self.store.get(name))
+
+    def delete(self, name: str) -> None:
+        self.store.delete(name)
+
+
+class TrackingCircuit:
+    """
+    Health of the MLflow tracking server as seen by this container.
+
+    A failed or too slow write opens the circuit; while it is open, records
+    go straight to the spool. Once ``retry_after_seconds`` have passed the
+    next write is let through again, and closes the circuit if it succeeds.
+    """
+
+    def __init__(self, latency_budget_seconds: float, retry_after_seconds: float):
+        self.latency_budget_seconds = latency_budget_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a write should be attempted now."""
+        with self._lock:
+            return self._opened_at is None or time.monotonic() - self._opened_at >= self.retry_after_seconds
+
+    def record_success(self, seconds: float) -> None:
+        """Record a successful write or check that took ``seconds``; slower than the budget opens the circuit."""
+        if seconds > self.latency_budget_seconds:
+            self.record_failure(f"took {seconds:.1f}s, over the {self.latency_budget_seconds}s budget")
+            return
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("MLflow tracking server is healthy again, closing the circuit")
+            self._opened_at = None
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                self.opened += 1
+                logger.warning(f"MLflow tracking server unhealthy, retrying in {self.retry_after_seconds}s: {reason}")
+            self._opened_at = time.monotonic()
@@ -0,0 +1,158 @@
+"""
+Reassembly of streamed endpoint responses from data capture.
+
+``InvokeEndpointWithResponseStream`` responses are captured as the
+concatenated stream: server-sent events (``data: {...}`` lines, as written by
+TGI and OpenAI-compatible servers) or JSON Lines (one chunk per line, as
+written by LMI/DJL). The parser walks the chunks once, collects the text
+pieces into a list joined at the end, and derives chunk counts and, when the
+chunks carry timestamps, time to first token and inter-chunk gaps.
+"""
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+STREAM_CONTENT_TYPES = ('text/event-stream', 'application/jsonlines', 'application/x-ndjson', 'application/jsonl')
+
+# Chunk fields holding an epoch timestamp, in seconds or milliseconds
+TIMESTAMP_FIELDS = ('timestamp', 'created', 'ts')
+
+
+def looks_like_stream(data: Any, content_type: Optional[str] = None) -> bool:
+    """Whether captured response data is a streamed response rather than one JSON document."""
+    if not isinstance(data, str) or not data:
+        return False
+    if content_type and any(stream_type in content_type for stream_type in STREAM_CONTENT_TYPES):
+        return True
+    head = data.lstrip()[:6]
+    return head.startswith('data:') or (head.startswith('{') and '}\n{' in data)
+
+
+def iter_stream_payloads(data: str) -> List[str]:
+    """JSON payloads of an SSE or JSON Lines stream, without SSE framing and ``[DONE]`` markers."""
+    payloads = []
+    for line in data.splitlines():
+        line = line.strip()
+        if not line or line.startswith((':', 'event:', 'id:', 'retry:')):
+            continue
+        if line.startswith('data:'):
+            line = line[5:].strip()
+        if line and line != '[DONE]':
+            payloads.append(line)
+    return payloads
+
+
+def chunk_text(chunk: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Text carried by one chunk.
+
+    Returns:
+        (incremental token text, final full text), either of which may be None
+    """
+    final_text = chunk.get('generated_text')
+    if not isinstance(final_text, str):
+        final_text = None
+
+    token = chunk.get('token')
+    if isinstance(token, dict) and isinstance(token.get('text'), str):
+        return token['text'], final_text
+
+    choices = chunk.get('choices')
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        choice = choices[0]
+        delta = choice.get('delta')
+        if isinstance(delta, dict) and isinstance(delta.get('content'), str):
+            return delta['content'], final_text
+        if isinstance(choice.get('text'), str):
+            return choice['text'], final_text
+
+    for field in ('text', 'outputs'):
+        if isinstance(chunk.get(field), str):
+            return chunk[field], final_text
+    return None, final_text
+
+
+def chunk_timestamp_ms(chunk: Dict[str, Any]) -> Optional[float]:
+    for field in TIMESTAMP_FIELDS:
+        value = chunk.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Seconds until the year 33658, milliseconds after
+            return value * 1000 if value < 1e12 else float(value)
+    return None
+
+
+def iso_to_epoch_ms(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() * 1000
+    except ValueError:
+        return None
+
+
+def reassemble_stream(
+    data: str,
+    loads: Callable[[Any], Any] = json.loads,
+    request_time: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Rebuild a streamed response.
+
+    The final ``generated_text`` sent by the server wins; otherwise the token
+    texts are joined. Chunks that are not JSON are skipped.
+
+    Args:
+        data: Captured stream as text
+        loads: JSON parser
+        request_time: ISO ``inferenceTime`` of the request, for time to first token
+
+    Returns:
+        The response as ``{'generated_text': ...}`` and the stream statistics:
+        ``chunks`` plus, when the chunks carry timestamps, ``ttft_ms``,
+        ``stream_duration_ms`` and the ``inter_chunk_ms`` gaps
+    """
+    pieces: List[str] = []
+    final_text = None
+    timestamps: List[float] = []
+    finish_reason = None
+    chunks = 0
+
+    for payload in iter_stream_payloads(data):
+        try:
+            chunk = loads(payload)
+        except ValueError:
+            continue
+        if not isinstance(chunk, dict):
+            continue
+
+        chunks += 1
+        text, full_text = chunk_text(chunk)
+        if text:
+            pieces.append(text)
+        if full_text is not None:
+            final_text = full_text
+
+        timestamp = chunk_timestamp_ms(chunk)
+        if timestamp is not None:
+            timestamps.append(timestamp)
+
+        details = chunk.get('details')
+        if isinstance(details, dict) and details.get('finish_reason'):
+            finish_reason = details['finish_reason']
+        choices = chunk.get('choices')
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict) and choices[0].get('finish_reason'):
+            finish_reason = choices[0]['finish_reason']
+
+    response = {'generated_text': final_text if final_text is not None else ''.join(pieces)}
+    if finish_reason:
+        response['finish_reason'] = finish_reason
+
+    stats: Dict[str, Any] = {'chunks': chunks}
+    if timestamps:
+        gaps = [later - earlier for earlier, later in zip(timestamps, timestamps[1:])]
+        stats['stream_duration_ms'] = timestamps[-1] - timestamps[0]
+        stats['inter_chunk_ms'] = gaps
+        request_ms = iso_to_epoch_ms(request_time)
+        if request_ms is not None and timestamps[0] >= request_ms:
+            stats['ttft_ms'] = timestamps[0] - request_ms
+    return response, stats
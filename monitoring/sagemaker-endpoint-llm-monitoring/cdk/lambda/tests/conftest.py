@@ -0,0 +1,44 @@
+"""
+Unit tests for the processor Lambda.
+
+They import the modules next to ``handler.py`` directly, so they need no
+AWS credentials, MLflow server or Bedrock access. Tests of ``handler``
+itself need MLflow and boto3 installed and are skipped otherwise. Run from
+``cdk/lambda``::
+
+    python -m pytest tests
+"""
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings the handler reads when it is imported
+HANDLER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-west-2',
+    'MLFLOW_TRACKING_URI': 'http://127.0.0.1:1',
+    'MLFLOW_EXPERIMENT_NAME': 'handler-tests',
+    'SAGEMAKER_ENDPOINT_NAME': 'test-endpoint',
+    'BEDROCK_MODEL_ID': 'bedrock:/test-model',
+    'DATA_CAPTURE_BUCKET': 'test-bucket',
+    'INGESTION_INDEX_BACKEND': 'none',
+    'JUDGE_CACHE_BACKEND': 'none',
+    'METRICS_ENABLED': 'false',
+}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """The handler module, with the traces kept by earlier tests forgotten."""
+    pytest.importorskip('mlflow')
+    pytest.importorskip('boto3')
+    for name, value in HANDLER_ENV.items():
+        monkeypatch.setenv(name, value)
+
+    import handler
+
+    monkeypatch.setattr(handler, '_logged_traces', OrderedDict())
+    return handler
@@ -0,0 +1,77 @@
+import json
+
+from batch_judge import YES_NO, BatchJudge, build_batch_prompt, parse_batch_verdicts
+
+COHERENCE = ('coherent', 'somewhat coherent', 'incoherent')
+
+
+def test_verdicts_are_read_from_the_array_in_the_reply():
+    reply = 'Here you go:\n[{"id": 0, "value": "yes", "rationale": "fine"}, {"id": 1, "value": "No"}]\nDone.'
+
+    assert parse_batch_verdicts(reply, 2, YES_NO) == {0: ('yes', 'fine'), 1: ('no', '')}
+
+
+def test_invalid_items_are_left_out():
+    reply = json.dumps([
+        {"id": 0, "value": "maybe"},
+        {"id": 1, "value": "coherent"},
+        {"id": 2, "value": "somewhat coherent"},
+        {"id": 7, "value": "coherent"},
+        {"id": "3", "value": "coherent"},
+        {"value": "coherent"},
+        "coherent",
+    ])
+
+    assert parse_batch_verdicts(reply, 4, COHERENCE) == {1: ('coherent', ''), 2: ('somewhat coherent', '')}
+
+
+def test_duplicated_items_are_left_out():
+    reply = json.dumps([{"id": 0, "value": "yes"}, {"id": 0, "value": "no"}, {"id": 1, "value": "yes"}])
+
+    assert parse_batch_verdicts(reply, 2, YES_NO) == {1: ('yes', '')}
+
+
+def test_reply_without_an_array_has_no_verdicts():
+    assert parse_batch_verdicts('I cannot judge these.', 2, YES_NO) == {}
+    assert parse_batch_verdicts('[{"id": 0, "value": "yes"', 2, YES_NO) == {}
+    assert parse_batch_verdicts('[not json]', 2, YES_NO) == {}
+
+
+def test_prompt_numbers_the_items():
+    prompt = build_batch_prompt("Is it safe?", YES_NO, [("q0", "a0"), ("q1", "a1")])
+
+    assert 'Assess each of the 2 items' in prompt
+    assert '<item id="0">\nRequest: "q0"\nResponse: "a0"\n</item>' in prompt
+    assert '<item id="1">' in prompt
+    assert '"yes" | "no"' in prompt
+
+
+def test_prefetch_stores_parsed_verdicts_and_counts_fallbacks():
+    def model_call(prompt, max_tokens):
+        return json.dumps([{"id": 0, "value": "yes", "rationale": "ok"}, {"id": 2, "value": "no"}])
+
+    judge = BatchJudge(model_call, batch_size=3)
+    items = [(f"key{i}", f"q{i}", f"a{i}") for i in range(4)]
+    judge.prefetch({'safety': items, 'unknown': items}, {'safety': ("Is it safe?", YES_NO)})
+
+    assert judge.take('key0') == {'value': 'yes', 'rationale': 'ok', 'source': 'batch'}
+    assert judge.take('key0') is None
+    assert judge.take('key1') is None
+    assert judge.take('key2')['value'] == 'no'
+    # The last item is alone in its batch and left to the single-trace judge
+    assert judge.take('key3') is None
+    assert judge.stats() == {
+        'calls': 1, 'items': 3, 'verdicts': 2, 'fallbacks': 1, 'failed_calls': 0, 'calls_saved': 1,
+    }
+
+
+def test_failed_call_falls_back_for_every_item():
+    def model_call(prompt, max_tokens):
+        raise RuntimeError("model unavailable")
+
+    judge = BatchJudge(model_call, batch_size=2)
+    judge.prefetch({'safety': [('key0', 'q0', 'a0'), ('key1', 'q1', 'a1')]}, {'safety': ("Is it safe?", YES_NO)})
+
+    assert judge.take('key0') is None
+    assert judge.stats()['failed_calls'] == 1
+    assert judge.stats()['fallbacks'] == 2
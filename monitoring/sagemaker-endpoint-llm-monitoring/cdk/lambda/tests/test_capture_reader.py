@@ -0,0 +1,90 @@
+import gzip
+import io
+
+import pytest
+
+from capture_reader import CaptureLineReader
+from metrics import MetricsRecorder
+
+
+def read(data, s3_key='capture.jsonl', start_offset=0, chunk_size=4, **s3_object):
+    """Lines read and the reader offset after each of them."""
+    reader = CaptureLineReader({'Body': io.BytesIO(data), **s3_object}, s3_key, start_offset, chunk_size=chunk_size)
+    lines, offsets = [], []
+    for line in reader:
+        lines.append(line)
+        offsets.append(reader.offset)
+    return lines, offsets, reader.offset
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4, 64])
+def test_offset_is_just_past_each_yielded_line(chunk_size):
+    data = b'{"a":1}\n{"bb":22}\n{"c":3}\n'
+
+    lines, offsets, end = read(data, chunk_size=chunk_size)
+
+    assert lines == [b'{"a":1}', b'{"bb":22}', b'{"c":3}']
+    assert offsets == [8, 18, 26]
+    assert end == len(data)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64])
+def test_blank_lines_are_skipped_but_counted(chunk_size):
+    data = b'\n{"a":1}\r\n\n  \n{"b":2}\n'
+
+    lines, offsets, end = read(data, chunk_size=chunk_size)
+
+    assert lines == [b'{"a":1}', b'{"b":2}']
+    assert offsets == [10, 22]
+    assert end == len(data)
+
+
+def test_last_line_without_newline():
+    lines, offsets, end = read(b'{"a":1}\n{"b":2}', chunk_size=3)
+
+    assert lines == [b'{"a":1}', b'{"b":2}']
+    assert offsets == [8, 15]
+    assert end == 15
+
+
+def test_line_longer_than_many_chunks():
+    long_line = b'x' * 10000
+    data = b'{"a":1}\n' + long_line + b'\n{"b":2}'
+
+    lines, offsets, _ = read(data, chunk_size=7)
+
+    assert lines == [b'{"a":1}', long_line, b'{"b":2}']
+    assert offsets == [8, 8 + len(long_line) + 1, len(data)]
+
+
+def test_offsets_continue_from_the_start_offset():
+    lines, offsets, _ = read(b'{"b":2}\n{"c":3}\n', start_offset=100)
+
+    assert lines == [b'{"b":2}', b'{"c":3}']
+    assert offsets == [108, 116]
+
+
+def test_gzip_body_skips_the_start_offset_in_decompressed_bytes():
+    data = b'{"a":1}\n{"b":2}\n{"c":3}\n'
+
+    lines, offsets, _ = read(gzip.compress(data), s3_key='capture.jsonl.gz', start_offset=8)
+    assert lines == [b'{"b":2}', b'{"c":3}']
+    assert offsets == [16, 24]
+
+    lines, _, _ = read(gzip.compress(data), s3_key='capture.jsonl', ContentEncoding='gzip')
+    assert len(lines) == 3
+
+
+def test_empty_body():
+    assert read(b'', start_offset=42) == ([], [], 42)
+
+
+def test_reads_are_recorded_in_metrics():
+    recorder = MetricsRecorder('Test/Namespace')
+    reader = CaptureLineReader({'Body': io.BytesIO(b'{"a":1}\n')}, 'capture.jsonl', chunk_size=4, metrics=recorder)
+
+    list(reader)
+
+    [document] = recorder.documents({})
+    assert document['BytesRead'] == 8
+    assert 'S3ReadTime' in document
@@ -0,0 +1,137 @@
+import io
+import json
+
+import pytest
+
+from checkpoint import LocalCheckpointStore, advance_checkpoint, checkpoint_key, new_checkpoint
+from endpoint_stats import EndpointStats
+
+
+def progress(total, processed, trace_ids, errors=0, skipped=0, endpoint_stats=None):
+    """Cumulative ingest_records counts of an invocation."""
+    return {
+        'total': total, 'processed': processed, 'errors': errors, 'skipped': skipped,
+        'trace_ids': trace_ids, 'trace_strata': {trace_id: 'error=0' for trace_id in trace_ids},
+        'endpoint_stats': endpoint_stats, 'stopped': False,
+    }
+
+
+def stats_of(*requests_bytes):
+    stats = EndpointStats()
+    for request_bytes in requests_bytes:
+        stats.add({'request_bytes': request_bytes})
+    return stats.to_dict()
+
+
+def test_advance_adds_the_progress_of_the_invocation():
+    state = new_checkpoint('bucket', 'capture.jsonl')
+    state = advance_checkpoint(state, progress(2, 2, ['tr-1', 'tr-2'], endpoint_stats=stats_of(10, 20)), offset=80)
+
+    advanced = advance_checkpoint(state, progress(1, 0, [], skipped=1, endpoint_stats=stats_of(30)), offset=120)
+
+    assert advanced['offset'] == 120
+    assert advanced['counts'] == {'total': 3, 'processed': 2, 'errors': 0, 'skipped': 1}
+    assert advanced['trace_ids'] == ['tr-1', 'tr-2']
+    assert EndpointStats.from_dict(advanced['endpoint_stats']).sketches['request_bytes'].count == 3
+    # The state the invocation started from is left as it was
+    assert state['offset'] == 80
+    assert state['counts']['total'] == 2
+
+
+def test_advance_from_an_offset_without_a_checkpoint_keeps_trace_ids_unknown():
+    state = dict(new_checkpoint('bucket', 'capture.jsonl'), offset=80, trace_ids=None, trace_strata=None)
+
+    advanced = advance_checkpoint(state, progress(1, 1, ['tr-3']), offset=120)
+
+    assert advanced['trace_ids'] is None
+    assert advanced['counts']['processed'] == 1
+
+
+def test_shard_checkpoints_start_at_the_shard_and_are_stored_apart(tmp_path):
+    store = LocalCheckpointStore(str(tmp_path))
+    shard = {'start': 100, 'end': 200}
+    file_state = new_checkpoint('bucket', 'capture.jsonl')
+    shard_state = new_checkpoint('bucket', 'capture.jsonl', shard)
+
+    store.save('bucket', checkpoint_key('capture.jsonl'), file_state)
+    store.save('bucket', checkpoint_key('capture.jsonl', shard), shard_state)
+
+    assert store.load('bucket', 'capture.jsonl') == file_state
+    assert store.load('bucket', 'capture.jsonl#bytes=100-200')['offset'] == 100
+    store.delete('bucket', 'capture.jsonl')
+    assert store.load('bucket', 'capture.jsonl') is None
+
+
+def capture_line(i):
+    return json.dumps({
+        'captureData': {
+            'endpointInput': {'data': json.dumps({'inputs': f"q{i}"}), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+            'endpointOutput': {'data': json.dumps({'generated_text': f"a{i}"}), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+        },
+        'eventMetadata': {'eventId': f"e{i}", 'inferenceTime': '2025-01-01T00:00:00Z'},
+    }) + '\n'
+
+
+class FakeS3:
+    """One capture file, with the ranged GETs a resumed file makes."""
+
+    def __init__(self, body):
+        self.body = body
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.ranges.append(Range)
+        start = int(Range[len('bytes='):].split('-')[0]) if Range else 0
+        return {'Body': io.BytesIO(self.body[start:])}
+
+
+class FakeContext:
+    """Lambda context that runs out of time after ``checks`` checks of the remaining time."""
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def get_remaining_time_in_millis(self):
+        self.checks -= 1
+        return 900_000 if self.checks > 0 else 0
+
+
+@pytest.fixture
+def resumable(handler, monkeypatch, tmp_path):
+    """A checkpointed capture file of 10 records, with stand-ins for S3 and MLflow."""
+    s3 = FakeS3(''.join(capture_line(i) for i in range(10)).encode())
+    store = LocalCheckpointStore(str(tmp_path))
+    logged, evaluated = [], []
+    monkeypatch.setattr(handler, 's3_client', s3)
+    monkeypatch.setattr(handler, 'get_checkpoint_store', lambda: store)
+    monkeypatch.setattr(handler, 'CHECKPOINT_TIME_RESERVE_SECONDS', 60)
+    monkeypatch.setattr(handler, 'setup_mlflow', lambda: None)
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: None)
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: '1')
+    monkeypatch.setattr(handler, 'log_endpoint_stats', lambda *args: None)
+    monkeypatch.setattr(handler.mlflow, 'flush_trace_async_logging', lambda: None)
+    monkeypatch.setattr(handler, 'log_trace_to_mlflow', lambda event, key, endpoint: logged.append(event['event_id']) or f"tr-{event['event_id']}")
+    monkeypatch.setattr(handler, 'run_evaluations', lambda key, trace_ids, trace_strata: evaluated.append(trace_ids))
+    return s3, logged, evaluated
+
+
+def test_interrupted_file_resumes_without_reingesting_or_skipping_records(handler, resumable):
+    s3, logged, evaluated = resumable
+    event = {'s3_bucket': 'test-bucket', 's3_key': 'capture.jsonl'}
+
+    stopped = handler.handle_event(event, FakeContext(checks=4))
+
+    assert stopped['statusCode'] == 202 and stopped['continue']
+    assert logged == ['e0', 'e1', 'e2', 'e3']
+    assert stopped['continue_from_offset'] == sum(len(capture_line(i)) for i in range(4))
+
+    finished = handler.handle_event({'s3_bucket': 'test-bucket', 's3_key': 'capture.jsonl', 'continue_from_offset': stopped['continue_from_offset']}, None)
+
+    assert finished['statusCode'] == 200
+    assert sorted(logged) == [f"e{i}" for i in range(10)]
+    assert len(logged) == 10
+    assert json.loads(finished['body'])['records_processed'] == 10
+    assert json.loads(finished['body'])['invocations'] == 2
+    # The traces of both invocations are evaluated together
+    assert evaluated == [[f"tr-e{i}" for i in range(10)]]
+    assert s3.ranges[-1] == f"bytes={stopped['continue_from_offset']}-"
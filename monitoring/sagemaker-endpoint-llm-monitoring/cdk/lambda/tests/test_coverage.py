@@ -0,0 +1,77 @@
+from coverage import ERROR, MISSING, CoverageMatrix
+
+
+def matrix():
+    coverage = CoverageMatrix()
+    coverage.add(['t1', 't2'], ['safety', 'fluency'])
+    return coverage
+
+
+def test_new_cells_are_pending():
+    assert matrix().pending(['t1', 't2']) == {
+        't1': frozenset({'safety', 'fluency'}),
+        't2': frozenset({'safety', 'fluency'}),
+    }
+
+
+def test_only_missing_or_failed_cells_stay_pending():
+    coverage = matrix()
+    coverage.record('t1', 'safety', ok=True)
+    coverage.record('t1', 'fluency', ok=False)
+    coverage.record('t2', 'safety', ok=True)
+    coverage.record('t2', 'fluency', ok=True)
+
+    assert coverage.pending(['t1', 't2']) == {'t1': frozenset({'fluency'})}
+    assert coverage.incomplete() == {'t1': {'fluency': ERROR}}
+
+
+def test_ok_cell_is_not_downgraded_by_a_later_failure():
+    coverage = matrix()
+    coverage.record('t1', 'safety', ok=True)
+    coverage.record('t1', 'safety', ok=False)
+
+    assert 'safety' not in coverage.pending(['t1'])['t1']
+
+
+def test_failed_cell_is_completed_by_a_retry():
+    coverage = matrix()
+    coverage.record('t1', 'safety', ok=False)
+    coverage.record('t1', 'safety', ok=True)
+
+    assert coverage.pending(['t1']) == {'t1': frozenset({'fluency'})}
+
+
+def test_unknown_cells_are_ignored():
+    coverage = matrix()
+    coverage.record('t3', 'safety', ok=True)
+    coverage.record('t1', 'coherence', ok=True)
+    coverage.record(None, 'safety', ok=True)
+
+    assert coverage.summary()['cells'] == 4
+
+
+def test_adding_again_keeps_recorded_outcomes():
+    coverage = matrix()
+    coverage.record('t1', 'safety', ok=True)
+    coverage.add(['t1'], ['safety', 'coherence'])
+
+    assert coverage.pending(['t1']) == {'t1': frozenset({'fluency', 'coherence'})}
+
+
+def test_summary_counts_cells_per_scorer():
+    coverage = matrix()
+    coverage.record('t1', 'safety', ok=True)
+    coverage.record('t2', 'safety', ok=False)
+    coverage.record('t1', 'fluency', ok=True)
+
+    summary = coverage.summary()
+
+    assert summary['traces'] == 2
+    assert summary['cells'] == 4
+    assert summary['coverage'] == 0.5
+    assert summary['scorers']['safety'] == {'ok': 1, 'error': 1, 'missing': 0}
+    assert summary['scorers']['fluency'][MISSING] == 1
+
+
+def test_empty_matrix_is_fully_covered():
+    assert CoverageMatrix().summary()['coverage'] == 1.0
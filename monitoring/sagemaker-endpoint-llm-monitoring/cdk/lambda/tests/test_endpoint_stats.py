@@ -0,0 +1,126 @@
+import json
+import random
+
+import pytest
+
+from endpoint_stats import EndpointStats, QuantileSketch, merge_stats
+
+
+def exact_quantile(values, q):
+    """The value the sketch approximates: the one at rank ``q * (n - 1)``."""
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def latencies(n, seed):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(4, 1.5) for _ in range(n)]
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_quantiles_are_within_the_relative_accuracy(relative_accuracy):
+    values = latencies(10000, seed=1)
+    sketch = QuantileSketch(relative_accuracy)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.0, 0.1, 0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= relative_accuracy * exact * (1 + 1e-9)
+    assert sketch.count == 10000
+    assert sketch.total == pytest.approx(sum(values))
+
+
+def test_zeros_and_an_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+
+    for value in (0, 0, 0, 10):
+        sketch.add(value)
+
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(10, rel=0.01)
+
+
+def test_merged_sketches_equal_one_sketch_of_all_values():
+    first_values, second_values = latencies(3000, seed=2), latencies(5000, seed=3)
+    first, second, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in first_values:
+        first.add(value)
+        whole.add(value)
+    for value in second_values:
+        second.add(value)
+        whole.add(value)
+
+    first.merge(second)
+
+    assert first.bins == whole.bins
+    assert (first.count, first.min, first.max) == (whole.count, whole.min, whole.max)
+    for q in (0.5, 0.9, 0.99):
+        assert first.quantile(q) == whole.quantile(q)
+
+
+def test_sketches_of_different_accuracies_do_not_merge():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_sketch_survives_a_json_round_trip():
+    sketch = QuantileSketch()
+    for value in latencies(1000, seed=4) + [0]:
+        sketch.add(value)
+
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert restored.to_dict() == sketch.to_dict()
+    for q in (0.0, 0.5, 0.99, 1.0):
+        assert restored.quantile(q) == sketch.quantile(q)
+    assert QuantileSketch.from_dict(QuantileSketch().to_dict()).quantile(0.5) is None
+
+
+def record(minute, status_code=200, is_error=False, text='x' * 40, **fields):
+    return {
+        'timestamp': f"2025-01-01T00:{minute:02d}:30Z",
+        'status_code': status_code,
+        'is_error': is_error,
+        'request_bytes': 100,
+        'response_bytes': 400,
+        'request': {'inputs': 'q', 'parameters': {'max_new_tokens': 64}},
+        'response': {'generated_text': text},
+        **fields,
+    }
+
+
+def test_endpoint_stats_summarise_the_records():
+    stats = EndpointStats()
+    stats.add(record(0))
+    stats.add(record(0, stream={'ttft_ms': 120.0, 'inter_chunk_ms': [10.0, 20.0]}))
+    stats.add(record(1, status_code=500, is_error=True))
+
+    summary = stats.summary()
+
+    assert summary['requests'] == 3
+    assert summary['error_rate'] == pytest.approx(1 / 3)
+    assert summary['status_500_rate'] == pytest.approx(1 / 3)
+    assert (summary['requests_per_minute_peak'], summary['active_minutes']) == (2, 2)
+    assert summary['generated_tokens_mean'] == pytest.approx(10, rel=0.01)
+    assert stats.sketches['generated_tokens'].count == 2
+    assert summary['ttft_ms_p50'] == pytest.approx(120, rel=0.01)
+    assert summary['max_new_tokens_max'] == 64
+
+
+def test_merged_stats_equal_the_stats_of_all_records():
+    records = [record(minute % 3, status_code=200 if minute % 4 else 429) for minute in range(12)]
+    whole = EndpointStats()
+    for parsed_record in records:
+        whole.add(parsed_record)
+    shards = []
+    for shard_records in (records[:5], records[5:]):
+        shard = EndpointStats()
+        for parsed_record in shard_records:
+            shard.add(parsed_record)
+        shards.append(json.loads(json.dumps(shard.to_dict())))
+
+    merged = merge_stats(None, *shards)
+
+    assert EndpointStats.from_dict(merged).summary() == whole.summary()
+    assert merge_stats(None, None) is None
@@ -0,0 +1,100 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from heuristics import compute_heuristics, extract_columns, response_text  # noqa: E402
+
+
+def parsed_record(prompt='What is the capital of France?', text='Paris is the capital.', max_new_tokens=None, **fields):
+    parameters = {'max_new_tokens': max_new_tokens} if max_new_tokens is not None else {}
+    return {
+        'request': {'inputs': prompt, 'parameters': parameters},
+        'response': {'generated_text': text},
+        'is_error': False,
+        **fields,
+    }
+
+
+def test_counts_and_ratios_of_a_plain_answer():
+    [signals] = compute_heuristics([parsed_record()])
+
+    assert signals == {
+        'prompt_words': 6,
+        'prompt_chars': 30,
+        'response_words': 4,
+        'response_chars': 21,
+        'repetition_ratio': 0.0,
+        'truncated': False,
+        'empty_output': False,
+        'refusal': False,
+        'length_ratio': 0.7,
+    }
+    assert all(type(value) in (int, float, bool) for value in signals.values())
+
+
+def test_repeated_words_raise_the_repetition_ratio():
+    [signals] = compute_heuristics([parsed_record(text='the the the the cat')])
+
+    assert signals['response_words'] == 5
+    assert signals['repetition_ratio'] == pytest.approx(0.6)
+
+
+@pytest.mark.parametrize('text', [
+    "I'm sorry, but I can't share that.",
+    'I cannot help with this request.',
+    'As an AI language model, I do not have opinions.',
+    "i'm not able to assist with that",
+])
+def test_refusals(text):
+    [signals] = compute_heuristics([parsed_record(text=text)])
+
+    assert signals['refusal']
+
+
+@pytest.mark.parametrize('text', ['', '   \n'])
+def test_empty_outputs(text):
+    [signals] = compute_heuristics([parsed_record(text=text)])
+
+    assert signals['empty_output']
+    assert signals['response_words'] == 0
+    assert signals['repetition_ratio'] == 0.0
+
+
+def test_truncation_from_finish_reason_generated_tokens_or_estimate():
+    by_reason = parsed_record(response=[{'generated_text': 'a b', 'details': {'finish_reason': 'length'}}])
+    by_tokens = parsed_record(max_new_tokens=10, response={'generated_text': 'short', 'details': {'generated_tokens': 10}})
+    finished = parsed_record(max_new_tokens=10, response={'generated_text': 'x' * 100, 'details': {'generated_tokens': 9}})
+    # 39 characters are about 9.75 tokens, within the tolerance of 10
+    estimated = parsed_record(max_new_tokens=10, text='x' * 39)
+    short = parsed_record(max_new_tokens=10, text='x' * 20)
+
+    signals = compute_heuristics([by_reason, by_tokens, finished, estimated, short])
+
+    assert [record_signals['truncated'] for record_signals in signals] == [True, True, False, True, False]
+
+
+def test_error_responses_get_no_signals_and_batches_keep_their_order():
+    records = [parsed_record(text='one'), parsed_record(is_error=True, response={'code': 500}), parsed_record(text='two words')]
+
+    signals = compute_heuristics(records)
+
+    assert signals[1] is None
+    assert [signals[0]['response_words'], signals[2]['response_words']] == [1, 2]
+    assert compute_heuristics([]) == []
+
+
+def test_unusual_payload_shapes():
+    records = [
+        {'request': 'raw prompt text', 'response': 'raw response'},
+        {'request': {'inputs': ['a', 'list']}, 'response': [{'generated_text': 'from a list'}]},
+        {},
+    ]
+
+    columns = extract_columns(records)
+    signals = compute_heuristics(records)
+
+    assert columns['prompt'] == ['raw prompt text', "['a', 'list']", '']
+    assert columns['response'] == ['raw response', 'from a list', '']
+    assert [record_signals['response_words'] for record_signals in signals] == [2, 3, 0]
+    assert signals[2]['length_ratio'] == 0.0
+    assert response_text({'generated_text': None}) == ''
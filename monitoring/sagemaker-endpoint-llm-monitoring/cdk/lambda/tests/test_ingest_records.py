@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+
+import pytest
+
+from ingestion_index import IngestionIndex, SQLiteIndexBackend
+from spool import TrackingCircuit
+
+
+def capture_line(i, error=False):
+    output = {'code': 500, 'message': 'model error'} if error else {'generated_text': f"a{i}"}
+    return json.dumps({
+        'captureData': {
+            'endpointInput': {'data': json.dumps({'inputs': f"q{i}"}), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+            'endpointOutput': {'data': json.dumps(output), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+        },
+        'eventMetadata': {'eventId': f"e{i}", 'inferenceTime': '2025-01-01T00:00:00Z'},
+    })
+
+
+class FakeTracing:
+    """Stand-in for log_trace_to_mlflow, failing for the events in ``failing``."""
+
+    def __init__(self, failing=(), delay=0.0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.logged = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event, s3_file_key, endpoint=None):
+        time.sleep(self.delay)
+        if event['event_id'] in self.failing:
+            raise RuntimeError("tracking server error")
+        with self._lock:
+            self.logged.append(event['event_id'])
+        return f"tr-{event['event_id']}"
+
+
+@pytest.fixture
+def tracing(handler, monkeypatch):
+    tracing = FakeTracing()
+    circuit = TrackingCircuit(latency_budget_seconds=60, retry_after_seconds=60)
+    monkeypatch.setattr(handler, 'log_trace_to_mlflow', tracing)
+    monkeypatch.setattr(handler, 'get_tracking_circuit', lambda: circuit)
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: '1')
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: None)
+    monkeypatch.setattr(handler.mlflow, 'flush_trace_async_logging', lambda: None)
+    return tracing
+
+
+@pytest.mark.parametrize('flush_every', [0, 2])
+def test_a_failing_record_does_not_affect_the_others(handler, tracing, flush_every):
+    tracing.failing = {'e1'}
+    records = [capture_line(0), '{"captureData": ', capture_line(1), capture_line(2)]
+
+    counts = handler.ingest_records(records, 'capture.jsonl', max_workers=2, flush_every=flush_every)
+
+    assert sorted(tracing.logged) == ['e0', 'e2']
+    assert (counts['total'], counts['processed']) == (4, 2)
+    assert sorted(counts['trace_ids']) == ['tr-e0', 'tr-e2']
+
+
+def test_records_in_flight_stay_within_max_pending(handler, tracing):
+    tracing.delay = 0.002
+    read = []
+
+    def records():
+        for i in range(60):
+            # Read but not yet logged
+            read.append(len(read) + 1 - len(tracing.logged))
+            yield capture_line(i)
+
+    counts = handler.ingest_records(records(), 'capture.jsonl', max_workers=2, max_pending=4, flush_every=0)
+
+    assert counts['processed'] == 60
+    assert 2 <= max(read) <= 4
+
+
+def test_counts_of_errors_duplicates_and_checkpoints(handler, tracing, tmp_path):
+    index = IngestionIndex(SQLiteIndexBackend(str(tmp_path / 'index.sqlite')))
+    index.mark(['e1'], 'capture.jsonl')
+    checkpoints = []
+    records = [capture_line(0), capture_line(1), capture_line(2, error=True), capture_line(3)]
+
+    counts = handler.ingest_records(
+        records, 'capture.jsonl', flush_every=0, index=index, checkpoint_every=2, on_checkpoint=checkpoints.append,
+    )
+
+    assert {name: counts[name] for name in ('total', 'processed', 'errors', 'skipped', 'stopped')} == {
+        'total': 4, 'processed': 3, 'errors': 1, 'skipped': 1, 'stopped': False,
+    }
+    assert sorted(counts['trace_ids']) == ['tr-e0', 'tr-e2', 'tr-e3']
+    assert set(counts['trace_strata']) == set(counts['trace_ids'])
+    assert counts['endpoint_stats']['requests'] == 3
+    assert [(checkpoint['total'], checkpoint['skipped']) for checkpoint in checkpoints] == [(2, 1), (4, 1)]
+    assert index.seen('e3', 'capture.jsonl')
+
+
+def test_should_stop_ends_reading_after_the_current_record(handler, tracing):
+    counts = handler.ingest_records(
+        (capture_line(i) for i in range(10)), 'capture.jsonl', flush_every=0, should_stop=lambda: True,
+    )
+
+    assert counts['stopped']
+    assert counts['total'] == 1
+    assert tracing.logged == ['e0']
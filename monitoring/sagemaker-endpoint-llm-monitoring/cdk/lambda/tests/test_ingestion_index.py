@@ -0,0 +1,93 @@
+import io
+
+from ingestion_index import BloomFilter, IngestionIndex, S3IndexBackend, SQLiteIndexBackend
+
+
+class FakeS3:
+    """In-memory bucket with the calls the S3 backend makes."""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+        self.gets = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+        self.puts += 1
+
+    def get_object(self, Bucket, Key):
+        self.gets += 1
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+    def get_paginator(self, name):
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {'Contents': [{'Key': key} for key in sorted(objects) if key.startswith(Prefix)]}
+
+        return Paginator()
+
+
+def test_shared_index_sees_ids_written_by_another_container_after_save():
+    s3 = FakeS3()
+    writer = IngestionIndex(S3IndexBackend(s3, 'bucket', 'index/'))
+    reader = IngestionIndex(S3IndexBackend(s3, 'bucket', 'index/'))
+
+    assert not reader.seen('e1', 'file-a')
+    writer.mark(['e1', 'e2', None], 'file-a')
+    reader.save()
+
+    assert reader.seen('e1', 'file-a')
+    assert reader.seen('e2', 'file-a')
+    assert not reader.seen('e1', 'file-b')
+
+
+def test_shared_index_writes_one_object_per_mark_and_reads_a_file_once():
+    s3 = FakeS3()
+    index = IngestionIndex(S3IndexBackend(s3, 'bucket', 'index/'))
+
+    index.mark(['e1', 'e2', 'e3'], 'file-a')
+    index.mark(['e4'], 'file-a')
+    assert s3.puts == 2
+
+    index.save()
+    for event_id in ('e1', 'e2', 'e3', 'e4', 'e5'):
+        index.seen(event_id, 'file-a')
+    assert s3.gets == 2
+
+
+def test_shared_index_read_failure_is_not_seen():
+    class BrokenS3(FakeS3):
+        def get_paginator(self, name):
+            raise RuntimeError("unavailable")
+
+    index = IngestionIndex(S3IndexBackend(BrokenS3(), 'bucket', 'index/'))
+
+    assert not index.seen('e1', 'file-a')
+
+
+def test_local_index_confirms_bloom_hits_and_persists_the_filter(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    index = IngestionIndex(SQLiteIndexBackend(path), bloom_capacity=1000)
+
+    assert not index.seen('e1')
+    index.mark(['e1'])
+    assert index.seen('e1')
+    index.save()
+
+    restarted = IngestionIndex(SQLiteIndexBackend(path), bloom_capacity=1000)
+    assert 'e1' in restarted.bloom
+    assert restarted.seen('e1')
+    assert not restarted.seen('e2')
+
+
+def test_bloom_union_merges_bits():
+    first, second = BloomFilter(1000, 0.01), BloomFilter(1000, 0.01)
+    first.add('a')
+    second.add('b')
+
+    first.union(bytes(second.bits))
+
+    assert 'a' in first and 'b' in first
+    assert 'c' not in first
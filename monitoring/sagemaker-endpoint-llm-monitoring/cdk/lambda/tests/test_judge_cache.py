@@ -0,0 +1,69 @@
+import pytest
+
+import judge_cache
+from judge_cache import JudgeResultCache, SQLiteCacheBackend, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(judge_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteCacheBackend(str(tmp_path / 'cache.sqlite'))
+
+
+def test_entry_expires_after_the_ttl(clock, backend):
+    cache = JudgeResultCache(backend, ttl_seconds=100)
+    cache.put('key', {'value': 'yes'})
+
+    clock.now += 100
+    assert cache.get('key') == {'value': 'yes'}
+    clock.now += 1
+    assert cache.get('key') is None
+
+
+def test_entry_read_from_the_backend_keeps_its_creation_time(clock, backend):
+    JudgeResultCache(backend, ttl_seconds=100).put('key', {'value': 'yes'})
+
+    # Another container reads the entry late in its life
+    clock.now += 90
+    cache = JudgeResultCache(backend, ttl_seconds=100)
+    assert cache.get('key') == {'value': 'yes'}
+
+    clock.now += 20
+    assert cache.get('key') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_backend_failure_is_a_miss(clock):
+    class BrokenBackend:
+        def get(self, key, ttl_seconds):
+            raise RuntimeError("unavailable")
+
+        def put(self, key, value):
+            raise RuntimeError("unavailable")
+
+    cache = JudgeResultCache(BrokenBackend(), ttl_seconds=100)
+    assert cache.get('key') is None
+    cache.put('key', {'value': 'yes'})
+    assert cache.get('key') == {'value': 'yes'}
+
+
+def test_cache_key_depends_on_the_judge_mode():
+    key = make_cache_key({'q': 1}, {'a': 2}, 'safety', 'model', {'temperature': 0})
+
+    assert key == make_cache_key({'q': 1}, {'a': 2}, 'safety', 'model', {'temperature': 0})
+    assert key != make_cache_key({'q': 1}, {'a': 2}, 'safety', 'model', {'temperature': 0}, 'batch-v1')
+    assert key != make_cache_key({'q': 1}, {'a': 2}, 'fluency', 'model', {'temperature': 0})
@@ -0,0 +1,151 @@
+import pytest
+
+import judge_scheduler
+from judge_scheduler import AIMDLimiter, JudgeScheduler, TokenBucket, is_throttling_error
+
+
+class FakeClock:
+    """Stand-in for the ``time`` module: ``sleep`` advances ``monotonic`` instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Feedback:
+    def __init__(self, value, error=None):
+        self.value = value
+        self.error = error
+
+
+class FakeJudge:
+    """Judge returning (or raising) the given outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self, inputs, outputs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(judge_scheduler, 'time', clock)
+    monkeypatch.setattr(judge_scheduler.random, 'uniform', lambda low, high: 0.0)
+    return clock
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60)  # one token per second
+
+    assert bucket.acquire(60) == 0.0
+    assert bucket.acquire(2) == pytest.approx(2.0)
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+
+def test_token_bucket_refills_with_elapsed_time(clock):
+    bucket = TokenBucket(60)
+    bucket.acquire(60)
+    clock.now += 5
+
+    assert bucket.acquire(5) == 0.0
+
+
+def test_token_bucket_lets_oversized_requests_through_when_full(clock):
+    bucket = TokenBucket(10)
+
+    assert bucket.acquire(100) == 0.0
+
+
+def test_token_bucket_without_rate_never_waits(clock):
+    bucket = TokenBucket(0)
+
+    assert bucket.acquire(1e9) == 0.0
+    assert clock.sleeps == []
+
+
+def test_aimd_halves_on_throttling_and_grows_after_successes():
+    limiter = AIMDLimiter(8, max_limit=8, increase_after=3)
+
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=False)
+    assert limiter.limit == 5
+
+
+def test_aimd_limit_stays_within_bounds():
+    limiter = AIMDLimiter(2, min_limit=1, max_limit=2, increase_after=1)
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 1
+
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(throttled=False)
+    assert limiter.limit == 2
+
+
+def test_throttled_call_is_retried_with_exponential_backoff(clock):
+    scheduler = JudgeScheduler(max_concurrency=4, max_attempts=4, backoff_seconds=1.0)
+    judge = FakeJudge(
+        RuntimeError("ThrottlingException: Too many requests"),
+        Feedback(None, error="ThrottlingException: rate exceeded"),
+        Feedback('yes'),
+    )
+
+    result = scheduler.call(judge, {'inputs': 'q', 'outputs': 'a'})
+
+    assert result.value == 'yes'
+    assert judge.calls == 3
+    assert clock.sleeps == [1.0, 2.0]
+    stats = scheduler.stats()
+    assert stats['throttled'] == 2
+    assert stats['retries'] == 2
+    assert stats['succeeded'] == 1
+    assert stats['concurrency_limit'] == 1
+
+
+def test_last_failure_is_raised_once_attempts_run_out(clock):
+    scheduler = JudgeScheduler(max_attempts=2, backoff_seconds=0.5)
+    judge = FakeJudge(ValueError("bad reply"), ValueError("still bad"))
+
+    with pytest.raises(ValueError, match="still bad"):
+        scheduler.call(judge, {'inputs': 'q', 'outputs': 'a'})
+
+    assert scheduler.stats()['failed'] == 1
+    assert scheduler.stats()['throttled'] == 0
+
+
+def test_last_feedback_error_is_returned_once_attempts_run_out(clock):
+    scheduler = JudgeScheduler(max_attempts=2, backoff_seconds=0.5)
+    judge = FakeJudge(Feedback(None, error="bad reply"), Feedback(None, error="still bad"))
+
+    result = scheduler.call(judge, {'inputs': 'q', 'outputs': 'a'})
+
+    assert result.error == "still bad"
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(RuntimeError("ThrottlingException"))
+    assert is_throttling_error("ServiceUnavailableException: try later")
+    assert not is_throttling_error(ValueError("invalid JSON"))
+    assert not is_throttling_error(None)
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+
+def fake_trace(trace_id):
+    return SimpleNamespace(info=SimpleNamespace(trace_id=trace_id))
+
+
+class FakeSearch:
+    """Stand-in for mlflow.search_traces over the traces of an experiment."""
+
+    def __init__(self, traces):
+        self.traces = traces
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        return list(self.traces)
+
+
+def test_traces_kept_in_memory_need_no_search(handler, monkeypatch):
+    search = FakeSearch([])
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search)
+    for trace_id in ('tr-1', 'tr-2', 'tr-3'):
+        handler.remember_trace(fake_trace(trace_id))
+
+    traces = handler.load_traces('capture.jsonl', '1', ['tr-3', 'tr-1'])
+
+    assert [trace.info.trace_id for trace in traces] == ['tr-3', 'tr-1']
+    assert search.calls == []
+
+
+def test_traces_no_longer_in_memory_are_fetched_by_id(handler, monkeypatch):
+    search = FakeSearch([fake_trace('tr-1')])
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search)
+    monkeypatch.setattr(handler, 'LOGGED_TRACES_MAX_SIZE', 1)
+    handler.remember_trace(fake_trace('tr-1'))
+    handler.remember_trace(fake_trace('tr-2'))
+
+    traces = handler.load_traces('capture.jsonl', '1', ['tr-1', 'tr-2'])
+
+    assert isinstance(traces, list)
+    assert [trace.info.trace_id for trace in traces] == ['tr-1', 'tr-2']
+    [call] = search.calls
+    assert call['filter_string'] == "attributes.request_id IN ('tr-1')"
+    assert call['return_type'] == 'list'
+
+
+def test_ids_are_fetched_in_chunks(handler, monkeypatch):
+    search = FakeSearch([])
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search)
+
+    handler.load_traces('capture.jsonl', '1', [f"tr-{i}" for i in range(handler.SEARCH_TRACES_MAX_IDS + 1)])
+
+    assert len(search.calls) == 2
+
+
+def test_without_ids_the_traces_are_searched_by_name(handler, monkeypatch):
+    search = FakeSearch([fake_trace('tr-1')])
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search)
+
+    traces = handler.load_traces('capture.jsonl', '1')
+
+    assert [trace.info.trace_id for trace in traces] == ['tr-1']
+    assert search.calls == [{'locations': ['1'], 'filter_string': "name = 'capture.jsonl'", 'return_type': 'list'}]
+
+
+def test_batched_traces_without_a_name_tag_are_searched_by_span_name(handler, monkeypatch):
+    class SpanNameSearch(FakeSearch):
+        def __call__(self, **kwargs):
+            super().__call__(**kwargs)
+            return list(self.traces) if kwargs['filter_string'].startswith('span.name') else []
+
+    search = SpanNameSearch([fake_trace('tr-1')])
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search)
+    monkeypatch.setattr(handler, 'TRACE_EXPORT_MODE', 'batch')
+
+    traces = handler.load_traces('capture.jsonl', '1')
+
+    assert [trace.info.trace_id for trace in traces] == ['tr-1']
+    assert [call['filter_string'] for call in search.calls] == ["name = 'capture.jsonl'", "span.name = 'capture.jsonl'"]
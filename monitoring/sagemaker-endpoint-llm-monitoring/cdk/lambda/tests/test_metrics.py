@@ -0,0 +1,83 @@
+import io
+import json
+
+from metrics import MAX_VALUES_PER_METRIC, MetricsRecorder
+
+
+def emitted(recorder, dimensions):
+    stream = io.StringIO()
+    documents = recorder.emit(dimensions, stream=stream)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines == documents
+    return lines
+
+
+def test_totals_are_one_emf_document():
+    recorder = MetricsRecorder('Test/Namespace')
+    recorder.add('RecordsProcessed', 3)
+    recorder.add('RecordsProcessed', 2)
+    recorder.add('ParseTime', 1.23456, 'Milliseconds')
+
+    [document] = emitted(recorder, {'Endpoint': 'ep'})
+
+    [directive] = document['_aws']['CloudWatchMetrics']
+    assert directive['Namespace'] == 'Test/Namespace'
+    assert directive['Dimensions'] == [['Endpoint']]
+    assert directive['Metrics'] == [
+        {'Name': 'ParseTime', 'Unit': 'Milliseconds'},
+        {'Name': 'RecordsProcessed', 'Unit': 'Count'},
+    ]
+    assert document['Endpoint'] == 'ep'
+    assert document['RecordsProcessed'] == 5
+    assert document['ParseTime'] == 1.235
+
+
+def test_observations_get_their_own_dimensions():
+    recorder = MetricsRecorder('Test/Namespace')
+    recorder.observe('JudgeLatency', 10, Scorer='safety')
+    recorder.observe('JudgeLatency', 20, Scorer='safety')
+    recorder.observe('JudgeLatency', 30, Scorer='fluency')
+
+    documents = emitted(recorder, {'Endpoint': 'ep'})
+
+    by_scorer = {document['Scorer']: document for document in documents}
+    assert by_scorer['safety']['JudgeLatency'] == [10, 20]
+    assert by_scorer['fluency']['JudgeLatency'] == [30]
+    assert by_scorer['safety']['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Endpoint', 'Scorer']]
+
+
+def test_observations_are_split_at_the_value_limit():
+    recorder = MetricsRecorder('Test/Namespace')
+    for value in range(MAX_VALUES_PER_METRIC + 5):
+        recorder.observe('JudgeLatency', value)
+
+    documents = emitted(recorder, {})
+
+    assert [len(document['JudgeLatency']) for document in documents] == [MAX_VALUES_PER_METRIC, 5]
+
+
+def test_emit_resets_the_recorder():
+    recorder = MetricsRecorder('Test/Namespace')
+    recorder.add('RecordsProcessed')
+    emitted(recorder, {})
+
+    assert emitted(recorder, {}) == []
+
+
+def test_disabled_recorder_writes_nothing():
+    recorder = MetricsRecorder('Test/Namespace', enabled=False)
+    recorder.add('RecordsProcessed')
+    with recorder.timer('Parse'):
+        pass
+
+    assert emitted(recorder, {}) == []
+
+
+def test_timer_adds_milliseconds():
+    recorder = MetricsRecorder('Test/Namespace')
+    with recorder.timer('Parse'):
+        pass
+
+    [document] = emitted(recorder, {})
+    assert document['ParseTime'] >= 0
+    assert document['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{'Name': 'ParseTime', 'Unit': 'Milliseconds'}]
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from parquet_sink import LocalParquetStore, ParquetSink, parquet_schema  # noqa: E402
+
+
+def parsed_record(event_id, timestamp='2025-01-01T12:00:00Z', **fields):
+    return {
+        'event_id': event_id,
+        'timestamp': timestamp,
+        'status_code': 200,
+        'is_error': False,
+        'request_bytes': 120,
+        'response_bytes': 480,
+        'request': {'inputs': 'What is the capital of France?', 'parameters': {'max_new_tokens': 64}},
+        'response': [{'generated_text': 'Paris.', 'details': {'finish_reason': 'eos_token', 'generated_tokens': 3}}],
+        **fields,
+    }
+
+
+def read_rows(uri):
+    return pq.read_table(uri[len('file://'):], partitioning=None).to_pylist()
+
+
+def test_rows_round_trip_with_the_schema(tmp_path):
+    sink = ParquetSink(LocalParquetStore(str(tmp_path)), 'capture.jsonl')
+    sink.add(parsed_record('e2', '2025-01-01T12:00:02Z', stream={'chunks': 4, 'ttft_ms': 85.5}), 'endpoint-a')
+    sink.add(parsed_record('e1', '2025-01-01T12:00:01Z', heuristics={'prompt_words': 6, 'truncated': False}), 'endpoint-a')
+
+    [uri] = sink.flush()
+
+    assert '/endpoint=endpoint-a/date=2025-01-01/' in uri
+    table = pq.read_table(uri[len('file://'):], partitioning=None)
+    assert table.schema.equals(parquet_schema())
+    first, second = table.to_pylist()
+    # Rows are sorted by inference time
+    assert (first['event_id'], second['event_id']) == ('e1', 'e2')
+    assert first['inference_time'].isoformat() == '2025-01-01T12:00:01+00:00'
+    assert (first['status_code'], first['request_bytes'], first['max_new_tokens'], first['generated_tokens']) == (200, 120, 64, 3)
+    assert (first['finish_reason'], first['prompt'], first['response_text']) == ('eos_token', 'What is the capital of France?', 'Paris.')
+    assert (first['prompt_words'], first['truncated'], first['refusal']) == (6, False, None)
+    assert (second['streamed'], second['stream_chunks'], second['ttft_ms']) == (True, 4, 85.5)
+    assert (sink.rows_written, sink.files_written) == (2, 1)
+
+
+def test_partitions_by_endpoint_and_day(tmp_path):
+    sink = ParquetSink(LocalParquetStore(str(tmp_path)), 'capture.jsonl')
+    sink.add(parsed_record('e1', '2025-01-01T23:59:59Z'), 'endpoint-a')
+    sink.add(parsed_record('e2', '2025-01-02T00:00:00Z'), 'endpoint-a')
+    sink.add(parsed_record('e3', '2025-01-01T12:00:00Z'), 'endpoint-b')
+    sink.add(parsed_record('e4', None), None)
+
+    uris = sink.flush()
+
+    partitions = sorted(os.path.dirname(os.path.relpath(uri[len('file://'):], tmp_path)) for uri in uris)
+    assert partitions == [
+        'endpoint=__HIVE_DEFAULT_PARTITION__/date=__HIVE_DEFAULT_PARTITION__',
+        'endpoint=endpoint-a/date=2025-01-01',
+        'endpoint=endpoint-a/date=2025-01-02',
+        'endpoint=endpoint-b/date=2025-01-01',
+    ]
+    assert sink.buffered == 0
+
+
+def test_unexpected_values_are_written_as_nulls(tmp_path):
+    sink = ParquetSink(LocalParquetStore(str(tmp_path)), 'capture.jsonl')
+    sink.add({'event_id': 'e1', 'status_code': 'unknown', 'is_error': True, 'error_message': {'detail': 'bad input'}}, 'endpoint-a')
+    sink.add(parsed_record(
+        'e2',
+        status_code=99999,
+        request_bytes='120',
+        response_bytes='n/a',
+        request={'inputs': 'q', 'parameters': {'max_new_tokens': 10 ** 12}},
+        stream={'chunks': 'many', 'ttft_ms': 'fast'},
+    ), 'endpoint-a')
+
+    uris = sink.flush()
+
+    missing, malformed = sorted((row for uri in uris for row in read_rows(uri)), key=lambda row: row['event_id'])
+    assert (missing['inference_time'], missing['status_code'], missing['request_bytes'], missing['prompt']) == (None, None, None, '')
+    assert missing['error_message'] == json.dumps({'detail': 'bad input'})
+    assert (malformed['status_code'], malformed['request_bytes'], malformed['response_bytes']) == (None, 120, None)
+    assert (malformed['max_new_tokens'], malformed['stream_chunks'], malformed['ttft_ms']) == (None, None, None)
+
+
+@pytest.fixture
+def parquet_files(handler, monkeypatch, tmp_path):
+    """Ingestion into a local Parquet store, with a stand-in for MLflow."""
+    pytest.importorskip('pandas')
+    monkeypatch.setattr(handler, 'get_parquet_store', lambda: LocalParquetStore(str(tmp_path)))
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: '1')
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: None)
+    monkeypatch.setattr(handler.mlflow, 'flush_trace_async_logging', lambda: None)
+    monkeypatch.setattr(handler, 'log_trace_to_mlflow', lambda event, key, endpoint: f"tr-{event['event_id']}")
+    return tmp_path
+
+
+def capture_line(i):
+    return json.dumps({
+        'captureData': {
+            'endpointInput': {'data': json.dumps({'inputs': f"question {i}"}), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+            'endpointOutput': {'data': json.dumps({'generated_text': f"answer {i}"}), 'encoding': 'JSON', 'observedContentType': 'application/json'},
+        },
+        'eventMetadata': {'eventId': f"e{i}", 'inferenceTime': '2025-01-01T00:00:00Z'},
+    })
+
+
+def test_full_sink_flushes_after_the_traces_of_its_rows(handler, monkeypatch, parquet_files):
+    monkeypatch.setattr(handler, 'PARQUET_MAX_ROWS_PER_FILE', 2)
+
+    handler.ingest_records([capture_line(i) for i in range(5)], 'capture.jsonl', max_workers=1, flush_every=10)
+
+    files = sorted(parquet_files.rglob('*.parquet'))
+    rows = [row for path in files for row in pq.read_table(path, partitioning=None).to_pylist()]
+    assert len(files) == 3
+    assert sorted(row['event_id'] for row in rows) == [f"e{i}" for i in range(5)]
+    # The trace writer was flushed first, so every row has its heuristic signals
+    assert all(row['prompt_words'] == 2 and row['response_words'] == 2 for row in rows)
@@ -0,0 +1,112 @@
+import gzip
+import io
+import json
+
+from payload_store import LocalPayloadStore, PayloadOffloader, S3PayloadStore, has_pointer, is_pointer, rehydrate_payloads
+
+
+class CountingStore(LocalPayloadStore):
+    """Local store counting reads and writes."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.puts = 0
+        self.gets = 0
+
+    def put(self, digest, body):
+        self.puts += 1
+        return super().put(digest, body)
+
+    def get(self, uri):
+        self.gets += 1
+        return super().get(uri)
+
+
+def test_payloads_up_to_the_threshold_stay_inline(tmp_path):
+    store = CountingStore(str(tmp_path))
+    offloader = PayloadOffloader(store, threshold_bytes=100)
+    # JSON encoding adds the two quotes
+    at_threshold = 'x' * 98
+
+    assert offloader.offload(at_threshold) is at_threshold
+    assert offloader.offload({'text': 'short'}) == {'text': 'short'}
+    for scalar in (None, True, 12, 1.5):
+        assert offloader.offload(scalar) is scalar
+    assert store.puts == 0
+    assert is_pointer(offloader.offload(at_threshold + 'x'))
+
+
+def test_text_is_measured_in_encoded_bytes(tmp_path):
+    offloader = PayloadOffloader(CountingStore(str(tmp_path)), threshold_bytes=100)
+
+    # 49 characters in 100 bytes of UTF-8 with the quotes
+    assert offloader.offload('é' * 49) == 'é' * 49
+    assert is_pointer(offloader.offload('é' * 50))
+    # 20 characters, but 122 bytes once JSON-encoded with \u escapes
+    assert is_pointer(offloader.offload('\x01' * 20))
+
+
+def test_offloaded_payload_round_trips_through_its_pointer(tmp_path):
+    offloader = PayloadOffloader(CountingStore(str(tmp_path)), threshold_bytes=100, preview_chars=10)
+    prompt = 'Summarise this document: ' + 'lorem ipsum ' * 50
+
+    pointer = offloader.offload(prompt)
+
+    assert pointer['preview'] == prompt[:10]
+    assert pointer['bytes'] == len(json.dumps(prompt))
+    assert json.loads(gzip.decompress((tmp_path / f"{pointer['sha256']}.json.gz").read_bytes())) == prompt
+    assert offloader.rehydrate(pointer) == prompt
+    assert offloader.stats() == {'offloaded': 1, 'offloaded_bytes': pointer['bytes'], 'rehydrated': 1}
+
+
+def test_only_oversized_fields_are_offloaded(tmp_path):
+    offloader = PayloadOffloader(CountingStore(str(tmp_path)), threshold_bytes=100)
+    outputs = {'generated_text': 'answer ' * 100, 'details': {'finish_reason': 'length'}}
+
+    offloaded = offloader.offload_fields(outputs)
+
+    assert is_pointer(offloaded['generated_text'])
+    assert offloaded['details'] == {'finish_reason': 'length'}
+    assert has_pointer(offloaded) and not has_pointer(outputs)
+    assert offloader.rehydrate(offloaded) == outputs
+    assert offloader.offload_fields(offloaded) == offloaded
+
+
+def test_repeated_payloads_are_stored_once_and_loaded_once(tmp_path):
+    store = CountingStore(str(tmp_path))
+    offloader = PayloadOffloader(store, threshold_bytes=100, cache_entries=1)
+    first, second = offloader.offload('a' * 500), offloader.offload('b' * 500)
+
+    assert offloader.offload('a' * 500) == first
+    assert len(list(tmp_path.glob('*.json.gz'))) == 2
+
+    for pointer in (first, first, second, first):
+        offloader.rehydrate(pointer)
+    # The one-entry cache keeps the last payload only
+    assert store.gets == 3
+
+
+def test_disabled_offloading_leaves_values_unchanged():
+    assert rehydrate_payloads({'generated_text': 'x'}, None) == {'generated_text': 'x'}
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType, ContentEncoding):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def test_s3_store_addresses_payloads_by_digest():
+    s3 = FakeS3()
+    offloader = PayloadOffloader(S3PayloadStore(s3, 'bucket', 'mlflow-payloads'), threshold_bytes=100)
+
+    pointer = offloader.offload('z' * 500)
+
+    digest = pointer['sha256']
+    assert pointer['offloaded_payload'] == f"s3://bucket/mlflow-payloads/{digest[:2]}/{digest}.json.gz"
+    assert offloader.rehydrate(pointer) == 'z' * 500
@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+
+from routing import ExperimentRouter, endpoint_from_key
+
+
+class FakeClient:
+    """In-memory experiments with the MlflowClient calls the router makes."""
+
+    def __init__(self, **experiments):
+        self.experiments = {name: SimpleNamespace(experiment_id=experiment_id, lifecycle_stage='active')
+                            for name, experiment_id in experiments.items()}
+        self.lookups = 0
+
+    def get_experiment_by_name(self, name):
+        self.lookups += 1
+        return self.experiments.get(name)
+
+    def create_experiment(self, name):
+        experiment_id = str(100 + len(self.experiments))
+        self.experiments[name] = SimpleNamespace(experiment_id=experiment_id, lifecycle_stage='active')
+        return experiment_id
+
+
+@pytest.mark.parametrize('s3_key, endpoint', [
+    ('datacapture/chat-prod/AllTraffic/2025/01/31/23/capture.jsonl', 'chat-prod'),
+    ('team/llm/datacapture/chat-prod/AllTraffic/2025/01/31/23/capture.jsonl.gz', 'chat-prod'),
+    ('chat-prod/AllTraffic/2025/01/31/23/capture.jsonl', 'chat-prod'),
+    ('capture.jsonl', None),
+    ('datacapture/capture.jsonl', None),
+    ('AllTraffic/2025/01/31/23/capture.jsonl', None),
+    ('datacapture/chat-prod/AllTraffic/2025/1/31/23/capture.jsonl', None),
+    ('datacapture/chat-prod/AllTraffic/2025/13/31/23/capture.jsonl', None),
+    ('datacapture/chat-prod/AllTraffic/2025/01/31/24/capture.jsonl', None),
+    ('datacapture/chat-prod/AllTraffic/latest/01/31/23/capture.jsonl', None),
+    ('/AllTraffic/2025/01/31/23/capture.jsonl', None),
+])
+def test_endpoint_from_key(s3_key, endpoint):
+    assert endpoint_from_key(s3_key) == endpoint
+
+
+def test_experiments_are_named_by_mapping_then_template_then_default():
+    router = ExperimentRouter(
+        FakeClient(), 'llm-monitoring-{endpoint}', {'summarize-dev': 'summaries'},
+        default_endpoint='unknown', default_name='llm-monitoring',
+    )
+
+    assert router.experiment_name('chat-prod') == 'llm-monitoring-chat-prod'
+    assert router.experiment_name('summarize-dev') == 'summaries'
+    assert router.experiment_name('unknown') == 'llm-monitoring'
+
+
+def test_experiment_ids_are_resolved_once_and_created_when_missing():
+    client = FakeClient(**{'llm-monitoring-chat-prod': '7'})
+    router = ExperimentRouter(client, 'llm-monitoring-{endpoint}')
+
+    assert router.experiment_id('chat-prod') == '7'
+    assert router.experiment_id('chat-prod') == '7'
+    assert router.cached('summarize-dev') is None
+    assert router.experiment_id('summarize-dev') == client.experiments['llm-monitoring-summarize-dev'].experiment_id
+    assert client.lookups == 2
+
+
+def test_endpoints_sharing_an_experiment_share_one_lookup():
+    client = FakeClient(**{'llm-monitoring': '1'})
+    router = ExperimentRouter(client, 'llm-monitoring')
+
+    assert router.experiment_id('chat-prod') == router.experiment_id('summarize-dev') == '1'
+    assert client.lookups == 1
+
+
+def test_deleted_experiment_is_not_logged_to():
+    client = FakeClient(**{'llm-monitoring-chat-prod': '7'})
+    client.experiments['llm-monitoring-chat-prod'].lifecycle_stage = 'deleted'
+
+    with pytest.raises(ValueError):
+        ExperimentRouter(client, 'llm-monitoring-{endpoint}').experiment_id('chat-prod')
+
+
+@pytest.fixture
+def templated_router(handler, monkeypatch):
+    """The handler's router with a per-endpoint experiment template."""
+    client = FakeClient()
+    monkeypatch.setattr(handler, 'MLFLOW_EXPERIMENT_NAME_TEMPLATE', 'llm-monitoring-{endpoint}')
+    monkeypatch.setattr(handler, '_experiment_router', None)
+    monkeypatch.setattr(handler, 'setup_mlflow', lambda: None)
+    monkeypatch.setattr(handler.mlflow.tracking, 'MlflowClient', lambda: client)
+    return handler.get_experiment_router()
+
+
+def test_short_key_falls_back_to_the_default_experiment(handler, templated_router):
+    endpoint = handler.endpoint_for_key('capture.jsonl')
+
+    assert endpoint == handler.SAGEMAKER_ENDPOINT_NAME
+    assert templated_router.experiment_name(endpoint) == handler.MLFLOW_EXPERIMENT_NAME
+
+
+def test_short_key_without_a_default_endpoint_falls_back_to_the_default_experiment(handler, monkeypatch, templated_router):
+    monkeypatch.setattr(handler, 'DEFAULT_ENDPOINT', 'unknown')
+    monkeypatch.setattr(handler, '_experiment_router', None)
+    router = handler.get_experiment_router()
+
+    assert router.experiment_name(handler.endpoint_for_key('capture.jsonl')) == handler.MLFLOW_EXPERIMENT_NAME
+
+
+def test_capture_layout_keys_follow_the_template(handler, templated_router):
+    endpoint = handler.endpoint_for_key('datacapture/chat-prod/AllTraffic/2025/01/31/23/capture.jsonl')
+
+    assert templated_router.experiment_name(endpoint) == 'llm-monitoring-chat-prod'
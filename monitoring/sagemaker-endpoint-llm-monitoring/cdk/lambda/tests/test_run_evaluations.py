@@ -0,0 +1,117 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+
+def fake_trace(trace_id, prompt='What is the capital of France?', text='Paris.'):
+    root_span = SimpleNamespace(inputs={'prompt': prompt, 'parameters': {}}, outputs={'generated_text': text})
+    return SimpleNamespace(info=SimpleNamespace(trace_id=trace_id), data=SimpleNamespace(spans=[root_span]))
+
+
+class FakeEvaluate:
+    """Stand-in for mlflow.genai.evaluate that assesses every (trace, scorer) cell."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def __call__(self, data, scorers):
+        self.calls.append(([trace.info.trace_id for trace in data], [scorer.name for scorer in scorers]))
+        for trace in data:
+            for scorer in scorers:
+                self.handler.record_assessment(trace, scorer.name, True)
+
+
+@pytest.fixture
+def evaluate(handler, monkeypatch):
+    """Evaluation of search_traces-shaped results, with stand-ins for MLflow and the scorers."""
+    evaluate = FakeEvaluate(handler)
+    monkeypatch.setattr(handler.mlflow.genai, 'evaluate', evaluate)
+    monkeypatch.setattr(handler.mlflow, 'set_trace_tag', lambda *args: None)
+    monkeypatch.setattr(handler, 'activate_experiment', lambda endpoint: '1')
+    monkeypatch.setattr(handler, 'get_evaluation_scorers', lambda: {
+        'judges': [SimpleNamespace(name='safety'), SimpleNamespace(name='fluency')],
+        'tokens_words': SimpleNamespace(name='tokens_words'),
+        'batch_criteria': {},
+    })
+    return evaluate
+
+
+def search_returning(traces):
+    """Stand-in for mlflow.search_traces, which returns a DataFrame unless a list is asked for."""
+    def search(**kwargs):
+        assert kwargs['return_type'] == 'list'
+        return list(traces)
+    return search
+
+
+def test_search_results_are_judged(handler, monkeypatch, evaluate):
+    traces = [fake_trace('tr-1'), fake_trace('tr-2')]
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search_returning(traces))
+
+    handler.run_evaluations('capture.jsonl', endpoint='test-endpoint')
+
+    assert evaluate.calls == [(['tr-1', 'tr-2'], ['safety', 'fluency', 'tokens_words'])]
+
+
+def test_only_the_sample_is_judged_within_the_file_budget(handler, monkeypatch, evaluate):
+    traces = [fake_trace('tr-1'), fake_trace('tr-2'), fake_trace('tr-3')]
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search_returning(traces))
+    monkeypatch.setattr(handler, 'JUDGE_BUDGET_PER_FILE', 1)
+    strata = {trace.info.trace_id: 'error=0' for trace in traces}
+
+    handler.run_evaluations('capture.jsonl', trace_ids=list(strata), trace_strata=strata, endpoint='test-endpoint')
+
+    [(judged, judges), (unjudged, cheap)] = evaluate.calls
+    assert judges == ['safety', 'fluency', 'tokens_words']
+    assert len(judged) == 1
+    assert cheap == ['tokens_words']
+    assert sorted(judged + unjudged) == ['tr-1', 'tr-2', 'tr-3']
+
+
+def test_safe_template_traces_skip_the_judges(handler, monkeypatch, evaluate):
+    traces = [fake_trace('tr-1', prompt='Health check 42'), fake_trace('tr-2')]
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search_returning(traces))
+    monkeypatch.setattr(handler, 'get_evaluation_cascade', lambda: handler.EvaluationCascade([r'^Health check']))
+
+    handler.run_evaluations('capture.jsonl', endpoint='test-endpoint')
+
+    assert evaluate.calls == [
+        (['tr-2'], ['safety', 'fluency', 'tokens_words']),
+        (['tr-1'], ['tokens_words']),
+    ]
+
+
+class FakeJudgeModel:
+    """Stand-in judge model answering 'yes' for every item of a batched prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, max_tokens):
+        self.prompts.append(prompt)
+        items = re.findall(r'<item id="(\d+)">', prompt)
+        return json.dumps([{'id': int(item_id), 'value': 'yes', 'rationale': "fake"} for item_id in items])
+
+
+def test_short_traces_are_judged_in_batches_before_the_evaluation(handler, monkeypatch, evaluate):
+    traces = [fake_trace(f"tr-{i}") for i in range(3)]
+    monkeypatch.setattr(handler.mlflow, 'search_traces', search_returning(traces))
+    model = FakeJudgeModel()
+    batch_judge = handler.BatchJudge(model, batch_size=5)
+    monkeypatch.setattr(handler, 'get_batch_judge', lambda: batch_judge)
+    monkeypatch.setattr(handler, 'get_evaluation_scorers', lambda: {
+        'judges': [SimpleNamespace(name='safety'), SimpleNamespace(name='fluency')],
+        'tokens_words': SimpleNamespace(name='tokens_words'),
+        'batch_criteria': handler.BATCH_CRITERIA,
+    })
+
+    handler.run_evaluations('capture.jsonl', endpoint='test-endpoint')
+
+    # One batched call per judge instead of one per (trace, judge)
+    assert len(model.prompts) == 2
+    assert all(prompt.count('<item id=') == 3 for prompt in model.prompts)
+    assert batch_judge.stats()['verdicts'] == 6
+    assert len(evaluate.calls) == 1
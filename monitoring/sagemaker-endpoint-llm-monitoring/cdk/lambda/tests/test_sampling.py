@@ -0,0 +1,76 @@
+import random
+
+from sampling import HourlyBudget, allocate, plan_judge_sample, stratified_sample, stratum_key
+
+
+def test_budget_covering_everything_takes_everything():
+    sizes = {'error=0|a': 5, 'error=1|b': 2}
+
+    assert allocate(sizes, 7) == sizes
+    assert allocate(sizes, 100) == sizes
+
+
+def test_every_stratum_gets_one_sample_before_the_split():
+    sizes = {'error=0|big': 1000, 'error=0|small': 3, 'error=1|errors': 2}
+
+    allocation = allocate(sizes, 10)
+
+    assert sum(allocation.values()) == 10
+    assert allocation['error=0|small'] >= 1
+    assert allocation['error=1|errors'] >= 1
+    assert allocation['error=0|big'] == max(allocation.values())
+
+
+def test_small_budget_prefers_error_strata_then_the_largest():
+    sizes = {'error=0|big': 100, 'error=0|medium': 50, 'error=0|small': 10, 'error=1|errors': 1}
+
+    assert allocate(sizes, 2) == {'error=0|big': 1, 'error=0|medium': 0, 'error=0|small': 0, 'error=1|errors': 1}
+
+
+def test_allocation_spends_the_budget_within_stratum_sizes():
+    sizes = {'error=0|a': 2, 'error=0|b': 3, 'error=0|c': 100, 'error=1|d': 1}
+
+    for budget in range(len(sizes), sum(sizes.values())):
+        allocation = allocate(sizes, budget)
+        assert sum(allocation.values()) == budget
+        assert all(1 <= allocation[stratum] <= size for stratum, size in sizes.items())
+
+
+def test_allocation_is_proportional_by_largest_remainder():
+    sizes = {'error=0|a': 60, 'error=0|b': 30, 'error=0|c': 10}
+
+    assert allocate(sizes, 13) == {'error=0|a': 7, 'error=0|b': 4, 'error=0|c': 2}
+
+
+def test_zero_budget_allocates_nothing():
+    assert allocate({'error=0|a': 3}, 0) == {'error=0|a': 0}
+
+
+def test_sample_weights_are_stratum_size_over_sample_size():
+    trace_strata = {f"t{i}": 'error=0|a' for i in range(8)}
+    trace_strata.update({f"e{i}": 'error=1|b' for i in range(2)})
+
+    selected = stratified_sample(trace_strata, 6, rng=random.Random(0))
+
+    assert len(selected) == 6
+    weights = {trace_strata[trace_id]: weight for trace_id, weight in selected.items()}
+    assert weights == {'error=0|a': 2.0, 'error=1|b': 1.0}
+    assert sum(selected.values()) == len(trace_strata)
+
+
+def test_plan_respects_the_per_file_and_hourly_budgets():
+    trace_strata = {f"t{i}": 'error=0|a' for i in range(20)}
+    hourly = HourlyBudget(per_hour=8)
+
+    first, summary = plan_judge_sample(trace_strata, per_file_budget=5, hourly_budget=hourly)
+    second, _ = plan_judge_sample(trace_strata, per_file_budget=5, hourly_budget=hourly)
+    third, _ = plan_judge_sample(trace_strata, per_file_budget=5, hourly_budget=hourly)
+
+    assert (len(first), len(second), len(third)) == (5, 3, 0)
+    assert summary == {'traces': 20, 'judged': 5, 'strata': 1}
+
+
+def test_stratum_key():
+    record = {'is_error': True, 'status_code': 500, 'request': {'inputs': 'x' * 300}}
+
+    assert stratum_key(record, 'ep') == 'error=1|status=500|prompt=medium|endpoint=ep'
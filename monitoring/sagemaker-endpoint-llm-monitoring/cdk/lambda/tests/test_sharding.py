@@ -0,0 +1,86 @@
+import io
+
+from sharding import merge_shard_states, plan_shards
+
+
+class FakeS3:
+    """Serves one object, honouring ``Range`` on ``get_object``."""
+
+    def __init__(self, data, content_encoding=None):
+        self.data = data
+        self.content_encoding = content_encoding
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        head = {'ContentLength': len(self.data)}
+        if self.content_encoding:
+            head['ContentEncoding'] = self.content_encoding
+        return head
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = (int(part) for part in Range[len('bytes='):].split('-'))
+        self.ranges.append((start, end))
+        return {'Body': io.BytesIO(self.data[start:end + 1])}
+
+
+def lines_of(data, shards):
+    return [data[shard['start']:shard['end']].splitlines() for shard in shards]
+
+
+def test_shards_end_right_after_a_newline():
+    lines = [b'{"id": %d, "pad": "%s"}' % (i, b'x' * (i % 7)) for i in range(200)]
+    data = b'\n'.join(lines) + b'\n'
+
+    shards = plan_shards(FakeS3(data), 'bucket', 'key.jsonl', shard_size=500, probe_size=16)
+
+    assert shards[0]['start'] == 0
+    assert shards[-1]['end'] == len(data)
+    for previous, following in zip(shards, shards[1:]):
+        assert previous['end'] == following['start']
+        assert data[following['start'] - 1:following['start']] == b'\n'
+    assert [line for shard in lines_of(data, shards) for line in shard] == lines
+
+
+def test_boundary_on_a_line_start_is_kept():
+    data = b'a' * 9 + b'\n' + b'b' * 9 + b'\n'
+
+    shards = plan_shards(FakeS3(data), 'bucket', 'key.jsonl', shard_size=10)
+
+    assert shards == [{'start': 0, 'end': 10}, {'start': 10, 'end': 20}]
+
+
+def test_long_line_swallows_the_boundaries_it_spans():
+    data = b'a' * 50 + b'\n' + b'b' * 5 + b'\n'
+
+    shards = plan_shards(FakeS3(data), 'bucket', 'key.jsonl', shard_size=10, probe_size=8)
+
+    assert shards == [{'start': 0, 'end': 51}, {'start': 51, 'end': 57}]
+
+
+def test_last_line_without_newline_stays_in_the_last_shard():
+    data = b'a' * 9 + b'\n' + b'b' * 15
+
+    shards = plan_shards(FakeS3(data), 'bucket', 'key.jsonl', shard_size=10)
+
+    assert shards == [{'start': 0, 'end': 10}, {'start': 10, 'end': 25}]
+
+
+def test_small_and_compressed_files_are_one_shard():
+    data = b'line\n' * 100
+
+    assert plan_shards(FakeS3(data), 'bucket', 'key.jsonl', shard_size=1000) == [{'start': 0, 'end': None}]
+    assert plan_shards(FakeS3(data), 'bucket', 'key.jsonl.gz', shard_size=10) == [{'start': 0, 'end': None}]
+    assert plan_shards(FakeS3(data, 'gzip'), 'bucket', 'key.jsonl', shard_size=10) == [{'start': 0, 'end': None}]
+
+
+def test_merge_sums_counts_and_drops_traces_of_a_missing_shard():
+    state = {
+        'counts': {'total': 2, 'processed': 2, 'errors': 0, 'skipped': 0},
+        'trace_ids': ['t1', 't2'],
+        'trace_strata': {'t1': 's', 't2': 's'},
+        'endpoint_stats': None,
+    }
+
+    assert merge_shard_states([state, state])['counts']['processed'] == 4
+    assert merge_shard_states([state, state])['trace_ids'] == ['t1', 't2', 't1', 't2']
+    assert merge_shard_states([state, None])['trace_ids'] is None
@@ -0,0 +1,159 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from spool import LocalSpoolStore, TraceSpool, TrackingCircuit, read_segment_entries
+
+
+def new_spool(tmp_path, segment_max_records=1000):
+    return TraceSpool(LocalSpoolStore(str(tmp_path / 'sealed')), str(tmp_path / 'open'), segment_max_records)
+
+
+def spooled_event_ids(spool):
+    return [[entry['record']['event_id'] for entry in spool.read(name)] for name in spool.segments()]
+
+
+def test_appended_records_are_sealed_into_segments(tmp_path):
+    spool = new_spool(tmp_path, segment_max_records=2)
+
+    spool.append('capture.jsonl', [{'event_id': 'e1'}, {'event_id': 'e2'}], 'timed out')
+    spool.append('capture.jsonl', [{'event_id': 'e3'}], 'timed out', uncertain=True)
+    spool.seal()
+
+    assert spooled_event_ids(spool) == [['e1', 'e2'], ['e3']]
+    [entry] = spool.read(spool.segments()[1])
+    assert entry['s3_file_key'] == 'capture.jsonl'
+    assert entry['reason'] == 'timed out'
+    assert entry['uncertain'] is True
+    assert spool.stats() == {'spooled': 3, 'sealed': 2}
+
+
+def test_segment_left_open_by_a_crash_is_recovered(tmp_path):
+    crashed = new_spool(tmp_path)
+    crashed.append('capture.jsonl', [{'event_id': 'e1'}, {'event_id': 'e2'}], 'timed out')
+    # The writer dies without closing its segment: no gzip trailer, no seal
+    assert crashed.segments() == []
+
+    restarted = new_spool(tmp_path)
+
+    assert spooled_event_ids(restarted) == [['e1', 'e2']]
+    assert os.listdir(tmp_path / 'open') == []
+
+
+def test_segment_the_store_refuses_stays_local_until_the_next_seal(tmp_path):
+    class BrokenStore(LocalSpoolStore):
+        def put(self, name, path):
+            raise RuntimeError("unavailable")
+
+    spool = TraceSpool(BrokenStore(str(tmp_path / 'sealed')), str(tmp_path / 'open'))
+    spool.append('capture.jsonl', [{'event_id': 'e1'}], 'timed out')
+    spool.seal()
+    assert spool.segments() == []
+
+    spool.store = LocalSpoolStore(str(tmp_path / 'sealed'))
+    spool.seal()
+
+    assert spooled_event_ids(spool) == [['e1']]
+
+
+def gzip_lines(*chunks):
+    """Gzip stream of the chunks, each sync-flushed as the spool does, without the trailer."""
+    buffer = io.BytesIO()
+    compressed = gzip.GzipFile(fileobj=buffer, mode='wb')
+    for chunk in chunks:
+        compressed.write(chunk)
+        compressed.flush()
+    return buffer.getvalue()
+
+
+def test_truncated_tail_keeps_every_complete_entry():
+    body = gzip_lines(b'{"a": 1}\n', b'{"a": 2}\n', b'{"a": 3')
+
+    assert read_segment_entries(body) == [{'a': 1}, {'a': 2}]
+
+
+def test_tail_cut_mid_block_keeps_the_entries_before_it():
+    head = gzip_lines(b'{"a": 1}\n')
+    body = gzip_lines(b'{"a": 1}\n', json.dumps({'a': 2, 'text': 'x' * 1000}).encode() + b'\n')
+
+    assert read_segment_entries(body[:len(head) + 20]) == [{'a': 1}]
+
+
+def test_appended_gzip_members_are_all_read():
+    body = gzip.compress(b'{"a": 1}\n') + gzip.compress(b'{"a": 2}\n')
+
+    assert read_segment_entries(body) == [{'a': 1}, {'a': 2}]
+
+
+def test_circuit_opens_on_a_slow_write_and_lets_one_through_after_the_wait(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('spool.time.monotonic', lambda: now[0])
+    circuit = TrackingCircuit(latency_budget_seconds=5, retry_after_seconds=60)
+
+    circuit.record_success(6)
+    assert not circuit.allow()
+
+    now[0] = 61
+    assert circuit.allow()
+    circuit.record_success(1)
+    assert not circuit.is_open
+    assert circuit.opened == 1
+
+
+@pytest.fixture
+def replay(handler, monkeypatch, tmp_path):
+    """Replay of a local spool through the async exporter, with a stand-in for MLflow."""
+    spool = new_spool(tmp_path)
+    circuit = TrackingCircuit(latency_budget_seconds=60, retry_after_seconds=60)
+    logged = []
+    monkeypatch.setattr(handler, 'get_trace_spool', lambda: spool)
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: None)
+    monkeypatch.setattr(handler, 'get_ingestion_index', lambda: None)
+    monkeypatch.setattr(handler, 'get_tracking_circuit', lambda: circuit)
+    monkeypatch.setattr(handler, 'check_tracking_server', lambda endpoint: True)
+    monkeypatch.setattr(handler, 'run_evaluations', lambda *args, **kwargs: None)
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: '1')
+    monkeypatch.setattr(handler.mlflow, 'flush_trace_async_logging', lambda: None)
+    monkeypatch.setattr(handler, 'log_trace_to_mlflow', lambda event, key, endpoint: logged.append(event['event_id']) or f"tr-{event['event_id']}")
+
+    def run(**event):
+        response = handler.replay_spool(dict(event, records_per_second=1000), None)
+        return json.loads(response['body'])
+
+    return spool, logged, run
+
+
+def test_replay_writes_every_record_and_drains_the_spool(replay):
+    spool, logged, run = replay
+    spool.append('capture.jsonl', [{'event_id': f"e{i}"} for i in range(3)], 'timed out')
+
+    body = run()
+
+    assert logged == ['e0', 'e1', 'e2']
+    assert body['replayed'] == 3
+    assert body['segments_left'] == 0
+    assert spool.segments() == []
+
+
+def test_replay_stopped_mid_segment_requeues_the_rest(replay):
+    spool, logged, run = replay
+    spool.append('capture.jsonl', [{'event_id': f"e{i}"} for i in range(2)], 'timed out')
+    spool.append('other.jsonl', [{'event_id': 'e2'}], 'health check failed', uncertain=True)
+
+    body = run(max_records=1)
+
+    assert logged == ['e0']
+    assert (body['replayed'], body['requeued'], body['stopped_by']) == (1, 2, 'max_records')
+    [remaining] = [spool.read(name) for name in spool.segments()]
+    assert [entry['record']['event_id'] for entry in remaining] == ['e1', 'e2']
+    assert [entry['uncertain'] for entry in remaining] == [False, True]
+    assert remaining[1]['s3_file_key'] == 'other.jsonl'
+
+    body = run()
+
+    assert logged == ['e0', 'e1', 'e2']
+    assert body['replayed'] == 2
+    assert spool.segments() == []
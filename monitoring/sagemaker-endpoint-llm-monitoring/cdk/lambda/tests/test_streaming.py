@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from streaming import iter_stream_payloads, looks_like_stream, reassemble_stream
+
+REQUEST_TIME = '2025-01-01T00:00:00Z'
+REQUEST_S = 1735689600
+
+
+def sse(*chunks, done=True):
+    lines = [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    return ''.join(lines) + ('data: [DONE]\n\n' if done else '')
+
+
+def jsonl(*chunks):
+    return ''.join(json.dumps(chunk) + '\n' for chunk in chunks)
+
+
+def test_tgi_tokens_are_joined_and_the_final_text_wins():
+    data = sse(
+        {'token': {'text': 'Par'}},
+        {'token': {'text': 'is'}},
+        {'token': {'text': '.'}, 'generated_text': 'Paris.', 'details': {'finish_reason': 'eos_token'}},
+    )
+
+    response, stats = reassemble_stream(data)
+
+    assert response == {'generated_text': 'Paris.', 'finish_reason': 'eos_token'}
+    assert stats == {'chunks': 3}
+
+
+def test_tokens_are_joined_without_a_final_text():
+    response, _ = reassemble_stream(sse({'token': {'text': 'Par'}}, {'token': {'text': 'is'}}))
+
+    assert response == {'generated_text': 'Paris'}
+
+
+def test_openai_compatible_chat_and_completion_chunks():
+    chat = sse(
+        {'choices': [{'delta': {'role': 'assistant'}}]},
+        {'choices': [{'delta': {'content': 'Hello'}}]},
+        {'choices': [{'delta': {'content': ' world'}, 'finish_reason': 'length'}]},
+    )
+    completion = sse({'choices': [{'text': 'Hel'}]}, {'choices': [{'text': 'lo'}]})
+
+    assert reassemble_stream(chat)[0] == {'generated_text': 'Hello world', 'finish_reason': 'length'}
+    assert reassemble_stream(completion)[0] == {'generated_text': 'Hello'}
+
+
+def test_json_lines_chunks():
+    response, stats = reassemble_stream(jsonl({'outputs': 'Hel'}, {'outputs': 'lo'}, {'text': '!'}))
+
+    assert response == {'generated_text': 'Hello!'}
+    assert stats['chunks'] == 3
+
+
+def test_framing_comments_and_broken_chunks_are_skipped():
+    data = (
+        ': keep-alive\n'
+        'event: message\n'
+        'id: 1\n'
+        'data: {"token": {"text": "a"}}\n\n'
+        'data: {"token": {"text": \n\n'
+        'data: ["not", "a", "chunk"]\n\n'
+        'retry: 1000\n'
+        'data: {"token": {"text": "b"}}\r\n\r\n'
+        'data: [DONE]\n'
+    )
+
+    response, stats = reassemble_stream(data)
+
+    assert response == {'generated_text': 'ab'}
+    assert stats == {'chunks': 2}
+    assert iter_stream_payloads(data)[-1] == '{"token": {"text": "b"}}'
+
+
+@pytest.mark.parametrize('scale', [1, 1000])
+def test_chunk_timestamps_give_time_to_first_token_and_gaps(scale):
+    data = sse(*(
+        {'token': {'text': 'x'}, 'created': (REQUEST_S + offset) * scale}
+        for offset in (0.25, 0.30, 0.45)
+    ))
+
+    _, stats = reassemble_stream(data, request_time=REQUEST_TIME)
+
+    assert stats['ttft_ms'] == pytest.approx(250)
+    assert stats['inter_chunk_ms'] == pytest.approx([50, 150])
+    assert stats['stream_duration_ms'] == pytest.approx(200)
+
+
+def test_chunks_stamped_before_the_request_have_no_time_to_first_token():
+    _, stats = reassemble_stream(sse({'token': {'text': 'x'}, 'timestamp': REQUEST_S - 5}), request_time=REQUEST_TIME)
+
+    assert 'ttft_ms' not in stats
+    assert stats['inter_chunk_ms'] == []
+
+
+def test_empty_stream():
+    assert reassemble_stream('data: [DONE]\n\n') == ({'generated_text': ''}, {'chunks': 0})
+
+
+@pytest.mark.parametrize('data, content_type, expected', [
+    (sse({'token': {'text': 'x'}}), None, True),
+    (jsonl({'outputs': 'a'}, {'outputs': 'b'}), None, True),
+    ('{"outputs": "a"}', 'application/jsonlines', True),
+    ('{"generated_text": "a"}', 'application/json', False),
+    ({'generated_text': 'a'}, 'text/event-stream', False),
+    ('', 'text/event-stream', False),
+])
+def test_looks_like_stream(data, content_type, expected):
+    assert looks_like_stream(data, content_type) is expected
+
+
+def test_streamed_capture_record_is_parsed_into_the_response_and_stream_stats(handler):
+    record = {
+        'captureData': {
+            'endpointInput': {'data': json.dumps({'inputs': 'Capital of France?'}), 'encoding': 'JSON'},
+            'endpointOutput': {
+                'data': sse({'token': {'text': 'Paris'}, 'created': REQUEST_S + 0.1}, {'token': {'text': '.'}, 'created': REQUEST_S + 0.2}),
+                'encoding': 'JSON',
+                'observedContentType': 'text/event-stream',
+            },
+        },
+        'eventMetadata': {'eventId': 'e1', 'inferenceTime': REQUEST_TIME},
+    }
+
+    parsed_record = handler.parse_data_capture_record(record)
+
+    assert parsed_record['response'] == {'generated_text': 'Paris.'}
+    assert parsed_record['stream']['chunks'] == 2
+    assert parsed_record['stream']['ttft_ms'] == pytest.approx(100)
+    assert parsed_record['is_error'] is False
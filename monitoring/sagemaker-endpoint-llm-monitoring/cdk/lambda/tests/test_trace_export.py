@@ -0,0 +1,177 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('mlflow')
+
+from mlflow.entities import Span  # noqa: E402
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest  # noqa: E402
+
+from spool import TrackingCircuit  # noqa: E402
+from trace_export import BatchExportUnsupported, OtlpTraceExporter, new_root_span  # noqa: E402
+
+
+class FakeHttp:
+    """Stand-in for MLflow's http_request, answering every request with one status code."""
+
+    def __init__(self, status_code=200, text=''):
+        self.status_code = status_code
+        self.text = text
+        self.requests = []
+
+    def __call__(self, host_creds, endpoint, method, data, extra_headers):
+        request = ExportTraceServiceRequest()
+        request.ParseFromString(data)
+        self.requests.append((endpoint, extra_headers, request))
+        return SimpleNamespace(status_code=self.status_code, text=self.text)
+
+
+@pytest.fixture
+def http(monkeypatch):
+    import trace_export
+
+    http = FakeHttp()
+    monkeypatch.setattr(trace_export, 'http_request', http)
+    return http
+
+
+def span(i, experiment_id='1'):
+    return new_root_span('capture.jsonl', {'prompt': f"q{i}"}, {'generated_text': f"a{i}"}, {'event_id': f"e{i}"}, experiment_id)
+
+
+def test_root_span_has_the_attributes_of_an_mlflow_span():
+    root = new_root_span('capture.jsonl', {'prompt': 'q'}, {'generated_text': 'a'}, {'event_id': 'e1'}, '7', is_error=True)
+
+    assert root.trace_id.startswith('tr-') and len(root.trace_id) == 35
+    assert root.inputs == {'prompt': 'q'}
+    assert root.outputs == {'generated_text': 'a'}
+    assert root.get_attribute('event_id') == 'e1'
+    assert root.get_attribute('mlflow.experimentId') == '7'
+    assert root.status.status_code == 'ERROR'
+
+
+def test_spans_of_many_traces_go_in_one_request(http):
+    exporter = OtlpTraceExporter(lambda: None)
+    spans = [span(i) for i in range(50)]
+
+    exporter.export('1', spans)
+
+    [(endpoint, headers, request)] = http.requests
+    assert endpoint == '/v1/traces'
+    assert headers['x-mlflow-experiment-id'] == '1'
+    sent = request.resource_spans[0].scope_spans[0].spans
+    assert len({otel_span.trace_id for otel_span in sent}) == 50
+    assert Span.from_otel_proto(sent[0]).inputs == {'prompt': 'q0'}
+    assert (exporter.requests, exporter.spans) == (1, 50)
+
+
+def test_empty_batch_sends_nothing(http):
+    exporter = OtlpTraceExporter(lambda: None)
+
+    exporter.export('1', [])
+
+    assert http.requests == []
+
+
+@pytest.mark.parametrize('status_code', [404, 501])
+def test_server_without_otlp_ingestion_is_reported(http, status_code):
+    http.status_code = status_code
+    exporter = OtlpTraceExporter(lambda: None)
+
+    with pytest.raises(BatchExportUnsupported):
+        exporter.export('1', [span(0)])
+    assert exporter.spans == 0
+
+
+def test_failed_request_raises(http):
+    http.status_code = 503
+    exporter = OtlpTraceExporter(lambda: None)
+
+    with pytest.raises(Exception):
+        exporter.export('1', [span(0)])
+    assert exporter.spans == 0
+
+
+class FakeExporter:
+    """Stand-in OtlpTraceExporter recording each batch, failing with ``error`` when set."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def export(self, experiment_id, spans):
+        if self.error is not None:
+            raise self.error
+        self.batches.append((experiment_id, [root.trace_id for root in spans]))
+
+
+class FakeSpool:
+    """Stand-in TraceSpool recording what is appended."""
+
+    def __init__(self):
+        self.appended = []
+
+    def append(self, s3_file_key, records, reason, uncertain=False):
+        self.appended.append(([record['event_id'] for record in records], uncertain))
+
+
+@pytest.fixture
+def writer_env(handler, monkeypatch):
+    """Trace writer collaborators: one experiment, a fresh circuit and a recording spool."""
+    spool = FakeSpool()
+    circuit = TrackingCircuit(latency_budget_seconds=60, retry_after_seconds=60)
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: '1')
+    monkeypatch.setattr(handler, 'get_tracking_circuit', lambda: circuit)
+    monkeypatch.setattr(handler, 'get_trace_spool', lambda: spool)
+    monkeypatch.setattr(handler, 'check_tracking_server', lambda endpoint: True)
+    monkeypatch.setattr(handler, '_batch_export_unsupported', False)
+    return spool
+
+
+def record(i):
+    return {'event_id': f"e{i}", 'request': {'inputs': f"q{i}"}, 'response': {'generated_text': f"a{i}"}}
+
+
+def test_flush_is_exported_in_one_request_per_experiment(handler, monkeypatch, writer_env):
+    exporter = FakeExporter()
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: exporter)
+    experiment_ids = iter(['1', '2', '1', '1'])
+    monkeypatch.setattr(handler, 'get_experiment_id', lambda endpoint: next(experiment_ids))
+
+    with handler.AsyncTraceWriter('capture.jsonl', flush_every=4, endpoint='a') as writer:
+        for i in range(4):
+            writer.add(record(i))
+
+    assert [(experiment_id, len(trace_ids)) for experiment_id, trace_ids in exporter.batches] == [('1', 3), ('2', 1)]
+    assert sorted(writer.trace_ids) == sorted(trace_id for _, trace_ids in exporter.batches for trace_id in trace_ids)
+    assert writer.flushes == 1
+    assert handler.load_traces('capture.jsonl', '1', writer.trace_ids[:1])[0].info.trace_id == writer.trace_ids[0]
+
+
+def test_failed_batch_is_spooled_as_uncertain(handler, monkeypatch, writer_env):
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: FakeExporter(error=RuntimeError("timed out")))
+
+    with handler.AsyncTraceWriter('capture.jsonl', flush_every=10, endpoint='a') as writer:
+        for i in range(3):
+            writer.add(record(i))
+
+    assert writer_env.appended == [(['e0', 'e1', 'e2'], True)]
+    assert writer.trace_ids == []
+    assert writer.spooled_count == 3
+
+
+def test_refused_batch_falls_back_to_the_async_exporter(handler, monkeypatch, writer_env):
+    exporter = FakeExporter(error=BatchExportUnsupported("/v1/traces answered 501"))
+    monkeypatch.setattr(handler, 'get_trace_exporter', lambda: None if handler._batch_export_unsupported else exporter)
+    logged = []
+    monkeypatch.setattr(handler, 'log_trace_to_mlflow', lambda event, key, endpoint: logged.append(event['event_id']) or f"tr-{event['event_id']}")
+    monkeypatch.setattr(handler.mlflow, 'flush_trace_async_logging', lambda: None)
+
+    with handler.AsyncTraceWriter('capture.jsonl', flush_every=2, endpoint='a') as writer:
+        for i in range(4):
+            writer.add(record(i))
+
+    assert logged == ['e0', 'e1', 'e2', 'e3']
+    assert writer.trace_ids == ['tr-e0', 'tr-e1', 'tr-e2', 'tr-e3']
+    assert handler._batch_export_unsupported
+    assert writer_env.appended == []
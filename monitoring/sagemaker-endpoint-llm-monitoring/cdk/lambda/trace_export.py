@@ -0,0 +1,138 @@
+"""
+Batched export of single-span traces over OTLP.
+
+MLflow's span exporter sends every trace on its own: the span in one OTLP
+request and the trace info in another. The traces of the processor are a
+single root span each, so the spans of a whole flush can go to the tracking
+server's OTLP endpoint (``/v1/traces``) in one request instead, and the
+server creates a trace for every OTel trace ID it receives. This needs an
+MLflow 3.4+ tracking server with a database backend; others answer with an
+error that ``BatchExportUnsupported`` reports.
+"""
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mlflow.entities import Span
+from mlflow.tracing.constant import SpanAttributeKey
+from mlflow.utils.rest_utils import http_request, verify_rest_response
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.id_generator import RandomIdGenerator
+from opentelemetry.trace import SpanContext, Status, StatusCode, TraceFlags
+
+OTLP_TRACES_PATH = '/v1/traces'
+EXPERIMENT_ID_HEADER = 'x-mlflow-experiment-id'
+
+# Answers of servers without OTLP span ingestion: no route, or a store that cannot log spans
+UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+_id_generator = RandomIdGenerator()
+
+
+class BatchExportUnsupported(Exception):
+    """The tracking server does not take spans over OTLP."""
+
+
+def dump_attribute(value: Any) -> str:
+    """Span attribute value, JSON-encoded as MLflow stores them."""
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def new_root_span(
+    name: str,
+    inputs: Any,
+    outputs: Any,
+    attributes: Dict[str, Any],
+    experiment_id: str,
+    is_error: bool = False,
+    start_time_ns: Optional[int] = None,
+    end_time_ns: Optional[int] = None,
+) -> Span:
+    """
+    A finished trace made of one root span, with the attributes MLflow's tracer gives a span.
+
+    Args:
+        name: Span (and trace) name
+        inputs: Span inputs
+        outputs: Span outputs
+        attributes: Additional span attributes
+        experiment_id: Experiment the trace is logged to
+        is_error: Whether the span has the ERROR status
+        start_time_ns: Start time, now when omitted
+        end_time_ns: End time, the start time when omitted
+
+    Returns:
+        The span; its ``trace_id`` is the MLflow trace ID
+    """
+    otel_trace_id = _id_generator.generate_trace_id()
+    start_time_ns = start_time_ns or time.time_ns()
+    span_attributes = {
+        SpanAttributeKey.EXPERIMENT_ID: dump_attribute(experiment_id),
+        SpanAttributeKey.REQUEST_ID: dump_attribute(f"tr-{otel_trace_id:032x}"),
+        SpanAttributeKey.SPAN_TYPE: dump_attribute('UNKNOWN'),
+        SpanAttributeKey.INPUTS: dump_attribute(inputs),
+        SpanAttributeKey.OUTPUTS: dump_attribute(outputs),
+    }
+    for key, value in attributes.items():
+        span_attributes[key] = dump_attribute(value)
+
+    return Span(ReadableSpan(
+        name=name,
+        context=SpanContext(
+            otel_trace_id, _id_generator.generate_span_id(), is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+        ),
+        attributes=span_attributes,
+        status=Status(StatusCode.ERROR if is_error else StatusCode.OK),
+        start_time=start_time_ns,
+        end_time=end_time_ns or start_time_ns,
+    ))
+
+
+class OtlpTraceExporter:
+    """
+    Send the spans of many traces to the tracking server in one OTLP/HTTP request.
+
+    Requests go through MLflow's REST client, with the URL, auth and retries
+    of the tracking store. ``requests`` and ``spans`` count what was sent.
+
+    Args:
+        get_host_creds: Returns the ``MlflowHostCreds`` of the tracking server
+    """
+
+    def __init__(self, get_host_creds: Callable[[], Any]):
+        self.get_host_creds = get_host_creds
+        self.requests = 0
+        self.spans = 0
+        self._lock = threading.Lock()
+
+    def export(self, experiment_id: str, spans: List[Span]) -> None:
+        """
+        Log the traces of ``spans`` in an experiment, in one request.
+
+        Raises:
+            BatchExportUnsupported: The server has no OTLP span ingestion; nothing was logged
+            Exception: The request failed; some traces of the batch may have been logged
+        """
+        if not spans:
+            return
+
+        request = ExportTraceServiceRequest()
+        scope_spans = request.resource_spans.add().scope_spans.add()
+        scope_spans.spans.extend(span.to_otel_proto() for span in spans)
+
+        response = http_request(
+            host_creds=self.get_host_creds(),
+            endpoint=OTLP_TRACES_PATH,
+            method='POST',
+            data=request.SerializeToString(),
+            extra_headers={'Content-Type': 'application/x-protobuf', EXPERIMENT_ID_HEADER: experiment_id},
+        )
+        with self._lock:
+            self.requests += 1
+        if response.status_code in UNSUPPORTED_STATUS_CODES:
+            raise BatchExportUnsupported(f"{OTLP_TRACES_PATH} answered {response.status_code}")
+        verify_rest_response(response, OTLP_TRACES_PATH)
+        with self._lock:
+            self.spans += len(spans)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Historical backfill of SageMaker data capture files into MLflow.
+
+Lists the capture files of a date range and processes each one through the
+Lambda handler (lambda/handler.py), in a pool of worker processes, instead
+of one Step Functions execution per file. Files are ingested, their
+endpoint statistics logged and their traces evaluated exactly as in the
+deployed function, with the same environment variables.
+
+Data capture writes files under ``<prefix>/YYYY/MM/DD/HH/``. Each hour of
+the range is listed as its own paginated listing, several at a time.
+Several prefixes (one per endpoint or variant) can be backfilled in one run;
+each file's traces go to the experiment of its endpoint.
+
+Rate limits are global: the MLflow records/sec and Bedrock requests and
+tokens/min given here are split evenly across the worker processes. Leave
+headroom for the deployed function, which keeps running meanwhile.
+
+Every finished file is appended to a JSON Lines manifest. A restarted
+backfill with the same manifest skips the files already done and retries
+the failed ones. With CHECKPOINT_BACKEND set, a file interrupted mid-way
+resumes from its last checkpoint.
+
+Usage:
+    pip install -r lambda/requirements.txt
+    set -a && source ../.env && set +a    # MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT_NAME, ...
+    python scripts/backfill.py --bucket <data-capture-bucket> --prefix datacapture/<endpoint>/AllTraffic \\
+        --start 2025-01-01 --end 2025-01-31 --processes 8 --records-per-second 200 \\
+        --judge-requests-per-minute 100 --manifest backfill-manifest.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Set
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(SCRIPT_DIR, '..', 'lambda')
+
+# Same filter as the handler
+CAPTURE_FILE_SUFFIXES = ('.jsonl', '.jsonl.gz')
+
+
+def hour_prefixes(prefix: str, start: datetime, end: datetime) -> List[str]:
+    """``<prefix>/YYYY/MM/DD/HH/`` of every hour from ``start`` to the end of day ``end``."""
+    prefix = prefix.strip('/')
+    prefixes = []
+    hour = start
+    while hour < end + timedelta(days=1):
+        prefixes.append(f"{prefix}/{hour:%Y/%m/%d/%H}/")
+        hour += timedelta(hours=1)
+    return prefixes
+
+
+def list_prefix(s3_client, bucket: str, prefix: str) -> List[str]:
+    keys = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith(CAPTURE_FILE_SUFFIXES))
+    return keys
+
+
+def list_capture_files(s3_client, bucket: str, prefixes: List[str], workers: int) -> List[str]:
+    """Capture file keys under ``prefixes``, listed concurrently, in key (time) order."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        listings = executor.map(lambda prefix: list_prefix(s3_client, bucket, prefix), prefixes)
+        return sorted(key for keys in listings for key in keys)
+
+
+def load_manifest(path: str) -> Set[str]:
+    """Keys of the files a previous run finished. The latest entry of a key wins."""
+    status: Dict[str, str] = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    status[entry['s3_key']] = entry['status']
+    return {key for key, value in status.items() if value == 'done'}
+
+
+_handler = None
+
+
+def _init_worker(settings: Dict[str, str], skip_evaluation: bool) -> None:
+    global _handler
+    os.environ.update(settings)
+    sys.path.insert(0, LAMBDA_DIR)
+
+    import handler
+
+    if skip_evaluation:
+        handler.run_evaluations = lambda *args, **kwargs: None
+    _handler = handler
+
+
+def _process_file(bucket: str, key: str) -> Dict:
+    started = time.perf_counter()
+    try:
+        response = _handler.lambda_handler({'s3_bucket': bucket, 's3_key': key}, None)
+        body = json.loads(response['body'])
+        status = 'done' if response['statusCode'] == 200 else 'failed'
+        error = body.get('error')
+    except Exception as e:
+        body, status, error = {}, 'failed', str(e)
+    return {
+        's3_key': key,
+        'status': status,
+        'records': body.get('records_processed', 0),
+        'seconds': round(time.perf_counter() - started, 3),
+        'error': error,
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+class Progress:
+    """Files and records done so far, printed at most every ``interval`` seconds."""
+
+    def __init__(self, total: int, interval: float):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.records = 0
+        self.started = time.perf_counter()
+        self._printed = 0.0
+
+    def update(self, result: Dict) -> None:
+        if result['status'] == 'done':
+            self.done += 1
+            self.records += result['records']
+        else:
+            self.failed += 1
+            print(f"Failed {result['s3_key']}: {result['error']}", flush=True)
+
+        now = time.perf_counter()
+        if now - self._printed >= self.interval or self.done + self.failed == self.total:
+            self._printed = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        finished = self.done + self.failed
+        files_per_second = finished / elapsed if elapsed else 0.0
+        eta = (self.total - finished) / files_per_second if files_per_second else 0.0
+        print(
+            f"[{finished}/{self.total} {finished / max(self.total, 1):.1%}] {self.failed} failed,"
+            f" {files_per_second:.2f} files/sec, {self.records / elapsed if elapsed else 0:.1f} records/sec,"
+            f" elapsed {elapsed / 60:.1f} min, eta {eta / 60:.1f} min",
+            flush=True,
+        )
+
+
+def worker_settings(args: argparse.Namespace) -> Dict[str, str]:
+    """Handler environment of each worker process, with the global rate limits split between them."""
+    settings = {
+        # EMF lines would interleave with the progress output unless asked for
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', 'false'),
+        'INGEST_RECORDS_PER_SECOND': str(args.records_per_second / args.processes),
+        'JUDGE_REQUESTS_PER_MINUTE': str(args.judge_requests_per_minute / args.processes),
+        'JUDGE_TOKENS_PER_MINUTE': str(args.judge_tokens_per_minute / args.processes),
+        'DATA_CAPTURE_BUCKET': os.environ.get('DATA_CAPTURE_BUCKET', args.bucket),
+    }
+    if args.ingest_workers:
+        settings['INGEST_MAX_WORKERS'] = str(args.ingest_workers)
+    return settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', required=True, help="Data capture bucket")
+    parser.add_argument('--prefix', required=True, nargs='+', help="Capture prefixes up to the variant, e.g. datacapture/<endpoint>/AllTraffic")
+    parser.add_argument('--start', required=True, help="First day, YYYY-MM-DD (UTC)")
+    parser.add_argument('--end', help="Last day, YYYY-MM-DD (UTC), default today")
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help="Worker processes")
+    parser.add_argument('--ingest-workers', type=int, default=0, help="Ingestion threads per process (default INGEST_MAX_WORKERS)")
+    parser.add_argument('--listing-workers', type=int, default=32, help="Concurrent S3 listings")
+    parser.add_argument('--records-per-second', type=float, default=0, help="Global MLflow ingestion limit, 0 for unlimited")
+    parser.add_argument('--judge-requests-per-minute', type=float, default=0, help="Global Bedrock judge request limit, 0 for unlimited")
+    parser.add_argument('--judge-tokens-per-minute', type=float, default=0, help="Global Bedrock judge token limit, 0 for unlimited")
+    parser.add_argument('--skip-evaluation', action='store_true', help="Only ingest traces and endpoint statistics")
+    parser.add_argument('--manifest', default='backfill-manifest.jsonl', help="Resume manifest (JSON Lines)")
+    parser.add_argument('--report-every', type=float, default=10, help="Seconds between progress lines")
+    parser.add_argument('--dry-run', action='store_true', help="List the files to process and stop")
+    args = parser.parse_args()
+
+    import boto3
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end or datetime.now(timezone.utc).strftime('%Y-%m-%d'), '%Y-%m-%d')
+    prefixes = [hour_prefix for prefix in args.prefix for hour_prefix in hour_prefixes(prefix, start, end)]
+
+    listed = time.perf_counter()
+    keys = list_capture_files(boto3.client('s3'), args.bucket, prefixes, args.listing_workers)
+    done = load_manifest(args.manifest)
+    todo = [key for key in keys if key not in done]
+    print(
+        f"Listed {len(keys)} capture files in {len(prefixes)} hourly partitions in"
+        f" {time.perf_counter() - listed:.1f}s; {len(keys) - len(todo)} already done, {len(todo)} to process",
+        flush=True,
+    )
+    if args.dry_run or not todo:
+        return
+
+    progress = Progress(len(todo), args.report_every)
+    with open(args.manifest, 'a') as manifest, ProcessPoolExecutor(
+        max_workers=args.processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(worker_settings(args), args.skip_evaluation),
+    ) as executor:
+        futures = {executor.submit(_process_file, args.bucket, key): key for key in todo}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process died (e.g. out of memory); the file is retried on the next run
+                result = {'s3_key': futures[future], 'status': 'failed', 'records': 0, 'seconds': 0, 'error': repr(e)}
+            manifest.write(json.dumps(result) + '\n')
+            manifest.flush()
+            progress.update(result)
+
+    if progress.failed:
+        print(f"{progress.failed} files failed; run again with the same --manifest to retry them")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Local benchmarks for the data capture processor Lambda (lambda/handler.py).
+
+Runs handler stages against the sample data capture file and a local
+stand-in MLflow tracking server, so throughput can be compared without
+deploying the stack.
+
+Usage:
+    pip install -r lambda/requirements.txt
+    python scripts/benchmark.py ingest --records 2000 --workers 1 4 8 16
+    python scripts/benchmark.py ingest --records 2000 --workers 8 --flush-every 100
+    python scripts/benchmark.py ingest --records 2000 --workers 8 --flush-every 100 --export-modes batch async
+    python scripts/benchmark.py lookup --records 2000
+    python scripts/benchmark.py judges --records 200 --workers 4 16 --judge-capacity 4
+    python scripts/benchmark.py parse --records 20000
+    python scripts/benchmark.py shards --records 5000 --workers 1 2 4 8
+    python scripts/benchmark.py batch-judges --records 300 --judge-batch-sizes 1 5 10 20
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(SCRIPT_DIR, '..', 'lambda')
+SAMPLE_CAPTURE_FILE = os.path.join(
+    SCRIPT_DIR, '..', '..', '34-30-683-55126149-826d-415a-967b-33fa7f4666f3.jsonl'
+)
+
+
+def load_sample_records(count: int) -> List[bytes]:
+    """Replicate the sample capture file to ``count`` JSONL lines with unique event IDs."""
+    with open(SAMPLE_CAPTURE_FILE, 'rb') as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    records = []
+    for i in range(count):
+        record = json.loads(json.dumps(samples[i % len(samples)]))
+        record['eventMetadata']['eventId'] = f"bench-{i:08d}"
+        records.append(json.dumps(record).encode('utf-8'))
+    return records
+
+
+@contextmanager
+def local_tracking_server() -> Iterator[str]:
+    """Start a throwaway ``mlflow server`` on a free port and yield its URI."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'mlflow', 'server',
+                '--host', '127.0.0.1',
+                '--port', str(port),
+                '--backend-store-uri', f"sqlite:///{tmp_dir}/mlflow.db",
+                '--default-artifact-root', f"{tmp_dir}/artifacts",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        uri = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.time() + 60
+            while time.time() < deadline:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    time.sleep(0.5)
+            else:
+                raise RuntimeError("Local MLflow server did not start")
+            yield uri
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def import_handler(tracking_uri: str):
+    """Import the Lambda handler module configured against ``tracking_uri``."""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+    os.environ['MLFLOW_TRACKING_URI'] = tracking_uri or 'file:///tmp/mlruns-benchmark'
+    os.environ.setdefault('MLFLOW_EXPERIMENT_NAME', 'handler-benchmark')
+    os.environ.setdefault('SAGEMAKER_ENDPOINT_NAME', 'benchmark-endpoint')
+    os.environ.setdefault('BEDROCK_MODEL_ID', 'bedrock:/benchmark-model')
+    os.environ.setdefault('DATA_CAPTURE_BUCKET', 'benchmark-bucket')
+    sys.path.insert(0, LAMBDA_DIR)
+
+    import handler
+    import mlflow
+
+    if tracking_uri:
+        mlflow.set_tracking_uri(tracking_uri)
+        mlflow.set_experiment(os.environ['MLFLOW_EXPERIMENT_NAME'])
+    return handler
+
+
+class TrackingRequestCounter:
+    """Counts the HTTP requests MLflow sends (its REST client goes through ``requests.Session``)."""
+
+    def __init__(self):
+        import requests
+
+        self.count = 0
+        self._lock = threading.Lock()
+        send = requests.Session.request
+
+        def counting_request(session, *args, **kwargs):
+            with self._lock:
+                self.count += 1
+            return send(session, *args, **kwargs)
+
+        requests.Session.request = counting_request
+
+
+def bench_ingest(args: argparse.Namespace, tracking_uri: str) -> None:
+    """Records/sec and tracking server requests of ``ingest_records`` for each export mode and worker count."""
+    # Async trace export is only enabled by the handler when flushing is on
+    os.environ['TRACE_FLUSH_EVERY_RECORDS'] = str(args.flush_every)
+    handler = import_handler(tracking_uri)
+    records = load_sample_records(args.records)
+    counter = TrackingRequestCounter()
+
+    print(f"{'export':>7} {'workers':>8} {'records':>8} {'seconds':>8} {'records/sec':>12} {'requests':>9} {'req/record':>11}")
+    for mode in args.export_modes:
+        handler.TRACE_EXPORT_MODE = mode
+        for workers in args.workers:
+            counter.count = 0
+            start = time.perf_counter()
+            counts: Dict[str, int] = handler.ingest_records(
+                records, f"benchmark/ingest-{mode}-{workers}.jsonl", max_workers=workers, flush_every=args.flush_every
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"{mode:>7} {workers:>8} {counts['processed']:>8} {elapsed:>8.2f} {counts['processed'] / elapsed:>12.1f}"
+                f" {counter.count:>9} {counter.count / max(counts['processed'], 1):>11.3f}"
+            )
+
+
+def bench_lookup(args: argparse.Namespace, tracking_uri: str) -> None:
+    """Time to load a file's traces for evaluation: kept in memory vs fetched by ID vs searched by name."""
+    os.environ['TRACE_FLUSH_EVERY_RECORDS'] = str(args.flush_every)
+    os.environ['LOGGED_TRACES_MAX_SIZE'] = str(args.records)
+    handler = import_handler(tracking_uri)
+    import mlflow
+
+    s3_file_key = 'benchmark/lookup.jsonl'
+    counts = handler.ingest_records(load_sample_records(args.records), s3_file_key, flush_every=args.flush_every)
+    experiment_id = handler.get_experiment_id(handler.endpoint_for_key(s3_file_key))
+
+    start = time.perf_counter()
+    kept = handler.load_traces(s3_file_key, experiment_id, counts['trace_ids'])
+    from_memory = time.perf_counter() - start
+
+    handler._logged_traces.clear()
+    start = time.perf_counter()
+    fetched = handler.load_traces(s3_file_key, experiment_id, counts['trace_ids'])
+    by_id = time.perf_counter() - start
+
+    start = time.perf_counter()
+    searched = mlflow.search_traces(
+        locations=[experiment_id], filter_string=f"name = '{s3_file_key}'", return_type='list'
+    )
+    by_name = time.perf_counter() - start
+
+    print(f"{'method':>14} {'traces':>8} {'seconds':>8}")
+    print(f"{'in memory':>14} {len(kept):>8} {from_memory:>8.3f}")
+    print(f"{'by ID':>14} {len(fetched):>8} {by_id:>8.3f}")
+    print(f"{'by name':>14} {len(searched):>8} {by_name:>8.3f}")
+
+
+class FakeJudge:
+    """Stand-in Bedrock judge with fixed latency that throttles above ``capacity`` concurrent calls."""
+
+    def __init__(self, latency: float, capacity: int):
+        self.latency = latency
+        self.capacity = capacity
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs=None, outputs=None):
+        with self._lock:
+            self._in_flight += 1
+            throttled = self._in_flight > self.capacity
+        try:
+            time.sleep(self.latency)
+            if throttled:
+                raise RuntimeError("ThrottlingException: Too many requests, please wait before trying again.")
+            return {'value': 'yes'}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def bench_judges(args: argparse.Namespace, tracking_uri: str) -> None:
+    """Judge scheduler throughput/latency against a fake judge that throttles."""
+    sys.path.insert(0, LAMBDA_DIR)
+    from judge_scheduler import JudgeScheduler
+
+    records = [json.loads(record) for record in load_sample_records(args.records)]
+    judge = FakeJudge(latency=args.judge_latency, capacity=args.judge_capacity)
+
+    for workers in args.workers:
+        scheduler = JudgeScheduler(
+            max_concurrency=workers,
+            requests_per_minute=args.requests_per_minute,
+            max_attempts=6,
+            backoff_seconds=args.judge_latency,
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(
+                lambda record: scheduler.call(judge, {'inputs': record['captureData']}),
+                records,
+            ))
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers} seconds={elapsed:.2f} {json.dumps(scheduler.stats())}")
+
+
+def bench_parse(args: argparse.Namespace, tracking_uri: str) -> None:
+    """Records/sec of line decoding + ``parse_data_capture_record`` per JSON backend."""
+    handler = import_handler(tracking_uri)
+    records = load_sample_records(args.records)
+
+    print(f"{'backend':>8} {'records':>8} {'seconds':>8} {'records/sec':>12}")
+    for backend in ('stdlib', 'orjson'):
+        if backend == 'orjson' and handler.orjson is None:
+            print(f"{backend:>8} not installed")
+            continue
+
+        handler.json_loads = handler.get_json_loads(backend)
+        start = time.perf_counter()
+        for record in records:
+            handler.parse_data_capture_record(handler.json_loads(record))
+        elapsed = time.perf_counter() - start
+        print(f"{backend:>8} {len(records):>8} {elapsed:>8.2f} {len(records) / elapsed:>12.1f}")
+
+
+class FakeJudgeModel:
+    """
+    Stand-in judge model answering (batched) judge prompts.
+
+    Each item's verdict is a fixed function of the criterion and response, so
+    single-item prompts always agree with each other. ``noise`` flips verdicts
+    in multi-item prompts with that probability (degraded attention on long
+    prompts) and ``malformed_rate`` is the share of replies that are not JSON.
+    """
+
+    ITEM_PATTERN = re.compile(r'<item id="(\d+)">\nRequest: .*?\nResponse: (.*?)\n</item>', re.DOTALL)
+
+    def __init__(self, latency: float, noise: float, malformed_rate: float, seed: int = 0):
+        self.latency = latency
+        self.noise = noise
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def verdict(self, criterion: str, response: str, values) -> str:
+        return values[zlib.crc32(f"{criterion}{response}".encode('utf-8')) % len(values)]
+
+    def __call__(self, prompt: str, max_tokens: int) -> str:
+        time.sleep(self.latency)
+        criterion = prompt.split('criterion:\n\n', 1)[1].split('\n', 1)[0]
+        values = json.loads('[' + prompt.rsplit('<one of ', 1)[1].split('>', 1)[0].replace(' | ', ', ') + ']')
+        items = self.ITEM_PATTERN.findall(prompt)
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.malformed_rate:
+                return "I am unable to produce the requested format."
+            reply = []
+            for item_id, response in items:
+                value = self.verdict(criterion, response, values)
+                if len(items) > 1 and self._random.random() < self.noise:
+                    value = self._random.choice([v for v in values if v != value])
+                reply.append({'id': int(item_id), 'value': value, 'rationale': "fake"})
+        return json.dumps(reply)
+
+
+def bench_batch_judges(args: argparse.Namespace, tracking_uri: str) -> None:
+    """Judge calls and agreement with per-trace verdicts of batched judge prompts against a fake model."""
+    sys.path.insert(0, LAMBDA_DIR)
+    from batch_judge import BATCH_CRITERIA, BatchJudge, build_batch_prompt, parse_batch_verdicts
+
+    items = []
+    for i, record in enumerate(load_sample_records(args.records)):
+        capture = json.loads(record)['captureData']
+        inputs = {'prompt': json.loads(capture['endpointInput']['data'])['inputs']}
+        text = json.loads(capture['endpointOutput']['data'])['generated_text']
+        items.append((f"item-{i}", inputs, {'generated_text': f"{text[:600]} [{i}]"}))
+
+    # Reference: one single-item call per (trace, scorer)
+    reference_model = FakeJudgeModel(latency=0, noise=0, malformed_rate=0)
+    reference = {}
+    for judge_name, (criterion, values) in BATCH_CRITERIA.items():
+        for key, inputs, outputs in items:
+            reply = reference_model(prompt=build_batch_prompt(criterion, values, [(inputs, outputs)]), max_tokens=150)
+            reference[(judge_name, key)] = parse_batch_verdicts(reply, 1, values)[0][0]
+
+    print(f"{'batch':>6} {'calls':>7} {'per-trace':>10} {'saved':>7} {'fallbacks':>10} {'agreement':>10} {'seconds':>8}")
+    for batch_size in args.judge_batch_sizes:
+        model = FakeJudgeModel(latency=args.judge_latency, noise=args.judge_noise, malformed_rate=args.malformed_rate)
+        batch_judge = BatchJudge(model, batch_size=batch_size, max_item_chars=10000)
+        start = time.perf_counter()
+        agree = fallbacks = 0
+        for judge_name, (criterion, values) in BATCH_CRITERIA.items():
+            keyed = [(f"{judge_name}/{key}", inputs, outputs) for key, inputs, outputs in items]
+            batch_judge.prefetch({judge_name: keyed}, BATCH_CRITERIA, max_workers=args.workers[0])
+            for key, inputs, outputs in items:
+                verdict = batch_judge.take(f"{judge_name}/{key}")
+                if verdict is None:
+                    # Fallback to the single-trace judge
+                    fallbacks += 1
+                    model(prompt=build_batch_prompt(criterion, values, [(inputs, outputs)]), max_tokens=150)
+                    agree += 1
+                elif verdict['value'] == reference[(judge_name, key)]:
+                    agree += 1
+        elapsed = time.perf_counter() - start
+        per_trace = len(items) * len(BATCH_CRITERIA)
+        print(
+            f"{batch_size:>6} {model.calls:>7} {per_trace:>10} {1 - model.calls / per_trace:>7.1%}"
+            f" {fallbacks:>10} {agree / per_trace:>10.1%} {elapsed:>8.2f}"
+        )
+
+
+class LocalS3Client:
+    """Stand-in for the boto3 S3 client calls used by the handler, backed by a local directory."""
+
+    class exceptions:
+        class ClientError(Exception):
+            def __init__(self, code: str):
+                super().__init__(code)
+                self.response = {'Error': {'Code': code}}
+
+        class NoSuchKey(ClientError):
+            def __init__(self):
+                super().__init__('NoSuchKey')
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def head_object(self, Bucket: str, Key: str) -> Dict:
+        return {'ContentLength': os.path.getsize(self._path(Bucket, Key))}
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None) -> Dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise self.exceptions.NoSuchKey()
+        with open(path, 'rb') as f:
+            if Range:
+                first, last = Range[len('bytes='):].split('-')
+                if int(first) >= os.path.getsize(path):
+                    raise self.exceptions.ClientError('InvalidRange')
+                f.seek(int(first))
+                data = f.read(int(last) - int(first) + 1 if last else -1)
+            else:
+                data = f.read()
+        return {'Body': io.BytesIO(data), 'ETag': str(hash(data))}
+
+    def put_object(self, Bucket: str, Key: str, Body, **kwargs) -> Dict:
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body.encode('utf-8') if isinstance(Body, str) else Body)
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> Dict:
+        if os.path.exists(self._path(Bucket, Key)):
+            os.remove(self._path(Bucket, Key))
+        return {}
+
+
+_shard_handler = None
+
+
+def _init_shard_worker(tracking_uri: str, s3_root: str) -> None:
+    global _shard_handler
+    _shard_handler = import_handler(tracking_uri)
+    _shard_handler.s3_client = LocalS3Client(s3_root)
+
+
+def _warm_up(_: int) -> None:
+    time.sleep(0.5)
+
+
+def _run_shard(event: Dict) -> Dict:
+    return _shard_handler.lambda_handler(event, None)
+
+
+def bench_shards(args: argparse.Namespace, tracking_uri: str) -> None:
+    """
+    Local orchestrator stand-in for byte-range sharding: plan, shard workers in parallel processes, reduce.
+
+    Each worker count runs against its own copy of the capture file in a local
+    S3 stand-in. Evaluation is left out of the reducer (the judges need Bedrock).
+    """
+    with tempfile.TemporaryDirectory() as s3_root:
+        os.environ['INGESTION_INDEX_BACKEND'] = 'none'
+        os.environ['CHECKPOINT_BACKEND'] = 'local'
+        os.environ['CHECKPOINT_LOCAL_DIR'] = os.path.join(s3_root, 'checkpoints')
+        os.environ['TRACE_FLUSH_EVERY_RECORDS'] = str(args.flush_every)
+        handler = import_handler(tracking_uri)
+        handler.s3_client = LocalS3Client(s3_root)
+        handler.run_evaluations = lambda *a, **kw: None
+
+        data = b'\n'.join(load_sample_records(args.records)) + b'\n'
+        bucket = os.environ['DATA_CAPTURE_BUCKET']
+
+        print(f"{'shards':>8} {'records':>8} {'plan s':>8} {'shards s':>9} {'reduce s':>9} {'records/sec':>12}")
+        for workers in args.workers:
+            key = f"benchmark/shards-{workers}.jsonl"
+            os.makedirs(os.path.dirname(os.path.join(s3_root, bucket, key)), exist_ok=True)
+            with open(os.path.join(s3_root, bucket, key), 'wb') as f:
+                f.write(data)
+
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_shard_worker,
+                initargs=(tracking_uri, s3_root),
+            ) as executor:
+                list(executor.map(_warm_up, range(workers)))
+
+                start = time.perf_counter()
+                handler.SHARD_SIZE_BYTES = len(data) // workers + 1
+                plan = handler.lambda_handler({'mode': 'plan', 's3_bucket': bucket, 's3_key': key}, None)
+                planned = time.perf_counter()
+                results = list(executor.map(_run_shard, plan['shards']))
+                sharded = time.perf_counter()
+
+            reduced = handler.lambda_handler(
+                {'mode': 'reduce', 's3_bucket': bucket, 's3_key': key, 'shards': results}, None
+            )
+            end = time.perf_counter()
+            processed = json.loads(reduced['body'])['records_processed']
+            print(
+                f"{len(plan['shards']):>8} {processed:>8} {planned - start:>8.2f} {sharded - planned:>9.2f}"
+                f" {end - sharded:>9.2f} {processed / (end - start):>12.1f}"
+            )
+
+
+BENCHMARKS = {
+    'ingest': bench_ingest,
+    'lookup': bench_lookup,
+    'judges': bench_judges,
+    'parse': bench_parse,
+    'shards': bench_shards,
+    'batch-judges': bench_batch_judges,
+}
+
+# Benchmarks that do not talk to a tracking server
+LOCAL_BENCHMARKS = {'judges', 'parse', 'batch-judges'}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--tracking-uri', help="Use an existing tracking server instead of starting a local one")
+    parser.add_argument('--records', type=int, default=1000, help="Number of capture records to process")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16], help="Ingestion worker (shards: process) counts")
+    parser.add_argument('--flush-every', type=int, default=0, help="Records between async trace export flushes, 0 to write each trace synchronously")
+    parser.add_argument('--export-modes', nargs='+', default=['batch'], choices=['batch', 'async'], help="Trace export modes (TRACE_EXPORT_MODE) compared by ingest")
+    parser.add_argument('--judge-latency', type=float, default=0.05, help="Fake judge latency in seconds")
+    parser.add_argument('--judge-capacity', type=int, default=4, help="Concurrent calls the fake judge accepts before throttling")
+    parser.add_argument('--judge-batch-sizes', type=int, nargs='+', default=[1, 5, 10, 20], help="Traces per batched judge prompt")
+    parser.add_argument('--judge-noise', type=float, default=0.0, help="Chance the fake model flips a verdict in a multi-item prompt")
+    parser.add_argument('--malformed-rate', type=float, default=0.05, help="Share of fake model replies that are not JSON")
+    parser.add_argument('--requests-per-minute', type=float, default=0, help="Judge request rate limit, 0 for unlimited")
+    args = parser.parse_args()
+
+    if args.tracking_uri or args.benchmark in LOCAL_BENCHMARKS:
+        BENCHMARKS[args.benchmark](args, args.tracking_uri)
+    else:
+        with local_tracking_server() as tracking_uri:
+            BENCHMARKS[args.benchmark](args, tracking_uri)
+
+
+if __name__ == '__main__':
+    main()